@@ -0,0 +1,605 @@
+""" Defines a compact binary archive format for parsed flows
+
+An archive stores the parsed flows (including the key metadata) so they can
+be loaded again without parsing nor decoding the flow strings. It has the
+following layout (all integers are little-endian):
+
+    header:   magic (8 bytes), version (u16), flow type (u16),
+              number of flows (u64) and the offsets (u64) of the chunk
+              table, the string table and the index
+    body:     the flow records and the compressed chunks of original
+              strings
+    chunks:   number of chunks (u32) followed by the offset (u64) and size
+              (u32) of each chunk. A chunk holds the zlib-compressed
+              original strings of (up to) CHUNK_FLOWS consecutive flows
+    strings:  the string table: number of strings (varint) followed by
+              each string's length (varint) and utf-8 bytes
+    index:    for each flow, the offset of its record (u64), and the chunk
+              (u32), offset within the chunk (u32) and length (u32) of its
+              original string
+
+A flow record holds the number of sections (varint) and, for each of them,
+its name, position, length, whether it is a list, and its key-values. Each
+key-value holds the key, the value and the key metadata (positions and
+lengths within the section string).
+
+Values are encoded as a one-byte type tag followed by:
+    - ints: zigzag varint
+    - floats: IEEE 754 double
+    - strings, dictionary keys, IP addresses and Ethernet addresses: a
+      varint index in the string table. Repeated strings and addresses are
+      stored once and each of them is decoded only once when reading
+    - IntMasks: size, value and (if not fully masked) mask varints
+    - dictionaries and lists: number of items (varint) followed by the items
+"""
+
+import mmap
+import struct
+import zlib
+
+import netaddr
+
+from ovs_dbg.decoders import (
+    IntMask,
+    Mask8,
+    Mask16,
+    Mask32,
+    Mask64,
+    Mask128,
+    Mask992,
+    IPMask,
+    EthMask,
+    decode_mask,
+)
+from ovs_dbg.flow import Section
+from ovs_dbg.kv import KeyMetadata, KeyValue
+from ovs_dbg.ofp import OFPFlow
+from ovs_dbg.odp import ODPFlow
+
+MAGIC = b"OVSFLOWS"
+VERSION = 1
+# Number of original strings compressed together
+CHUNK_FLOWS = 256
+
+_header = struct.Struct("<8sHHQQQQ")
+_chunk_entry = struct.Struct("<QI")
+_index_entry = struct.Struct("<QIII")
+_u32 = struct.Struct("<I")
+_double = struct.Struct("<d")
+
+# Flow types
+_flow_types = {OFPFlow: 1, ODPFlow: 2}
+_flow_classes = {1: OFPFlow, 2: ODPFlow}
+_flow_type_names = {1: "openflow", 2: "datapath"}
+
+# Value type tags
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_MASK = 6
+_FULL_MASK = 7
+_IPMASK = 8
+_ETHMASK = 9
+_IPADDR = 10
+_DICT = 11
+_LIST = 12
+
+# Key metadata flags
+_NO_META = 0
+_META = 1
+# The key and value strings are not slices of the section string
+_META_STRINGS = 2
+
+_masks = {
+    cls.size: cls for cls in (Mask8, Mask16, Mask32, Mask64, Mask128, Mask992)
+}
+
+
+class ArchiveError(RuntimeError):
+    """Exception raised when an archive cannot be written or read."""
+
+    pass
+
+
+def is_archive(filename):
+    """Returns whether a file is a flow archive"""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _write_varint(buf, value):
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (~value << 1) | 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else ~(value >> 1)
+
+
+class ArchiveWriter:
+    """ArchiveWriter writes flows into a binary archive
+
+    Flows are written as they are added and the archive is completed when
+    close() is called.
+
+    Args:
+        file (file): a seekable file object opened in binary mode
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._start = file.tell()
+        self._flow_type = None
+        self._strings = dict()
+        self._chunk = list()
+        self._chunk_size = 0
+        self._chunks = bytearray()
+        self._nchunks = 0
+        self._index = bytearray()
+        self._nflows = 0
+        self._offset = _header.size
+        self._file.write(bytes(_header.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, flow):
+        """Add a flow to the archive
+
+        Args:
+            flow (Flow): the flow to add. All the flows in an archive must be
+                of the same type
+        """
+        flow_type = _flow_types.get(flow.__class__)
+        if flow_type is None:
+            raise ArchiveError(
+                "Unsupported flow type {}".format(flow.__class__.__name__)
+            )
+        if self._flow_type is None:
+            self._flow_type = flow_type
+        elif self._flow_type != flow_type:
+            raise ArchiveError("All flows in an archive must be of one type")
+
+        buf = bytearray()
+        _write_varint(buf, len(flow.sections))
+        for section in flow.sections:
+            self._encode_section(buf, section)
+
+        orig = (flow.orig or "").encode()
+        self._index += _index_entry.pack(
+            self._offset, self._nchunks, self._chunk_size, len(orig)
+        )
+        self._write(buf)
+        self._nflows += 1
+
+        self._chunk.append(orig)
+        self._chunk_size += len(orig)
+        if len(self._chunk) == CHUNK_FLOWS:
+            self._flush_chunk()
+
+    def close(self):
+        """Write the pending original strings, the chunk and string tables
+        and the index, and complete the header"""
+        if self._chunk:
+            self._flush_chunk()
+
+        chunks_offset = self._offset
+        self._write(_u32.pack(self._nchunks) + self._chunks)
+
+        strings_offset = self._offset
+        buf = bytearray()
+        _write_varint(buf, len(self._strings))
+        for string in self._strings:
+            data = string.encode()
+            _write_varint(buf, len(data))
+            buf += data
+        self._write(buf)
+
+        index_offset = self._offset
+        self._write(self._index)
+
+        self._file.seek(self._start)
+        self._file.write(
+            _header.pack(
+                MAGIC,
+                VERSION,
+                self._flow_type or 0,
+                self._nflows,
+                chunks_offset,
+                strings_offset,
+                index_offset,
+            )
+        )
+        self._file.seek(self._start + self._offset)
+        self._file.flush()
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _flush_chunk(self):
+        data = zlib.compress(b"".join(self._chunk))
+        self._chunks += _chunk_entry.pack(self._offset, len(data))
+        self._write(data)
+        self._nchunks += 1
+        self._chunk = list()
+        self._chunk_size = 0
+
+    def _encode_section(self, buf, section):
+        """Append the encoded section"""
+        string = section.string
+        self._string(buf, section.name)
+        _write_varint(buf, section.pos)
+        _write_varint(buf, len(string))
+        buf.append(1 if section.is_list else 0)
+        _write_varint(buf, len(section.data))
+        for kv in section.data:
+            self._string(buf, kv.key)
+            self._encode(buf, kv.value)
+
+            meta = kv.meta
+            if meta is None:
+                buf.append(_NO_META)
+                continue
+
+            sliced = string[
+                meta.kpos : meta.kpos + len(meta.kstring)
+            ] == meta.kstring and (
+                string[meta.vpos : meta.vpos + len(meta.vstring)]
+                == meta.vstring
+                if meta.vpos >= 0
+                else not meta.vstring
+            )
+            buf.append(_META if sliced else _META_STRINGS)
+            _write_varint(buf, meta.kpos)
+            _write_varint(buf, _zigzag(meta.vpos))
+            if sliced:
+                _write_varint(buf, len(meta.kstring))
+                _write_varint(buf, len(meta.vstring))
+            else:
+                self._string(buf, meta.kstring)
+                self._string(buf, meta.vstring)
+            self._string(buf, meta.delim)
+            self._string(buf, meta.end_delim)
+
+    def _string(self, buf, string):
+        """Append the reference to an interned string"""
+        idx = self._strings.get(string)
+        if idx is None:
+            idx = self._strings[string] = len(self._strings)
+        _write_varint(buf, idx)
+
+    def _encode(self, buf, value):
+        """Append the encoded value"""
+        cls = value.__class__
+        if value is None:
+            buf.append(_NONE)
+        elif value is True:
+            buf.append(_TRUE)
+        elif value is False:
+            buf.append(_FALSE)
+        elif cls is int:
+            buf.append(_INT)
+            _write_varint(buf, _zigzag(value))
+        elif cls is float:
+            buf.append(_FLOAT)
+            buf += _double.pack(value)
+        elif cls is str:
+            buf.append(_STR)
+            self._string(buf, value)
+        elif isinstance(value, dict):
+            buf.append(_DICT)
+            _write_varint(buf, len(value))
+            for key, val in value.items():
+                self._string(buf, key)
+                self._encode(buf, val)
+        elif isinstance(value, (list, tuple)):
+            buf.append(_LIST)
+            _write_varint(buf, len(value))
+            for val in value:
+                self._encode(buf, val)
+        elif isinstance(value, IntMask):
+            buf.append(_FULL_MASK if value.fully() else _MASK)
+            _write_varint(buf, value.size)
+            _write_varint(buf, value.value)
+            if not value.fully():
+                _write_varint(buf, value.mask)
+        elif isinstance(value, IPMask):
+            buf.append(_IPMASK)
+            self._string(buf, str(value))
+        elif isinstance(value, EthMask):
+            buf.append(_ETHMASK)
+            self._string(buf, str(value))
+        elif isinstance(value, netaddr.IPAddress):
+            buf.append(_IPADDR)
+            self._string(buf, str(value))
+        else:
+            raise ArchiveError(
+                "Cannot archive value of type {}".format(cls.__name__)
+            )
+
+
+class Archive:
+    """Archive reads flows from a binary archive
+
+    The file is memory-mapped and flows are only decoded when they are
+    accessed, either by iterating over the archive or by index.
+
+    Args:
+        filename (str): the archive filename
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if len(self._mmap) < _header.size:
+                raise ArchiveError("{} is not a flow archive".format(filename))
+            (
+                magic,
+                version,
+                self._flow_type,
+                self._nflows,
+                chunks_offset,
+                strings_offset,
+                self._index_offset,
+            ) = _header.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ArchiveError("{} is not a flow archive".format(filename))
+            if version > VERSION:
+                raise ArchiveError(
+                    "Unsupported archive version {} (max: {})".format(
+                        version, VERSION
+                    )
+                )
+        except ArchiveError:
+            self._mmap.close()
+            raise
+
+        self._flow_class = _flow_classes.get(self._flow_type)
+        (nchunks,) = _u32.unpack_from(self._mmap, chunks_offset)
+        self._chunks = [
+            _chunk_entry.unpack_from(
+                self._mmap, chunks_offset + _u32.size + i * _chunk_entry.size
+            )
+            for i in range(nchunks)
+        ]
+        self._strings = self._read_strings(strings_offset)
+        # Decoded addresses, indexed by (tag, string index)
+        self._objects = dict()
+        # Last decompressed chunk of original strings
+        self._chunk = (None, None)
+
+    @property
+    def flow_class(self):
+        """The class of the archived flows"""
+        return self._flow_class
+
+    @property
+    def flow_type(self):
+        """The type of the archived flows ("openflow" or "datapath")"""
+        return _flow_type_names.get(self._flow_type)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def __len__(self):
+        return self._nflows
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self._nflows
+        if not 0 <= idx < self._nflows:
+            raise IndexError("archive index out of range")
+        return self.flow(idx)
+
+    def __iter__(self):
+        return (self.flow(idx) for idx in range(self._nflows))
+
+    def _entry(self, idx):
+        return _index_entry.unpack_from(
+            self._mmap, self._index_offset + idx * _index_entry.size
+        )
+
+    def _orig(self, chunk, offset, length):
+        if self._chunk[0] != chunk:
+            chunk_offset, size = self._chunks[chunk]
+            self._chunk = (
+                chunk,
+                zlib.decompress(
+                    self._mmap[chunk_offset : chunk_offset + size]
+                ),
+            )
+        return str(self._chunk[1][offset : offset + length], "utf-8")
+
+    def orig(self, idx):
+        """Returns the original string of a flow without decoding the flow
+
+        Args:
+            idx (int): the index of the flow in the archive
+        """
+        _, chunk, offset, length = self._entry(idx)
+        return self._orig(chunk, offset, length)
+
+    def flow(self, idx, id=None):
+        """Returns a flow
+
+        Args:
+            idx (int): the index of the flow in the archive
+            id (Any): Optional; the flow identifier. Defaults to idx
+        """
+        record, chunk, offset, length = self._entry(idx)
+        orig = self._orig(chunk, offset, length)
+        # Records are always followed by the chunk that holds their original
+        # strings. Work on a copy of the record, it is faster to index than
+        # the mmap
+        end = self._chunks[chunk][0]
+        if idx + 1 < self._nflows:
+            end = min(end, self._entry(idx + 1)[0])
+        data = self._mmap[record:end]
+
+        nsections, pos = self._read_varint(data, 0)
+        sections = list()
+        for _ in range(nsections):
+            section, pos = self._decode_section(data, pos, orig)
+            sections.append(section)
+
+        return self._flow_class(sections, orig, idx if id is None else id)
+
+    @staticmethod
+    def _read_varint(data, pos):
+        result = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+
+    def _read_strings(self, pos):
+        data = self._mmap
+        count, pos = self._read_varint(data, pos)
+        strings = list()
+        for _ in range(count):
+            length, pos = self._read_varint(data, pos)
+            strings.append(str(data[pos : pos + length], "utf-8"))
+            pos += length
+        return strings
+
+    def _decode_section(self, data, pos, orig):
+        """Decode the section at a position
+
+        Returns:
+            A (Section, next_pos) tuple
+        """
+        strings = self._strings
+        read_varint = self._read_varint
+
+        name, pos = read_varint(data, pos)
+        section_pos, pos = read_varint(data, pos)
+        length, pos = read_varint(data, pos)
+        string = orig[section_pos : section_pos + length]
+        is_list = data[pos] == 1
+        count, pos = read_varint(data, pos + 1)
+
+        kvs = list()
+        for _ in range(count):
+            key, pos = read_varint(data, pos)
+            value, pos = self._decode(data, pos)
+            flags = data[pos]
+            pos += 1
+            meta = None
+            if flags != _NO_META:
+                kpos, pos = read_varint(data, pos)
+                vpos, pos = read_varint(data, pos)
+                vpos = _unzigzag(vpos)
+                if flags == _META:
+                    klen, pos = read_varint(data, pos)
+                    vlen, pos = read_varint(data, pos)
+                    kstring = string[kpos : kpos + klen]
+                    vstring = string[vpos : vpos + vlen] if vpos >= 0 else ""
+                else:
+                    kstring, pos = read_varint(data, pos)
+                    vstring, pos = read_varint(data, pos)
+                    kstring = strings[kstring]
+                    vstring = strings[vstring]
+                delim, pos = read_varint(data, pos)
+                end_delim, pos = read_varint(data, pos)
+                meta = KeyMetadata(
+                    kpos,
+                    vpos,
+                    kstring,
+                    vstring,
+                    strings[delim],
+                    strings[end_delim],
+                )
+            kvs.append(KeyValue(strings[key], value, meta))
+
+        return (
+            Section(strings[name], section_pos, string, kvs, is_list),
+            pos,
+        )
+
+    def _decode(self, data, pos):
+        """Decode the value at a position
+
+        Returns:
+            A (value, next_pos) tuple
+        """
+        tag = data[pos]
+        pos += 1
+        if tag == _STR:
+            idx, pos = self._read_varint(data, pos)
+            return self._strings[idx], pos
+        elif tag == _INT:
+            value, pos = self._read_varint(data, pos)
+            return _unzigzag(value), pos
+        elif tag == _TRUE:
+            return True, pos
+        elif tag == _DICT:
+            count, pos = self._read_varint(data, pos)
+            result = dict()
+            for _ in range(count):
+                key, pos = self._read_varint(data, pos)
+                result[self._strings[key]], pos = self._decode(data, pos)
+            return result, pos
+        elif tag == _LIST:
+            count, pos = self._read_varint(data, pos)
+            result = list()
+            for _ in range(count):
+                value, pos = self._decode(data, pos)
+                result.append(value)
+            return result, pos
+        elif tag == _MASK or tag == _FULL_MASK:
+            size, pos = self._read_varint(data, pos)
+            value, pos = self._read_varint(data, pos)
+            if tag == _MASK:
+                mask, pos = self._read_varint(data, pos)
+            else:
+                mask = (1 << size) - 1
+            cls = _masks.get(size)
+            if cls is None:
+                cls = _masks[size] = decode_mask(size)
+            return cls.from_json({"value": value, "mask": mask}), pos
+        elif tag in (_IPMASK, _ETHMASK, _IPADDR):
+            idx, pos = self._read_varint(data, pos)
+            value = self._objects.get((tag, idx))
+            if value is None:
+                string = self._strings[idx]
+                if tag == _IPMASK:
+                    value = IPMask(string)
+                elif tag == _ETHMASK:
+                    value = EthMask(string)
+                else:
+                    value = netaddr.IPAddress(string)
+                self._objects[(tag, idx)] = value
+            return value, pos
+        elif tag == _FLOAT:
+            return _double.unpack_from(data, pos)[0], pos + 8
+        elif tag == _FALSE:
+            return False, pos
+        elif tag == _NONE:
+            return None, pos
+
+        raise ArchiveError("Unknown value type {}".format(tag))
@@ -0,0 +1,278 @@
+""" Defines the attribution of datapath flows to OpenFlow flows
+
+A datapath flow (megaflow) is installed after an upcall translates a packet
+through the OpenFlow tables. While doing so, ovs-vswitchd un-wildcards the
+bits of every field that the OpenFlow flows it hits match on. Therefore an
+OpenFlow flow can only have generated a megaflow if every packet field it
+matches on is matched by the megaflow with at least the same mask bits and
+the values agree.
+
+The OpenFlow flows of each table are indexed by the packet fields they match
+on (see odp_fields): flows whose subtables share the same packet fields are
+merged into a hash table indexed by the masked values of those fields. A
+megaflow is attributed by projecting its values onto each compatible index,
+so the cost depends on the number of indexes and not on the number of
+OpenFlow flows. Which indexes are compatible with a megaflow only depends on
+its mask signature, which is shared by many megaflows, so it is computed
+once per signature.
+
+Fields that do not appear in datapath flows (e.g: registers or metadata) are
+unknown and never rule an OpenFlow flow out. An OpenFlow flow that only
+matches on packet fields matches every packet of the megaflow: it is
+"certain" and the lower priority flows of its table are not candidates.
+
+Limitations: fields rewritten by the actions of previous tables are not
+tracked and the datapath in_port is not translated into an OpenFlow port, so
+it is considered unknown.
+"""
+
+from ovs_dbg.classifier import (
+    ClassifierError,
+    match_value,
+    packet_value,
+    project,
+    projection,
+)
+
+# Datapath match fields (flattened as "{key}.{subkey}") and the OpenFlow
+# field they correspond to
+odp_fields = {
+    "skb_mark": "pkt_mark",
+    "ct_state": "ct_state",
+    "ct_zone": "ct_zone",
+    "ct_mark": "ct_mark",
+    "ct_label": "ct_label",
+    "tunnel.tun_id": "tun_id",
+    "tunnel.src": "tun_src",
+    "tunnel.dst": "tun_dst",
+    "tunnel.ipv6_src": "tun_ipv6_src",
+    "tunnel.ipv6_dst": "tun_ipv6_dst",
+    "eth.src": "eth_src",
+    "eth.dst": "eth_dst",
+    "eth_type": "eth_type",
+    "ipv4.src": "ip_src",
+    "ipv4.dst": "ip_dst",
+    "ipv4.proto": "ip_proto",
+    "ipv4.ttl": "nw_ttl",
+    "ipv4.frag": "ip_frag",
+    "ipv6.src": "ipv6_src",
+    "ipv6.dst": "ipv6_dst",
+    "ipv6.label": "ipv6_label",
+    "ipv6.proto": "ip_proto",
+    "ipv6.hlimit": "nw_ttl",
+    "ipv6.frag": "ip_frag",
+    "tcp.src": "tp_src",
+    "tcp.dst": "tp_dst",
+    "udp.src": "tp_src",
+    "udp.dst": "tp_dst",
+    "sctp.src": "tp_src",
+    "sctp.dst": "tp_dst",
+    "tcp_flags": "tcp_flags",
+    "icmp.type": "icmp_type",
+    "icmp.code": "icmp_code",
+    "icmpv6.type": "icmpv6_type",
+    "icmpv6.code": "icmpv6_code",
+    "arp.sip": "arp_spa",
+    "arp.tip": "arp_tpa",
+    "arp.op": "arp_op",
+    "arp.sha": "arp_sha",
+    "arp.tha": "arp_tha",
+    "nd.target": "nd_target",
+    "nd.sll": "nd_sll",
+    "nd.tll": "nd_tll",
+}
+
+_packet_fields = set(odp_fields.values())
+
+
+def odp_match_key(flow):
+    """Returns the mask signature of a datapath flow and the values it
+    matches on, using OpenFlow field names
+
+    Datapath fields that have no OpenFlow equivalent (see odp_fields) are
+    left out.
+
+    Args:
+        flow (ODPFlow): the datapath flow. Its match must be decoded
+
+    Returns:
+        A (signature, key) tuple as returned by classifier.match_key
+    """
+    fields = dict()
+    for name, value in _flatten(flow.match_kv):
+        field = odp_fields.get(name)
+        if field is None:
+            continue
+        if field == "ip_frag":
+            # The datapath matches on both fragment bits
+            fields[field] = (packet_value(field, value), 3)
+            continue
+        try:
+            value, mask = match_value(field, value)
+        except ClassifierError:
+            continue
+        if mask != 0:
+            fields[field] = (value, mask)
+
+    signature = tuple(
+        sorted((field, mask) for field, (_, mask) in fields.items())
+    )
+    return signature, tuple(fields[field][0] for field, _ in signature)
+
+
+def _flatten(kvs):
+    """Yields the (name, value) of the match key-values flattening the
+    nested ones"""
+    for kv in kvs:
+        if isinstance(kv.value, dict):
+            for key, value in kv.value.items():
+                yield "{}.{}".format(kv.key, key), value
+        else:
+            yield kv.key, kv.value
+
+
+class Candidate:
+    """Candidate is an OpenFlow flow that could have generated a datapath
+    flow
+
+    Attributes:
+        table (int): the table of the flow
+        flow (OFPFlow): the OpenFlow flow
+        certain (bool): whether the flow matches every packet of the
+            datapath flow (if the table is reached)
+    """
+
+    def __init__(self, table, flow, certain):
+        self.table = table
+        self.flow = flow
+        self.certain = certain
+
+    def dict(self):
+        """Returns the candidate as a dictionary"""
+        return {
+            "table": self.table,
+            "flow": self.flow.orig,
+            "certain": self.certain,
+        }
+
+
+class _Index:
+    """_Index holds the OpenFlow flows of a table that match on the same
+    packet fields with the same masks"""
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.max_priority = -1
+        # Masked values -> list of (priority, flow, certain)
+        self.rules = dict()
+
+    def add(self, key, priority, flow, certain):
+        self.rules.setdefault(key, list()).append((priority, flow, certain))
+        self.max_priority = max(self.max_priority, priority)
+
+    def sort(self):
+        for rules in self.rules.values():
+            # sort is stable so flows with the same priority keep their order
+            rules.sort(key=lambda rule: rule[0], reverse=True)
+
+
+class Attributor:
+    """Attributor finds the OpenFlow flows that could have generated each
+    datapath flow
+
+    Args:
+        classifier (Classifier): the classifier holding the OpenFlow flows
+            (their actions must be decoded to identify conjunctive flows)
+    """
+
+    def __init__(self, classifier):
+        # table -> list of _Index sorted by decreasing max priority
+        self.tables = dict()
+        # datapath signature -> list of (table, [(index, projection)])
+        self._projections = dict()
+
+        for table_id, table in classifier.tables.items():
+            indexes = dict()
+            for subtable in table.subtables.values():
+                positions = [
+                    i
+                    for i, (field, _) in enumerate(subtable.signature)
+                    if field in _packet_fields
+                ]
+                signature = tuple(subtable.signature[i] for i in positions)
+                index = indexes.get(signature)
+                if index is None:
+                    index = indexes[signature] = _Index(signature)
+                certain = len(positions) == len(subtable.signature)
+                for key, rules in subtable.rules.items():
+                    index_key = tuple(key[i] for i in positions)
+                    for priority, flow in rules:
+                        index.add(
+                            index_key,
+                            priority,
+                            flow,
+                            certain
+                            and not any(
+                                kv.key == "conjunction"
+                                for kv in flow.actions_kv
+                            ),
+                        )
+            for index in indexes.values():
+                index.sort()
+            self.tables[table_id] = sorted(
+                indexes.values(),
+                key=lambda index: index.max_priority,
+                reverse=True,
+            )
+
+    def _compatible(self, signature):
+        """Returns the indexes of each table that are compatible with a
+        datapath signature and their projections"""
+        result = self._projections.get(signature)
+        if result is None:
+            result = list()
+            for table_id in sorted(self.tables):
+                indexes = list()
+                for index in self.tables[table_id]:
+                    proj = projection(index.signature, signature)
+                    if proj is not None:
+                        indexes.append((index, proj))
+                result.append((table_id, indexes))
+            self._projections[signature] = result
+        return result
+
+    def attribute(self, flow):
+        """Returns the OpenFlow flows that could have generated a datapath
+        flow
+
+        Args:
+            flow (ODPFlow): the datapath flow
+
+        Returns:
+            A list of Candidate sorted by table and decreasing priority
+        """
+        signature, key = odp_match_key(flow)
+        result = list()
+        for table_id, indexes in self._compatible(signature):
+            # Priority of the highest priority certain candidate
+            best = None
+            candidates = list()
+            for index, proj in indexes:
+                if best is not None and index.max_priority < best:
+                    break
+                for priority, of_flow, certain in (
+                    index.rules.get(project(key, proj)) or []
+                ):
+                    if best is not None and priority < best:
+                        break
+                    candidates.append((priority, of_flow, certain))
+                    if certain:
+                        best = max(best or priority, priority)
+                        break
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            result.extend(
+                Candidate(table_id, of_flow, certain)
+                for priority, of_flow, certain in candidates
+                if best is None or priority >= best
+            )
+        return result
@@ -0,0 +1,504 @@
+""" Defines an offline OpenFlow classifier
+
+The classifier is organized like the one in ovs-vswitchd (tuple space
+search): the flows of each table are grouped into subtables, one per mask
+signature (see ovs_dbg.masks), and each subtable is a hash table indexed by
+the masked values of its fields. A lookup probes the subtables in decreasing
+order of maximum priority and stops as soon as no remaining subtable can
+contain a higher priority match, so its cost depends on the number of
+subtables, not on the number of flows.
+
+Packets are dictionaries of field values indexed by the canonical field name
+(see ovs_dbg.masks.ofp_aliases). Values can be integers, netaddr objects or
+strings (e.g: "10.0.0.1", "00:11:22:33:44:55", "0x12" or "+trk+est" for
+ct_state). As in ovs-vswitchd, fields that are not present in the packet are
+considered zero.
+"""
+
+import re
+
+import netaddr
+
+from ovs_dbg.decoders import IntMask, IPMask, EthMask
+from ovs_dbg.masks import ofp_aliases, ofp_match_kv, value_mask
+
+_flags = {
+    "ct_state": {
+        "new": 0x01,
+        "est": 0x02,
+        "rel": 0x04,
+        "rpl": 0x08,
+        "inv": 0x10,
+        "trk": 0x20,
+        "snat": 0x40,
+        "dnat": 0x80,
+    },
+    "tcp_flags": {
+        "fin": 0x001,
+        "syn": 0x002,
+        "rst": 0x004,
+        "psh": 0x008,
+        "ack": 0x010,
+        "urg": 0x020,
+        "ece": 0x040,
+        "cwr": 0x080,
+        "ns": 0x100,
+    },
+}
+
+# ip_frag values and their (value, mask) on the two fragment bits
+# (bit 0: is a fragment, bit 1: is a later fragment)
+_frag = {
+    "no": (0, 1),
+    "yes": (1, 1),
+    "first": (1, 3),
+    "later": (3, 3),
+    "not_later": (0, 2),
+}
+
+_flag_re = re.compile(r"([+-])([a-z_]+)")
+
+# Fields whose string values can be IP or Ethernet addresses
+_ip_fields = {
+    "ip_src",
+    "ip_dst",
+    "ipv6_src",
+    "ipv6_dst",
+    "arp_spa",
+    "arp_tpa",
+    "nd_target",
+    "tun_src",
+    "tun_dst",
+    "tun_ipv6_src",
+    "tun_ipv6_dst",
+    "ct_nw_src",
+    "ct_nw_dst",
+    "ct_ipv6_src",
+    "ct_ipv6_dst",
+}
+_eth_fields = {"eth_src", "eth_dst", "arp_sha", "arp_tha", "nd_sll", "nd_tll"}
+
+
+class ClassifierError(ValueError):
+    """Error raised when a flow cannot be added to the classifier"""
+
+
+def _decode_flags(field, value):
+    """Decode a flag string (e.g: "+trk-new") into a (value, mask) tuple or
+    None if the field has no flags"""
+    flags = _flags.get(field)
+    if flags is None:
+        return None
+    result = 0
+    mask = 0
+    for sign, flag in _flag_re.findall(value):
+        bit = flags.get(flag)
+        if bit is None:
+            return None
+        mask |= bit
+        if sign == "+":
+            result |= bit
+    if not mask:
+        return None
+    return result, mask
+
+
+def match_value(field, value):
+    """Returns the (value, mask) tuple a flow matches a field on
+
+    Args:
+        field (str): the canonical field name
+        value (Any): the decoded match value
+
+    Returns:
+        A (value, mask) tuple. The value is an int unless the field cannot
+        be represented numerically (e.g: a port name), in which case it is a
+        string. The mask is None if the field is matched exactly
+
+    Raises:
+        ClassifierError if the value cannot be matched
+    """
+    if isinstance(value, IntMask):
+        mask = value_mask(value)
+        return (value.value if mask is None else value.value & mask), mask
+    if isinstance(value, IPMask):
+        mask = value_mask(value)
+        ip = int(value.ip)
+        return (ip if mask is None else ip & mask), mask
+    if isinstance(value, EthMask):
+        mask = value_mask(value)
+        eth = int(value.eth)
+        return (eth if mask is None else eth & mask), mask
+    if isinstance(value, bool):
+        raise ClassifierError("Cannot match on flag {}".format(field))
+    if isinstance(value, int):
+        return value, None
+    if isinstance(value, str):
+        if field == "ip_frag" and value in _frag:
+            frag, mask = _frag[value]
+            return frag, mask
+        flags = _decode_flags(field, value)
+        if flags is not None:
+            return flags
+        if "/" in value:
+            try:
+                val, mask = (int(part, 0) for part in value.split("/"))
+                return val & mask, mask
+            except ValueError:
+                pass
+        return value, None
+    raise ClassifierError(
+        "Cannot match on {}={} ({})".format(field, value, type(value))
+    )
+
+
+def match_key(flow):
+    """Returns the mask signature of a flow and the values it matches on
+
+    Args:
+        flow (OFPFlow): the flow
+
+    Returns:
+        A (signature, key) tuple where signature is a tuple of (field, mask)
+        tuples sorted by field and key is the tuple of the (masked) values
+        of those fields
+
+    Raises:
+        ClassifierError if the flow cannot match any packet
+    """
+    fields = dict()
+    for kv in ofp_match_kv(flow.match_kv):
+        value, mask = match_value(kv.key, kv.value)
+        if mask == 0:
+            continue
+        if kv.key in fields and fields[kv.key] != (value, mask):
+            # e.g: "tcp,ipv6": the flow cannot match any packet
+            raise ClassifierError("Conflicting matches on {}".format(kv.key))
+        fields[kv.key] = (value, mask)
+
+    signature = tuple(
+        sorted((field, mask) for field, (_, mask) in fields.items())
+    )
+    return signature, tuple(fields[field][0] for field, _ in signature)
+
+
+def projection(outer, inner):
+    """Returns how the flows of a signature are projected onto another one
+    whose flows match on a subset of their fields
+
+    Args:
+        outer (tuple): the mask signature to project onto
+        inner (tuple): the mask signature of the projected flows
+
+    Returns:
+        None if some flows of the inner signature match packets that the
+        outer signature does not constrain enough (i.e: the outer signature
+        has a field that the inner one does not match on or matches on with
+        fewer mask bits). Otherwise, a list of (index, mask) tuples where
+        index is the position of each outer field in the inner signature and
+        mask is the outer mask to apply to the inner value (None if the value
+        is used as is)
+    """
+    inner_fields = {field: i for i, (field, _) in enumerate(inner)}
+    result = list()
+    for field, mask in outer:
+        index = inner_fields.get(field)
+        if index is None:
+            return None
+        inner_mask = inner[index][1]
+        if mask is None:
+            if inner_mask is not None:
+                return None
+            result.append((index, None))
+        else:
+            if inner_mask is not None and inner_mask & mask != mask:
+                return None
+            result.append((index, mask))
+    return result
+
+
+def project(key, projection):
+    """Returns the key of a flow in the signature it is projected onto (see
+    projection) or None if it cannot be masked"""
+    result = list()
+    for index, mask in projection:
+        value = key[index]
+        if mask is not None:
+            if not isinstance(value, int):
+                return None
+            value &= mask
+        result.append(value)
+    return tuple(result)
+
+
+def packet_value(field, value):
+    """Returns the value of a packet field in the representation used by the
+    classifier (an int or, if it cannot be represented numerically, a
+    string)"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (netaddr.IPAddress, netaddr.EUI)):
+        return int(value)
+    if isinstance(value, IPMask):
+        return int(value.ip)
+    if isinstance(value, EthMask):
+        return int(value.eth)
+    if isinstance(value, IntMask):
+        return value.value
+    if not isinstance(value, str):
+        return value
+
+    try:
+        return int(value, 0)
+    except ValueError:
+        pass
+    if field == "ip_frag" and value in _frag:
+        return _frag[value][0]
+    if field in _flags:
+        flags = _decode_flags(
+            field, "".join("+" + flag for flag in re.split(r"[|,+]", value))
+        )
+        if flags is not None:
+            return flags[0]
+    if field in _ip_fields or field in _eth_fields:
+        cls = netaddr.IPAddress if field in _ip_fields else netaddr.EUI
+        try:
+            return int(cls(value))
+        except (netaddr.AddrFormatError, ValueError, TypeError):
+            pass
+    elif value.isdigit():
+        # Decimals with leading zeros (e.g: "01")
+        return int(value)
+    return value
+
+
+class Subtable:
+    """Subtable holds the flows of a table that match on the same fields
+    with the same masks
+
+    Args:
+        signature (tuple): the mask signature of the subtable
+    """
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.max_priority = -1
+        # Masked values -> list of (priority, flow) sorted by priority
+        self.rules = dict()
+
+    def __len__(self):
+        return sum(len(rules) for rules in self.rules.values())
+
+    def add(self, key, priority, flow):
+        """Add a flow
+
+        Args:
+            key (tuple): the masked values of the subtable fields
+            priority (int): the priority of the flow
+            flow (OFPFlow): the flow
+        """
+        rules = self.rules.setdefault(key, list())
+        index = len(rules)
+        # Flows with the same priority keep their insertion order
+        while index and rules[index - 1][0] < priority:
+            index -= 1
+        rules.insert(index, (priority, flow))
+        self.max_priority = max(self.max_priority, priority)
+
+    def matches(self, packet):
+        """Returns the list of (priority, flow) that match the packet (which
+        has been converted with packet_value) sorted by decreasing
+        priority"""
+        key = list()
+        for field, mask in self.signature:
+            value = packet.get(field, 0)
+            if mask is not None:
+                if not isinstance(value, int):
+                    return []
+                value &= mask
+            key.append(value)
+        return self.rules.get(tuple(key)) or []
+
+    def lookup(self, packet):
+        """Returns the highest priority (priority, flow) that matches the
+        packet (which has been converted with packet_value) or None"""
+        rules = self.matches(packet)
+        return rules[0] if rules else None
+
+
+class Table:
+    """Table holds the subtables of an OpenFlow table"""
+
+    def __init__(self):
+        self.subtables = dict()
+        self._sorted = None
+        # Insertion order of the flows, to break priority ties
+        self._order = dict()
+
+    def __len__(self):
+        return sum(len(subtable) for subtable in self.subtables.values())
+
+    def add(self, signature, key, priority, flow):
+        """Add a flow to the subtable of its signature"""
+        subtable = self.subtables.get(signature)
+        if subtable is None:
+            subtable = self.subtables[signature] = Subtable(signature)
+        subtable.add(key, priority, flow)
+        self._order.setdefault(id(flow), len(self._order))
+        self._sorted = None
+
+    def sorted_subtables(self):
+        """Returns the subtables sorted by decreasing maximum priority"""
+        if self._sorted is None:
+            self._sorted = sorted(
+                self.subtables.values(),
+                key=lambda subtable: subtable.max_priority,
+                reverse=True,
+            )
+        return self._sorted
+
+    def lookup(self, packet):
+        """Returns the highest priority (priority, flow) that matches the
+        packet (which has been converted with packet_value) or None"""
+        best = None
+        for subtable in self.sorted_subtables():
+            # A subtable with the same maximum priority can still hold a
+            # flow that was added before the best one
+            if best is not None and best[0] > subtable.max_priority:
+                break
+            match = subtable.lookup(packet)
+            if match is not None and (
+                best is None or self._rank(match) < self._rank(best)
+            ):
+                best = match
+        return best
+
+    def _rank(self, match):
+        """Returns the sort key of a (priority, flow) match: decreasing
+        priority and then insertion order"""
+        return -match[0], self._order[id(match[1])]
+
+    def matches(self, packet):
+        """Returns the list of (priority, flow) that match the packet (which
+        has been converted with packet_value) sorted by decreasing
+        priority"""
+        result = list()
+        for subtable in self.sorted_subtables():
+            result.extend(subtable.matches(packet))
+        result.sort(key=self._rank)
+        return result
+
+
+class Classifier:
+    """Classifier finds the highest priority OpenFlow flow that matches a
+    packet in each table
+
+    Flows with the same priority that match the same packet are considered
+    in the order they were added (as in ovs-vswitchd, which flow wins is
+    otherwise undefined).
+
+    Args:
+        flows (iterable[OFPFlow]): Optional; the flows to add. Their match
+            section and their table must be decoded
+    """
+
+    def __init__(self, flows=None):
+        self.tables = dict()
+        for flow in flows or []:
+            self.add(flow)
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+    def add(self, flow):
+        """Add a flow to the classifier
+
+        Args:
+            flow (OFPFlow): the flow to add
+
+        Raises:
+            ClassifierError if the flow cannot be added
+        """
+        signature, key = match_key(flow)
+        table = self.tables.get(flow.info.get("table", 0))
+        if table is None:
+            table = self.tables[flow.info.get("table", 0)] = Table()
+        table.add(signature, key, flow.match.get("priority", 32768), flow)
+
+    @staticmethod
+    def packet(fields):
+        """Converts the field values of a packet into the representation used
+        by the classifier
+
+        Args:
+            fields (dict): the packet field values indexed by field name
+                (aliases are accepted)
+
+        Returns:
+            A dict that can be passed to lookup
+        """
+        result = dict()
+        for field, value in fields.items():
+            field = ofp_aliases.get(field, field)
+            result[field] = packet_value(field, value)
+        return result
+
+    def lookup(self, packet, table=0, converted=False):
+        """Returns the highest priority flow of a table that matches a packet
+
+        Args:
+            packet (dict): the packet field values indexed by field name
+            table (int): Optional; the table to look up. Default: 0
+            converted (bool): Optional; whether the packet has already been
+                converted with Classifier.packet (saves the conversion when
+                the same packet is looked up several times)
+
+        Returns:
+            The matching OFPFlow or None
+        """
+        subtables = self.tables.get(table)
+        if subtables is None:
+            return None
+        if not converted:
+            packet = self.packet(packet)
+        match = subtables.lookup(packet)
+        return match[1] if match else None
+
+    def matches(self, packet, table=0, converted=False):
+        """Returns all the flows of a table that match a packet
+
+        Unlike lookup, all the subtables are probed.
+
+        Args:
+            packet (dict): the packet field values indexed by field name
+            table (int): Optional; the table to look up. Default: 0
+            converted (bool): Optional; whether the packet has already been
+                converted with Classifier.packet
+
+        Returns:
+            A list of (priority, OFPFlow) tuples sorted by decreasing priority
+        """
+        subtables = self.tables.get(table)
+        if subtables is None:
+            return []
+        if not converted:
+            packet = self.packet(packet)
+        return subtables.matches(packet)
+
+    def lookup_all(self, packet):
+        """Returns the highest priority flow of each table that matches a
+        packet
+
+        Args:
+            packet (dict): the packet field values indexed by field name
+
+        Returns:
+            A dict of the matching OFPFlows indexed by table
+        """
+        packet = self.packet(packet)
+        result = dict()
+        for table_id in sorted(self.tables):
+            flow = self.lookup(packet, table_id, converted=True)
+            if flow is not None:
+                result[table_id] = flow
+        return result
@@ -0,0 +1,223 @@
+""" Defines the detection of flows that could be consolidated using
+conjunctive matches
+
+Flows of a table that have the same priority and actions and only differ in
+the values of two fields often form a cross product: for each value of the
+first field (A) there is a flow for each value of the second one (B). Such
+|A| x |B| flows can be replaced by |A| flows with conjunction(id,1/2)
+actions, |B| flows with conjunction(id,2/2) actions and a single flow that
+matches on conj_id=id and executes the actions, i.e: |A| + |B| + 1 flows.
+
+Only complete cross products are detected. Flows that only differ in the
+value of one field cannot be reduced with conjunctive matches.
+"""
+
+import collections
+import itertools
+
+from ovs_dbg.classifier import ClassifierError, match_key
+from ovs_dbg.masks import ofp_aliases
+
+
+class CrossProduct:
+    """CrossProduct is a group of flows that could be replaced by a
+    conjunctive match
+
+    Attributes:
+        table (int): the table of the flows
+        priority (int): the priority of the flows
+        actions (str): the actions of the flows
+        fields (tuple[str]): the two fields the flows differ in
+        dimensions (tuple[list[str]]): the values of each of the fields
+        common (dict): the values of the other fields
+        example (OFPFlow): one of the flows
+    """
+
+    def __init__(
+        self, table, priority, actions, fields, dimensions, common, example
+    ):
+        self.table = table
+        self.priority = priority
+        self.actions = actions
+        self.fields = fields
+        self.dimensions = dimensions
+        self.common = common
+        self.example = example
+
+    @property
+    def flows(self):
+        """The number of flows"""
+        return len(self.dimensions[0]) * len(self.dimensions[1])
+
+    @property
+    def conjunctive_flows(self):
+        """The number of flows needed with a conjunctive match"""
+        return len(self.dimensions[0]) + len(self.dimensions[1]) + 1
+
+    @property
+    def savings(self):
+        """The number of flows that a conjunctive match would save"""
+        return self.flows - self.conjunctive_flows
+
+    def dict(self):
+        """Returns the cross product as a dictionary"""
+        return {
+            "table": self.table,
+            "priority": self.priority,
+            "actions": self.actions,
+            "fields": {
+                field: values
+                for field, values in zip(self.fields, self.dimensions)
+            },
+            "common": self.common,
+            "flows": self.flows,
+            "conjunctive_flows": self.conjunctive_flows,
+            "savings": self.savings,
+        }
+
+
+class _Group:
+    """_Group holds the flows of a table with the same priority, actions and
+    mask signature"""
+
+    def __init__(self, flow):
+        self.example = flow
+        self.keys = set()
+
+
+class ConjunctionAdvisor:
+    """ConjunctionAdvisor finds groups of OpenFlow flows that could be
+    replaced by conjunctive matches
+
+    Flows are added one by one and only their match values are kept.
+
+    Args:
+        min_savings (int): Optional; the minimum number of flows a cross
+            product must save to be reported. Default: 1
+    """
+
+    def __init__(self, min_savings=1):
+        self.min_savings = min_savings
+        self.flows = 0
+        self._groups = dict()
+        # The original string of each (field, value) to print them
+        self._strings = dict()
+
+    def add(self, flow):
+        """Add a flow
+
+        Args:
+            flow (OFPFlow): the flow. Its match and actions must be decoded
+        """
+        self.flows += 1
+        if any(
+            kv.key == "conjunction" for kv in flow.actions_kv
+        ) or flow.match.get("conj_id"):
+            return
+        try:
+            signature, key = match_key(flow)
+        except ClassifierError:
+            return
+        if len(signature) < 2:
+            return
+
+        group_key = (
+            flow.info.get("table", 0),
+            flow.match.get("priority", 32768),
+            signature,
+            flow.section("actions").string.strip(),
+        )
+        group = self._groups.get(group_key)
+        if group is None:
+            group = self._groups[group_key] = _Group(flow)
+        if key not in group.keys:
+            group.keys.add(key)
+            for kv in flow.match_kv:
+                if kv.meta:
+                    field = ofp_aliases.get(kv.key, kv.key)
+                    index = _field_index(signature, field)
+                    if index is not None:
+                        self._strings.setdefault(
+                            (field, key[index]), kv.meta.vstring
+                        )
+
+    def _string(self, field, value):
+        """Returns the string representation of a field value"""
+        string = self._strings.get((field, value))
+        if string is not None:
+            return string
+        return hex(value) if isinstance(value, int) else str(value)
+
+    def cross_products(self):
+        """Returns the cross products that would save at least min_savings
+        flows sorted by decreasing savings"""
+        result = list()
+        for group_key, group in self._groups.items():
+            if len(group.keys) < 4:
+                continue
+            best = list()
+            for i, j in itertools.combinations(range(len(group_key[2])), 2):
+                found = self._cross_products(group_key, group, i, j)
+                if sum(c.savings for c in found) > sum(
+                    c.savings for c in best
+                ):
+                    best = found
+            result.extend(best)
+        result.sort(key=lambda cross: cross.savings, reverse=True)
+        return result
+
+    def _cross_products(self, group_key, group, i, j):
+        """Returns the cross products of a group on its i-th and j-th fields
+        that save at least min_savings flows"""
+        table, priority, signature, actions = group_key
+        fields = [field for field, _ in signature]
+        other_fields = fields[:i] + fields[i + 1 : j] + fields[j + 1 :]
+
+        partitions = collections.defaultdict(list)
+        for key in group.keys:
+            partitions[key[:i] + key[i + 1 : j] + key[j + 1 :]].append(key)
+
+        result = list()
+        for rest, keys in partitions.items():
+            first = {key[i] for key in keys}
+            second = {key[j] for key in keys}
+            if len(keys) != len(first) * len(second):
+                continue
+            cross = CrossProduct(
+                table,
+                priority,
+                actions,
+                (fields[i], fields[j]),
+                (
+                    self._strings_of(fields[i], first),
+                    self._strings_of(fields[j], second),
+                ),
+                {
+                    field: self._string(field, value)
+                    for field, value in zip(other_fields, rest)
+                },
+                group.example,
+            )
+            if cross.savings >= self.min_savings:
+                result.append(cross)
+        return result
+
+    def _strings_of(self, field, values):
+        """Returns the sorted string representations of field values"""
+        return [
+            self._string(field, value)
+            for value in sorted(
+                values,
+                key=lambda value: (
+                    (0, value, "") if isinstance(value, int) else (1, 0, value)
+                ),
+            )
+        ]
+
+
+def _field_index(signature, field):
+    """Returns the position of a field in a signature or None"""
+    for i, (name, _) in enumerate(signature):
+        if name == field:
+            return i
+    return None
@@ -16,6 +16,12 @@ class Decoder:
     def to_json(self):
         assert "function must be implemented by derived class"
 
+    @classmethod
+    def from_json(cls, value):
+        """Build the object from its JSON representation (i.e: the value
+        returned by to_json())"""
+        return cls(value)
+
 
 def decode_default(value):
     """Default decoder.
@@ -146,6 +152,14 @@ class IntMask(Decoder):
     def to_json(self):
         return self.dict()
 
+    @classmethod
+    def from_json(cls, value):
+        # Avoid formatting and parsing the value string again
+        obj = cls.__new__(cls)
+        obj._value = value["value"]
+        obj._mask = value["mask"]
+        return obj
+
 
 class Mask8(IntMask):
     size = 8
@@ -454,6 +468,20 @@ def decode_nat(value):
     return result
 
 
+def _decode_nat_json(value):
+    """Rebuilds the value of the 'nat' keyword from its JSON representation"""
+    if not isinstance(value, dict) or "addrs" not in value:
+        return value
+
+    addrs = {
+        key: netaddr.IPAddress(val) for key, val in value["addrs"].items()
+    }
+    return {**value, "addrs": addrs}
+
+
+decode_nat.from_json = _decode_nat_json
+
+
 class FlowEncoder(json.JSONEncoder):
     """FlowEncoder is a json.JSONEncoder instance that can be used to
     serialize flow fields
@@ -466,3 +494,99 @@ class FlowEncoder(json.JSONEncoder):
             return str(obj)
 
         return json.JSONEncoder.default(self, obj)
+
+
+# Types that json can serialize as-is
+_json_primitives = {str, int, float, bool, type(None)}
+
+
+def _encode_dict(value):
+    return {
+        key: val if val.__class__ in _json_primitives else encode_json(val)
+        for key, val in value.items()
+    }
+
+
+def _encode_list(value):
+    return [
+        val if val.__class__ in _json_primitives else encode_json(val)
+        for val in value
+    ]
+
+
+def _encode_decoder(value):
+    return encode_json(value.to_json())
+
+
+# Type-dispatch table used to convert values into JSON primitives. Derived
+# classes are added as they are found.
+_json_encoders = {
+    dict: _encode_dict,
+    list: _encode_list,
+    tuple: _encode_list,
+}
+
+# Encoders that also apply to derived classes
+_json_base_encoders = {
+    Decoder: _encode_decoder,
+    netaddr.IPAddress: str,
+    dict: _encode_dict,
+    list: _encode_list,
+    tuple: _encode_list,
+}
+
+
+def _json_encoder(cls):
+    """Returns the function that converts objects of class cls into JSON
+    primitives
+
+    Raises:
+        TypeError if objects of class cls cannot be represented in JSON
+    """
+    encoder = _json_encoders.get(cls)
+    if encoder is None:
+        base = next(
+            (base for base in cls.__mro__ if base in _json_base_encoders),
+            None,
+        )
+        if base is None:
+            raise TypeError(
+                "Object of type {} is not JSON serializable".format(
+                    cls.__name__
+                )
+            )
+        encoder = _json_encoders[cls] = _json_base_encoders[base]
+    return encoder
+
+
+def encode_json(value):
+    """Converts a flow value into JSON-serializable primitives (i.e: dict,
+    list, str, int, float, bool and None)
+
+    It produces the same representation as FlowEncoder, but the result can
+    be serialized (or stored) without a custom encoder.
+
+    Raises:
+        TypeError if the value cannot be represented in JSON
+    """
+    if value.__class__ in _json_primitives:
+        return value
+    return _json_encoder(value.__class__)(value)
+
+
+def decode_json(decoder, value):
+    """Rebuilds a decoded value from its JSON representation (see
+    encode_json) without decoding the original string
+
+    Decoders that produce values that JSON cannot represent natively provide
+    a from_json attribute that performs the conversion. Values of other
+    decoders are returned as they are.
+
+    Args:
+        decoder (callable): the decoder that produced the value
+        value (any): the JSON representation of the value
+    """
+    from_json = getattr(decoder, "from_json", None)
+    if from_json is None:
+        return value
+    return from_json(value)
@@ -1,5 +1,6 @@
 """ Defines a Flow Filtering syntax
 """
+import re
 import pyparsing as pp
 import netaddr
 from functools import reduce
@@ -52,6 +53,9 @@ class EvaluationResult:
 
 class ClauseExpression:
     operators = {}
+    # Keys that decoders might generate without them appearing in the flow
+    # string (e.g: free output ports)
+    implicit_keys = {"output"}
     type_decoders = {
         int: decode_int,
         netaddr.IPAddress: IPMask,
@@ -73,6 +77,21 @@ class ClauseExpression:
             self.__class__.__name__, self.field, self.operator, self.value
         )
 
+    def keys(self):
+        """Return the set of top-level keys the clause evaluates"""
+        return {self.field.split(".")[0]}
+
+    def substrings(self):
+        """Return the substrings a flow string must contain for the clause to
+        be satisfied, expressed in conjunctive normal form (see
+        OFFilter.prefilter)
+        """
+        key = self.field.split(".")[0]
+        if key in self.implicit_keys:
+            return []
+        # The clause can only be satisfied if the key is present
+        return [{key}]
+
     def _find_data_in_kv(self, kv_list):
         """Find a KeyValue for evaluation in a list of KeyValue
 
@@ -167,6 +186,13 @@ class BoolNot:
     def __repr__(self):
         return "NOT({})".format(self.args)
 
+    def keys(self):
+        return self.args.keys()
+
+    def substrings(self):
+        # Negated clauses can match flows without the key
+        return []
+
     def evaluate(self, flow):
         return ~self.args.evaluate(flow)
 
@@ -178,14 +204,37 @@ class BoolAnd:
     def __repr__(self):
         return "AND({})".format(self.args)
 
+    def keys(self):
+        return set().union(*[arg.keys() for arg in self.args])
+
+    def substrings(self):
+        return [subs for arg in self.args for subs in arg.substrings()]
+
     def evaluate(self, flow):
         return reduce(and_, [arg.evaluate(flow) for arg in self.args])
 
 
 class BoolOr:
+    # Maximum number of conjunctive terms to keep when distributing OR
+    max_terms = 16
+
     def __init__(self, pattern):
         self.args = pattern[0][0::2]
 
+    def keys(self):
+        return set().union(*[arg.keys() for arg in self.args])
+
+    def substrings(self):
+        # (a1 & a2) | (b1 & b2) = (a1 | b1) & (a1 | b2) & (a2 | b1) & ...
+        result = [set()]
+        for arg in self.args:
+            terms = arg.substrings()
+            if not terms or len(result) * len(terms) > self.max_terms:
+                # Dropping terms only makes the prefilter less selective
+                return []
+            result = [prev | term for prev in result for term in terms]
+        return result
+
     def evaluate(self, flow):
         return reduce(or_, [arg.evaluate(flow) for arg in self.args])
 
@@ -220,6 +269,43 @@ class OFFilter:
 
     def __init__(self, expr):
         self._filter = self.statement.parseString(expr)
+        self._prefilter = [
+            self._term_matcher(term) for term in self._filter[0].substrings()
+        ]
+
+    @staticmethod
+    def _term_matcher(term):
+        """Return a callable that checks whether a string contains any of the
+        substrings in term"""
+        if len(term) == 1:
+            substring = next(iter(term))
+            return lambda line: substring in line
+
+        return re.compile(
+            "|".join(re.escape(substring) for substring in sorted(term))
+        ).search
+
+    def prefilter(self, line):
+        """Quickly determine whether a flow string could match the filter
+        without parsing it
+
+        The filter clauses are translated into a list of terms (in conjunctive
+        normal form) each of them being a set of substrings of which the flow
+        string must contain at least one.
+
+        Args:
+            line (str): the flow string
+
+        Returns:
+            False if the flow built from the string cannot match the filter,
+            True otherwise
+        """
+        return all(matcher(line) for matcher in self._prefilter)
+
+    def keys(self):
+        """Return the set of top-level keys the filter needs to evaluate a
+        flow"""
+        return self._filter[0].keys()
 
     def evaluate(self, flow):
         return self._filter[0].evaluate(flow)
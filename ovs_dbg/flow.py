@@ -1,6 +1,8 @@
 """ Defines the Flow class
 """
 
+from ovs_dbg.decoders import encode_json
+
 
 class Section(object):
     """A section within a Flow
@@ -30,6 +32,13 @@ class Section(object):
     def dict(self):
         return {self.name: self.format_data()}
 
+    def to_json(self):
+        """Returns the section data as JSON-serializable primitives"""
+        if self.is_list:
+            return [encode_json({item.key: item.value}) for item in self.data]
+        else:
+            return encode_json({item.key: item.value for item in self.data})
+
     def format_data(self):
         if self.is_list:
             return [{item.key: item.value} for item in self.data]
@@ -37,6 +46,23 @@ class Section(object):
             return {item.key: item.value for item in self.data}
 
 
+def section_keys(keys, name):
+    """Return the keys that need to be decoded in a section
+
+    Args:
+        keys (set): the keys (or section names) to decode or None if all keys
+            must be decoded
+        name (str): the name of the section
+
+    Returns:
+        The set of keys to decode in the section or None if all of them have
+        to be decoded
+    """
+    if keys is None or name in keys:
+        return None
+    return keys
+
+
 class Flow(object):
     """The Flow class is a base class for other types of concrete flows
     (such as OFproto Flows or DPIF Flows)
@@ -55,6 +81,8 @@ class Flow(object):
         self._sections = sections
         self._orig = orig
         self._id = id
+        self._dict = None
+        self._json = None
         for section in sections:
             setattr(
                 self, section.name, self.section(section.name).format_data()
@@ -86,9 +114,26 @@ class Flow(object):
         return self._orig
 
     def dict(self):
-        """Returns the Flow information in a dictionary"""
-        flow_dict = {"orig": self.orig}
-        for section in self.sections:
-            flow_dict.update(section.dict())
+        """Returns the Flow information in a dictionary
+
+        The dictionary is built once and cached, it must not be modified.
+        """
+        if self._dict is None:
+            self._dict = {"orig": self.orig}
+            for section in self.sections:
+                self._dict[section.name] = getattr(self, section.name)
+
+        return self._dict
+
+    def to_json(self):
+        """Returns the Flow information in a dictionary of JSON-serializable
+        primitives (see decoders.encode_json)
+
+        The dictionary is built once and cached, it must not be modified.
+        """
+        if self._json is None:
+            self._json = {"orig": self.orig}
+            for section in self.sections:
+                self._json[section.name] = section.to_json()
 
-        return flow_dict
+        return self._json
@@ -4,7 +4,7 @@
 import re
 import functools
 
-from ovs_dbg.decoders import decode_default
+from ovs_dbg.decoders import decode_default, decode_json
 
 
 class ParseError(RuntimeError):
@@ -125,6 +125,22 @@ class KVDecoders:
             else:
                 return self._default_free(keyword)
 
+    def from_json(self, keyword, value):
+        """Rebuild the value of a keyword from its JSON representation.
+
+        Args:
+            keyword (str): The keyword (as stored, i.e: after decoding).
+            value (any): The JSON representation of the value.
+
+        Returns:
+            The value to be stored.
+        """
+        decoder = self._decoders.get(keyword)
+        if decoder is None:
+            # Values of the default decoders are JSON primitives
+            return value
+        return decode_json(decoder, value)
+
     @staticmethod
     def _default_free_decoder(key):
         """Default decoder for free kewords."""
@@ -157,38 +173,38 @@ class KVParser:
     def __iter__(self):
         return iter(self._keyval)
 
-    def parse(self, string):
-        """Parse the key-value pairs in string.
+    def _scan(self, string):
+        """Scan the key-value pairs in string.
+
+        The string is scanned from an offset, without slicing the remainder
+        at each step.
 
         Args:
-            string (str): the string to parse.
+            string (str): the string to scan.
+
+        Yields:
+            (kpos, vpos, keyword, delimiter, value_str, end_delimiter) tuples
 
         Raises:
             ParseError if any parsing error occurs.
         """
         kpos = 0
-        while kpos < len(string) and string[kpos] != "\n":
-            keyword = ""
-            delimiter = ""
-            rest = ""
-
+        length = len(string)
+        while kpos < length and string[kpos] != "\n":
             if string[kpos] == "," or string[kpos] == " ":
                 kpos += 1
                 continue
 
-            split_parts = delim_pattern.split(string[kpos:], 1)
-
-            if len(split_parts) == 0:
-                break
-
-            keyword = split_parts[0]
-
-            if len(split_parts) == 3:
-                # The delimiter should be included in the returned list.
-                # If not at the end of the line, we should have 3
-                # parts [keyword, delimiter, rest].
-                delimiter = split_parts[1]
-                rest = split_parts[2]
+            match = delim_pattern.search(string, kpos)
+            if match:
+                # [keyword, delimiter, rest].
+                keyword = string[kpos : match.start()]
+                delimiter = match.group(1)
+                rpos = match.end()
+            else:
+                keyword = string[kpos:]
+                delimiter = ""
+                rpos = length
 
             value_str = ""
             vpos = kpos + len(keyword) + 1
@@ -198,21 +214,18 @@ class KVParser:
             # If the delimiter is ':' or '=', the end of the value is the end
             # of the string or a ', '
             if delimiter in ("=", ":"):
-                value_parts = end_pattern.split(rest, 1)
-                value_str = value_parts[0] if len(value_parts) == 3 else rest
+                end = end_pattern.search(string, rpos)
+                value_str = string[rpos : end.start() if end else length]
                 next_kpos = vpos + len(value_str)
 
             elif delimiter == "(":
                 # Find the next ')'
                 level = 1
-                index = 0
-                value_parts = parenthesys_pattern.split(rest)
-                for val in value_parts:
-                    if val == "(":
+                for par in parenthesys_pattern.finditer(string, rpos):
+                    if par.group(1) == "(":
                         level += 1
-                    elif val == ")":
+                    else:
                         level -= 1
-                    index += len(val)
                     if level == 0:
                         break
 
@@ -220,51 +233,164 @@ class KVParser:
                     raise ParseError(
                         "Error parsing string {}: "
                         "Failed to find matching ')' in {}".format(
-                            string, rest
+                            string, string[rpos:]
                         )
                     )
 
-                value_str = rest[: index - 1]
-                next_kpos = vpos + len(value_str) + 1
+                close = par.start()
+                value_str = string[rpos:close]
+                next_kpos = close + 1
                 end_delimiter = ")"
 
                 # Exceptionally, if after the () we find -> {}, do not treat
                 # the content of the parenthesis as the value, consider
                 # ({})->{} as the string value
-                if index < len(rest) - 2 and rest[index : index + 2] == "->":
-                    extra_val = rest[index + 2 :].split(",")[0]
+                if (
+                    close + 1 < length - 2
+                    and string[close + 1 : close + 3] == "->"
+                ):
+                    extra_end = string.find(",", close + 3)
+                    extra_val = string[
+                        close + 3 : extra_end if extra_end >= 0 else length
+                    ]
                     value_str = "({})->{}".format(value_str, extra_val)
                     # remove the first "("
                     vpos -= 1
                     next_kpos = vpos + len(value_str)
                     end_delimiter = ""
 
-            elif delimiter in (",", "\n", "\t", "\r", ""):
+            else:
                 # key with no value
                 next_kpos = kpos + len(keyword)
                 vpos = -1
 
-            try:
-                key, val = self._decoders.decode(keyword, value_str)
-            except Exception as e:
-                raise ParseError(
-                    "Error parsing key-value ({}, {})".format(
-                        keyword, value_str
-                    )
-                ) from e
+            yield kpos, vpos, keyword, delimiter, value_str, end_delimiter
+
+            kpos = next_kpos
+
+    def _decode(self, keyword, value_str):
+        """Decode a keyword and value, wrapping errors in ParseError."""
+        try:
+            return self._decoders.decode(keyword, value_str)
+        except Exception as e:
+            raise ParseError(
+                "Error parsing key-value ({}, {})".format(keyword, value_str)
+            ) from e
+
+    def parse(self, string, keys=None):
+        """Parse the key-value pairs in string.
+
+        The result of any previous call to parse() is discarded.
+
+        Args:
+            string (str): the string to parse.
+            keys (set): Optional; the keywords whose values shall be decoded.
+                The values of other keywords are stored undecoded (i.e: as
+                the value string). Keywords without value are always
+                decoded. If None, all values are decoded.
+
+        Raises:
+            ParseError if any parsing error occurs.
+        """
+        self._keyval = list()
+        for kpos, vpos, keyword, delim, value_str, end_delim in self._scan(
+            string
+        ):
+            if keys is not None and value_str and keyword not in keys:
+                key, val = keyword, value_str
+            else:
+                key, val = self._decode(keyword, value_str)
 
             meta = KeyMetadata(
                 kpos=kpos,
                 vpos=vpos,
                 kstring=keyword,
                 vstring=value_str,
-                delim=delimiter,
-                end_delim=end_delimiter,
+                delim=delim,
+                end_delim=end_delim,
             )
 
             self._keyval.append(KeyValue(key, val, meta))
 
-            kpos = next_kpos
+    def from_json(self, string, data):
+        """Load the key-value pairs from their JSON representation (see
+        Flow.to_json) instead of decoding them from the string.
+
+        The result of any previous call to parse() is discarded.
+
+        Args:
+            string (str): the string the key-value pairs were parsed from. If
+                provided, it is scanned (but not decoded) to build the key
+                metadata.
+            data (dict or list): the JSON representation of the key-value
+                pairs, either a dictionary or a list of single-key
+                dictionaries.
+
+        Raises:
+            ParseError if any parsing error occurs.
+        """
+        if isinstance(data, list):
+            items = [item for kv in data for item in kv.items()]
+        else:
+            items = list(data.items())
+
+        scanned = list(self._scan(string)) if string else None
+        if scanned is not None and len(scanned) != len(items):
+            # Some keys were merged in the JSON representation (e.g:
+            # repeated keys in a dictionary) so the metadata cannot be
+            # matched, decode the string instead
+            self.parse(string)
+            return
+
+        self._keyval = list()
+        for i, (key, value) in enumerate(items):
+            meta = None
+            if scanned is not None:
+                kpos, vpos, keyword, delim, value_str, end_delim = scanned[i]
+                meta = KeyMetadata(
+                    kpos=kpos,
+                    vpos=vpos,
+                    kstring=keyword,
+                    vstring=value_str,
+                    delim=delim,
+                    end_delim=end_delim,
+                )
+            try:
+                value = self._decoders.from_json(key, value)
+            except Exception as e:
+                raise ParseError(
+                    "Error loading key-value ({}, {})".format(key, value)
+                ) from e
+
+            self._keyval.append(KeyValue(key, value, meta))
+
+    def decode(self, string, is_list=False):
+        """Decode the key-value pairs in string.
+
+        Unlike parse(), no KeyValue or KeyMetadata is created and the
+        internal state of the parser is left untouched, so a single parser
+        can be used to decode any number of (nested) values.
+
+        Args:
+            string (str): the string to decode.
+            is_list (bool): Optional; whether the key-values shall be
+                returned as a list of single-key dictionaries (e.g: it allows
+                repeated keys)
+
+        Returns:
+            A dictionary (or list of dictionaries if is_list is True) with
+            the decoded key-values.
+
+        Raises:
+            ParseError if any parsing error occurs.
+        """
+        decoded = (
+            self._decode(scanned[2], scanned[4])
+            for scanned in self._scan(string)
+        )
+        if is_list:
+            return [{key: val} for key, val in decoded]
+        return dict(decoded)
 
 
 def decode_nested_kv(decoders, value):
@@ -275,16 +401,37 @@ def decode_nested_kv(decoders, value):
         decoders (KVDecoders): the KVDecoders to use.
         value (str): the value string to decode.
     """
+    return _decode_nested_kv(KVParser(decoders), value)
+
+
+def _decode_nested_kv(parser, value):
+    """Same as decode_nested_kv but using an existing KVParser"""
     if not value:
         # Mark as flag
         return True
 
-    parser = KVParser(decoders)
-    parser.parse(value)
-    return {kv.key: kv.value for kv in parser.kv()}
+    return parser.decode(value)
+
+
+def _nested_kv_from_json(decoders, value):
+    """Rebuilds a value decoded by a nested kv decoder from its JSON
+    representation"""
+    if not isinstance(value, dict):
+        # Flag
+        return value
+
+    return {key: decoders.from_json(key, val) for key, val in value.items()}
 
 
 def nested_kv_decoder(decoders=None):
     """Helper function that creates a nested kv decoder with given
-    KVDecoders"""
-    return functools.partial(decode_nested_kv, decoders)
+    KVDecoders
+
+    The returned decoder reuses a single KVParser.
+    """
+    parser = KVParser(decoders)
+    decoder = functools.partial(_decode_nested_kv, parser)
+    decoder.from_json = functools.partial(
+        _nested_kv_from_json, parser._decoders
+    )
+    return decoder
@@ -1,5 +1,4 @@
 import re
-import functools
 
 from ovs_dbg.kv import KeyValue, KeyMetadata, ParseError
 from ovs_dbg.decoders import decode_default
@@ -51,6 +50,8 @@ class ListParser:
     """ListParser parses a list of values and stores them as key-value pairs
 
     It uses a ListDecoders instance to decode each element in the list.
+    The delimiter pattern is compiled once so the same ListParser can be
+    reused to parse many strings.
 
     Args:
         decoders (ListDecoders): Optional, the decoders to use
@@ -62,7 +63,7 @@ class ListParser:
         self._decoders = decoders or ListDecoders()
         self._keyval = list()
         delims = delims or [","]
-        self._regexp = r"({})".format("|".join(delims))
+        self._regexp = re.compile(r"({})".format("|".join(delims)))
 
     def kv(self):
         return self._keyval
@@ -70,24 +71,43 @@ class ListParser:
     def __iter__(self):
         return iter(self._keyval)
 
+    def _elements(self, string):
+        """Iterate over the elements of the list in string
+
+        Elements are found by scanning the string from an offset instead of
+        slicing it.
+
+        Args:
+            string (str): the string to scan
+
+        Yields:
+            (kpos, value_str) tuples with the position and string of each
+            element
+        """
+        kpos = 0
+        length = len(string)
+        while kpos < length and string[kpos] != "\n":
+            match = self._regexp.search(string, kpos)
+            if match:
+                yield kpos, string[kpos : match.start()]
+                kpos = match.end()
+            else:
+                yield kpos, string[kpos:]
+                break
+
     def parse(self, string):
         """Parse the list in string
 
+        The result of any previous call to parse() is discarded.
+
         Args:
             string (str): the string to parse
 
         Raises:
             ParseError if any parsing error occurs.
         """
-        kpos = 0
-        index = 0
-        while kpos < len(string) and string[kpos] != "\n":
-            split_parts = re.split(self._regexp, string[kpos:], 1)
-            if len(split_parts) == 0:
-                break
-
-            value_str = split_parts[0]
-
+        self._keyval = list()
+        for index, (kpos, value_str) in enumerate(self._elements(string)):
             key, value = self._decoders.decode(index, value_str)
 
             meta = KeyMetadata(
@@ -98,8 +118,23 @@ class ListParser:
             )
             self._keyval.append(KeyValue(key, value, meta))
 
-            kpos += len(value_str) + 1
-            index += 1
+    def decode(self, string):
+        """Decode the list in string into a dictionary
+
+        Unlike parse(), no KeyValue or KeyMetadata is created and the
+        internal state of the parser is left untouched.
+
+        Args:
+            string (str): the string to decode
+
+        Returns:
+            A dictionary with the decoded elements
+        """
+        decode = self._decoders.decode
+        return dict(
+            decode(index, value_str)
+            for index, (_, value_str) in enumerate(self._elements(string))
+        )
 
 
 def decode_nested_list(decoders, delims, value):
@@ -110,13 +145,13 @@ def decode_nested_list(decoders, delims, value):
         decoders (ListDecoders): the ListDecoders to use.
         value (str): the value string to decode.
     """
-    parser = ListParser(decoders, delims)
-    parser.parse(value)
-    return {kv.key: kv.value for kv in parser.kv()}
+    return ListParser(decoders, delims).decode(value)
 
 
 def nested_list_decoder(decoders=None, delims=None):
     """Helper function that creates a nested list decoder with given
     ListDecoders
+
+    The returned decoder reuses a single ListParser.
     """
-    return functools.partial(decode_nested_list, decoders, delims)
+    return ListParser(decoders, delims).decode
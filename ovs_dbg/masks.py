@@ -0,0 +1,186 @@
+""" Defines helpers to extract the masks that flows match on
+
+The mask of a field is represented by an int. Fields that are matched
+exactly have no mask (None) and fields whose mask is zero are wildcarded.
+Nested fields (e.g: datapath keys such as ipv4(src=...,dst=...)) are
+flattened and named "{key}.{subkey}" (e.g: ipv4.src).
+"""
+
+from ovs_dbg.decoders import IntMask, IPMask, EthMask
+from ovs_dbg.kv import KeyValue
+
+_ip_bits = {4: 32, 6: 128}
+_eth_bits = 48
+
+# OpenFlow field names that refer to the same field
+ofp_aliases = {
+    "dl_src": "eth_src",
+    "dl_dst": "eth_dst",
+    "dl_type": "eth_type",
+    "dl_vlan_pcp": "vlan_pcp",
+    "nw_src": "ip_src",
+    "nw_dst": "ip_dst",
+    "nw_proto": "ip_proto",
+    "nw_ecn": "ip_ecn",
+    "nw_frag": "ip_frag",
+    "tunnel_id": "tun_id",
+    "tcp_src": "tp_src",
+    "tcp_dst": "tp_dst",
+    "udp_src": "tp_src",
+    "udp_dst": "tp_dst",
+    "sctp_src": "tp_src",
+    "sctp_dst": "tp_dst",
+    "nsp": "nsh_spi",
+    "nsi": "nsh_si",
+    "nshc1": "nsh_c1",
+    "nshc2": "nsh_c2",
+    "nshc3": "nsh_c3",
+    "nshc4": "nsh_c4",
+}
+
+# OpenFlow protocol shorthands and the fields they match on
+ofp_shorthands = {
+    "eth": [],
+    "ip": [("eth_type", 0x0800)],
+    "ipv6": [("eth_type", 0x86DD)],
+    "icmp": [("eth_type", 0x0800), ("ip_proto", 1)],
+    "icmp6": [("eth_type", 0x86DD), ("ip_proto", 58)],
+    "tcp": [("eth_type", 0x0800), ("ip_proto", 6)],
+    "tcp6": [("eth_type", 0x86DD), ("ip_proto", 6)],
+    "udp": [("eth_type", 0x0800), ("ip_proto", 17)],
+    "udp6": [("eth_type", 0x86DD), ("ip_proto", 17)],
+    "sctp": [("eth_type", 0x0800), ("ip_proto", 132)],
+    "sctp6": [("eth_type", 0x86DD), ("ip_proto", 132)],
+    "arp": [("eth_type", 0x0806)],
+    "rarp": [("eth_type", 0x8035)],
+    "mpls": [("eth_type", 0x8847)],
+    "mplsm": [("eth_type", 0x8848)],
+}
+
+
+def value_mask(value):
+    """Returns the mask of a decoded match value
+
+    Args:
+        value (Any): the decoded value
+
+    Returns:
+        None if the value is matched exactly or its mask (int) otherwise
+    """
+    if isinstance(value, IntMask):
+        return None if value.fully() else value.mask
+    elif isinstance(value, IPMask):
+        mask = value.mask
+        if int(mask) == (1 << _ip_bits[mask.version]) - 1:
+            return None
+        return int(mask)
+    elif isinstance(value, EthMask):
+        mask = value.mask
+        if mask is None or int(mask) == (1 << _eth_bits) - 1:
+            return None
+        return int(mask)
+    elif isinstance(value, str) and "/" in value:
+        # Values that are not decoded (e.g: datapath's ct_state(0x21/0x3f))
+        try:
+            return int(value.split("/")[1], 0)
+        except ValueError:
+            pass
+    # Other values (including lists such as tunnel options) are considered
+    # matched exactly
+    return None
+
+
+def match_masks(kvs):
+    """Returns the masks of the fields a list of key-values match on
+
+    Flags and empty values (e.g: datapath keys such as eth()) do not match
+    on any field so they are left out. OpenFlow protocol shorthands (e.g:
+    tcp) must therefore be expanded first (see ofp_match_kv).
+
+    Args:
+        kvs (list[KeyValue]): the match key-values
+
+    Returns:
+        A list of (field, mask) tuples with the fields that are not
+        wildcarded
+    """
+    result = list()
+    for kv in kvs:
+        _value_masks(kv.key, kv.value, result)
+    return result
+
+
+def _value_masks(field, value, result):
+    """Append the (field, mask) tuples of a value to result"""
+    if value is True or (isinstance(value, dict) and not value):
+        return
+    if isinstance(value, dict):
+        for key, subvalue in value.items():
+            _value_masks("{}.{}".format(field, key), subvalue, result)
+        return
+    mask = value_mask(value)
+    if mask != 0:
+        result.append((field, mask))
+
+
+def ofp_match_kv(kvs):
+    """Returns the normalized key-values of an OpenFlow match
+
+    Aliases are replaced by the canonical field name (e.g: nw_src by ip_src)
+    and protocol shorthands are expanded into the fields they match on (e.g:
+    tcp into eth_type=0x0800,ip_proto=6). The priority, which is not a field,
+    is removed.
+
+    Args:
+        kvs (list[KeyValue]): the match key-values of an OFPFlow
+
+    Returns:
+        A list of KeyValues
+    """
+    result = list()
+    for kv in kvs:
+        if kv.key == "priority":
+            continue
+        shorthand = ofp_shorthands.get(kv.key)
+        if shorthand is not None:
+            result.extend(KeyValue(key, value) for key, value in shorthand)
+            continue
+        key = ofp_aliases.get(kv.key, kv.key)
+        if key == kv.key:
+            result.append(kv)
+        else:
+            result.append(KeyValue(key, kv.value))
+    return result
+
+
+def mask_signature(kvs):
+    """Returns the mask signature of a list of match key-values
+
+    Flows with the same signature match on the same fields with the same
+    masks (regardless of the values) so they belong to the same subtable of
+    a tuple-space classifier.
+
+    Args:
+        kvs (list[KeyValue]): the match key-values
+
+    Returns:
+        A (hashable) tuple of unique (field, mask) tuples sorted by field
+    """
+    return tuple(
+        sorted(
+            set(match_masks(kvs)),
+            key=lambda item: (item[0], -1 if item[1] is None else item[1]),
+        )
+    )
+
+
+def format_mask(field, mask):
+    """Returns a string representing a field and its mask"""
+    if mask is None:
+        return field
+    return "{}/{}".format(field, hex(mask))
+
+
+def format_signature(signature):
+    """Returns a string representing a mask signature"""
+    return ",".join(format_mask(field, mask) for field, mask in signature)
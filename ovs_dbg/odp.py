@@ -3,13 +3,12 @@
 import re
 from functools import partial
 
-from ovs_dbg.flow import Flow, Section
+from ovs_dbg.flow import Flow, Section, section_keys
 
 from ovs_dbg.kv import (
     KVParser,
     KVDecoders,
     nested_kv_decoder,
-    decode_nested_kv,
 )
 from ovs_dbg.decoders import (
     decode_default,
@@ -26,6 +25,7 @@ from ovs_dbg.decoders import (
     decode_free_output,
     decode_flag,
     decode_nat,
+    decode_json,
 )
 
 
@@ -51,12 +51,20 @@ class ODPFlow(Flow):
 class ODPFlowFactory:
     """Datapath Flow"""
 
+    flow_class = ODPFlow
+
     def __init__(self):
         self.info_decoders = self._info_decoders()
         self.match_decoders = self._match_decoders()
         self.action_decoders = self._action_decoders()
+        self._ufid_kv_decoders = KVDecoders({"ufid": decode_default})
+        self._info_kv_decoders = KVDecoders(self.info_decoders)
+        self._match_kv_decoders = KVDecoders(self.match_decoders)
+        self._action_kv_decoders = KVDecoders(
+            self.action_decoders, default_free=decode_free_output
+        )
 
-    def from_string(self, odp_string, id=None):
+    def from_string(self, odp_string, id=None, keys=None):
         """Parse a odp flow string
 
         The string is expected to have the follwoing format:
@@ -64,11 +72,74 @@ class ODPFlowFactory:
 
         Args:
             odp_string (str): a datapath flow string
+            id (Any): Optional; the flow identifier
+            keys (set): Optional; the keys (or section names) to decode.
+                Values of other keys are kept as their original strings. If
+                None, all keys are decoded
 
         Returns:
             an ODPFlow instance
         """
 
+        sections = []
+        for name, pos, string, decoders, is_list in self._split(odp_string):
+            parser = KVParser(decoders)
+            parser.parse(string, section_keys(keys, name))
+            if name == "ufid" and len(parser.kv()) != 1:
+                raise ValueError("malformed odp flow: %s" % odp_string)
+            sections.append(Section(name, pos, string, parser.kv(), is_list))
+
+        return ODPFlow(sections, odp_string, id)
+
+    def from_json(self, flow_dict, id=None, keys=None):
+        """Build a flow from its JSON representation (i.e: the output of
+        ODPFlow.to_json) without decoding the flow string
+
+        Args:
+            flow_dict (dict): the JSON representation of the flow
+            id (Any): Optional; the flow identifier
+            keys (set): Optional; the keys (or section names) to decode if a
+                section is missing in flow_dict and has to be decoded from the
+                original flow string. If None, all keys are decoded
+
+        Returns:
+            an ODPFlow instance. If the original flow string is not
+            available, the key-values have no metadata
+        """
+        orig = flow_dict.get("orig", "")
+        if orig:
+            parts = self._split(orig)
+        else:
+            parts = [
+                (name, 0, "", decoders, is_list)
+                for name, decoders, is_list in (
+                    ("ufid", self._ufid_kv_decoders, False),
+                    ("info", self._info_kv_decoders, False),
+                    ("match", self._match_kv_decoders, False),
+                    ("actions", self._action_kv_decoders, True),
+                )
+            ]
+
+        sections = []
+        for name, pos, string, decoders, is_list in parts:
+            parser = KVParser(decoders)
+            if name in flow_dict:
+                parser.from_json(string, flow_dict[name])
+            elif string:
+                parser.parse(string, section_keys(keys, name))
+            else:
+                continue
+            sections.append(Section(name, pos, string, parser.kv(), is_list))
+
+        return ODPFlow(sections, orig, id)
+
+    def _split(self, odp_string):
+        """Split a odp flow string into its sections
+
+        Returns:
+            A list of (name, pos, string, decoders, is_list) tuples, one for
+            each section
+        """
         sections = []
 
         # If UFID present, parse it and
@@ -77,12 +148,14 @@ class ODPFlowFactory:
             ufid_string = odp_string[
                 ufid_pos : (odp_string[ufid_pos:].find(",") + 1)
             ]
-            ufid_parser = KVParser(KVDecoders({"ufid": decode_default}))
-            ufid_parser.parse(ufid_string)
-            if len(ufid_parser.kv()) != 1:
-                raise ValueError("malformed odp flow: %s" % odp_string)
             sections.append(
-                Section("ufid", ufid_pos, ufid_string, ufid_parser.kv())
+                (
+                    "ufid",
+                    ufid_pos,
+                    ufid_string,
+                    self._ufid_kv_decoders,
+                    False,
+                )
             )
 
         action_pos = odp_string.find("actions:")
@@ -105,40 +178,34 @@ class ODPFlowFactory:
         match = field_parts[0]
         info = field_parts[2]
 
-        iparser = KVParser(KVDecoders(self.info_decoders))
-        iparser.parse(info)
-        isection = Section(
-            name="info",
-            pos=odp_string.find(info),
-            string=info,
-            data=iparser.kv(),
-        )
-        sections.append(isection)
-
-        mparser = KVParser(KVDecoders(self.match_decoders))
-        mparser.parse(match)
-        msection = Section(
-            name="match",
-            pos=odp_string.find(match),
-            string=match,
-            data=mparser.kv(),
+        sections.append(
+            (
+                "info",
+                odp_string.find(info),
+                info,
+                self._info_kv_decoders,
+                False,
+            )
         )
-        sections.append(msection)
-
-        aparser = KVParser(
-            KVDecoders(self.action_decoders, default_free=decode_free_output)
+        sections.append(
+            (
+                "match",
+                odp_string.find(match),
+                match,
+                self._match_kv_decoders,
+                False,
+            )
         )
-        aparser.parse(actions)
-        asection = Section(
-            name="actions",
-            pos=action_pos,
-            string=actions,
-            data=aparser.kv(),
-            is_list=True,
+        sections.append(
+            (
+                "actions",
+                action_pos,
+                actions,
+                self._action_kv_decoders,
+                True,
+            )
         )
-        sections.append(asection)
-
-        return ODPFlow(sections, odp_string, id)
+        return sections
 
     @classmethod
     def _action_decoders(cls):
@@ -367,8 +434,8 @@ class ODPFlowFactory:
                                                 "oam": decode_flag,
                                                 "crit": decode_flag,
                                                 "vni": decode_int,
-                                                "options": partial(
-                                                    decode_geneve, False
+                                                "options": geneve_decoder(
+                                                    False
                                                 ),
                                             }
                                         )
@@ -491,7 +558,7 @@ class ODPFlowFactory:
                                 }
                             )
                         ),
-                        "geneve": partial(decode_geneve, True),
+                        "geneve": geneve_decoder(True),
                         "gtpu": nested_kv_decoder(
                             KVDecoders(
                                 {
@@ -666,35 +733,37 @@ def decode_geneve(mask, value):
         mask (bool): Whether masking is supported
         value (str): The value to decode
     """
-    if mask:
-        decoders = {
-            "class": Mask16,
-            "type": Mask8,
-            "len": Mask8,
-        }
+    parser = _geneve_parsers[mask]
+    return [
+        parser.decode(opts.strip("{}"))
+        for opts in geneve_pattern.findall(value)
+    ]
 
-        def free_decoder(value):
-            return "data", Mask128(value)
 
-    else:
-        decoders = {
-            "class": decode_int,
-            "type": decode_int,
-            "len": decode_int,
-        }
+def geneve_decoder(mask):
+    """Helper function that creates a geneve options decoder (see
+    decode_geneve)
 
-        def free_decoder(value):
-            return "data", decode_int(value)
+    Args:
+        mask (bool): Whether masking is supported
+    """
+    decoder = partial(decode_geneve, mask)
+    decoder.from_json = partial(_geneve_from_json, mask)
+    return decoder
 
-    result = []
-    for opts in re.findall(r"{.*?}", value):
-        result.append(
-            decode_nested_kv(
-                KVDecoders(decoders=decoders, default_free=free_decoder),
-                opts.strip("{}"),
-            )
-        )
-    return result
+
+def _geneve_from_json(mask, value):
+    """Rebuilds geneve options from their JSON representation"""
+    if not mask:
+        return value
+
+    return [
+        {
+            key: decode_json(_geneve_masks.get(key), val)
+            for key, val in opts.items()
+        }
+        for opts in value
+    ]
 
 
 def decode_tnl_gre(value):
@@ -709,15 +778,49 @@ def decode_tnl_gre(value):
         value (str): The value to decode
     """
 
-    return decode_nested_kv(
+    return _gre_parser.decode(value.replace("(", "").replace(")", ""))
+
+
+geneve_pattern = re.compile(r"{.*?}")
+
+_geneve_parsers = {
+    True: KVParser(
+        KVDecoders(
+            decoders={
+                "class": Mask16,
+                "type": Mask8,
+                "len": Mask8,
+            },
+            default_free=lambda value: ("data", Mask128(value)),
+        )
+    ),
+    False: KVParser(
         KVDecoders(
-            {
-                "flags": decode_int,
-                "proto": decode_int,
-                "key": decode_int,
-                "csum": decode_int,
-                "seq": decode_int,
-            }
-        ),
-        value.replace("(", "").replace(")", ""),
+            decoders={
+                "class": decode_int,
+                "type": decode_int,
+                "len": decode_int,
+            },
+            default_free=lambda value: ("data", decode_int(value)),
+        )
+    ),
+}
+
+_geneve_masks = {
+    "class": Mask16,
+    "type": Mask8,
+    "len": Mask8,
+    "data": Mask128,
+}
+
+_gre_parser = KVParser(
+    KVDecoders(
+        {
+            "flags": decode_int,
+            "proto": decode_int,
+            "key": decode_int,
+            "csum": decode_int,
+            "seq": decode_int,
+        }
     )
+)
@@ -1,11 +1,9 @@
 """ Defines the parsers needed to parse ofproto flows
 """
 
-import functools
-
 from ovs_dbg.kv import KVParser, KVDecoders, nested_kv_decoder
 from ovs_dbg.fields import field_decoders
-from ovs_dbg.flow import Flow, Section
+from ovs_dbg.flow import Flow, Section, section_keys
 from ovs_dbg.list import ListDecoders, nested_list_decoder
 from ovs_dbg.decoders import (
     decode_default,
@@ -26,12 +24,12 @@ from ovs_dbg.ofp_act import (
     decode_bundle_load,
     decode_encap_ethernet,
     decode_load_field,
-    decode_set_field,
+    set_field_decoder,
     decode_move_field,
     decode_dec_ttl,
     decode_chk_pkt_larger,
     decode_zone,
-    decode_exec,
+    exec_decoder,
     decode_learn,
 )
 
@@ -60,6 +58,8 @@ class OFPFlow(Flow):
 class OFPFlowFactory:
     """OpenFlow Flow Factory is a class capable of creating OFPFLow objects"""
 
+    flow_class = OFPFlow
+
     def __init__(self):
         self.info_decoders = self._info_decoders()
         self.match_decoders = KVDecoders(
@@ -67,7 +67,7 @@ class OFPFlowFactory:
         )
         self.act_decoders = self._act_decoders()
 
-    def from_string(self, ofp_string, id=None):
+    def from_string(self, ofp_string, id=None, keys=None):
         """Parse a ofproto flow string
 
         The string is expected to have the follwoing format:
@@ -75,6 +75,10 @@ class OFPFlowFactory:
 
         :param ofp_string: a ofproto string as dumped by ovs-ofctl tool
         :type ofp_string: str
+        :param keys: Optional; the keys (or section names) to decode. Values
+            of other keys are kept as their original strings. If None, all
+            keys are decoded
+        :type keys: set
 
         :return: an OFPFlow with the content of the flow string
         :rtype: OFPFlow
@@ -83,6 +87,80 @@ class OFPFlowFactory:
             return None
 
         sections = list()
+        for name, pos, string, decoders, is_list in self._split(ofp_string):
+            parser = KVParser(decoders)
+            parser.parse(string, section_keys(keys, name))
+            sections.append(
+                Section(
+                    name=name,
+                    pos=pos,
+                    string=string,
+                    data=parser.kv(),
+                    is_list=is_list,
+                )
+            )
+
+        return OFPFlow(sections, ofp_string, id)
+
+    def from_json(self, flow_dict, id=None, keys=None):
+        """Build a flow from its JSON representation (i.e: the output of
+        OFPFlow.to_json) without decoding the flow string
+
+        :param flow_dict: the JSON representation of the flow
+        :type flow_dict: dict
+        :param keys: Optional; the keys (or section names) to decode if a
+            section is missing in flow_dict and has to be decoded from the
+            original flow string. If None, all keys are decoded
+        :type keys: set
+
+        :return: an OFPFlow with the content of the flow dictionary. If the
+            original flow string is not available, the key-values have no
+            metadata.
+        :rtype: OFPFlow
+        """
+        orig = flow_dict.get("orig", "")
+        if orig:
+            if " reply " in orig:
+                return None
+            parts = self._split(orig)
+        else:
+            parts = [
+                (name, 0, "", decoders, is_list)
+                for name, decoders, is_list in (
+                    ("info", self.info_decoders, False),
+                    ("match", self.match_decoders, False),
+                    ("actions", self.act_decoders, True),
+                )
+            ]
+
+        sections = list()
+        for name, pos, string, decoders, is_list in parts:
+            parser = KVParser(decoders)
+            if name in flow_dict:
+                parser.from_json(string, flow_dict[name])
+            elif string:
+                parser.parse(string, section_keys(keys, name))
+            else:
+                continue
+            sections.append(
+                Section(
+                    name=name,
+                    pos=pos,
+                    string=string,
+                    data=parser.kv(),
+                    is_list=is_list,
+                )
+            )
+
+        return OFPFlow(sections, orig, id)
+
+    def _split(self, ofp_string):
+        """Split a ofproto flow string into its sections
+
+        Returns:
+            A list of (name, pos, string, decoders, is_list) tuples, one for
+            each section
+        """
         parts = ofp_string.split("actions=")
         if len(parts) != 2:
             raise ValueError("malformed ofproto flow: %s" % ofp_string)
@@ -96,38 +174,23 @@ class OFPFlowFactory:
         info = field_parts[0]
         match = field_parts[2]
 
-        iparser = KVParser(self.info_decoders)
-        iparser.parse(info)
-        isection = Section(
-            name="info",
-            pos=ofp_string.find(info),
-            string=info,
-            data=iparser.kv(),
-        )
-        sections.append(isection)
-
-        mparser = KVParser(self.match_decoders)
-        mparser.parse(match)
-        msection = Section(
-            name="match",
-            pos=ofp_string.find(match),
-            string=match,
-            data=mparser.kv(),
-        )
-        sections.append(msection)
-
-        aparser = KVParser(self.act_decoders)
-        aparser.parse(actions)
-        asection = Section(
-            name="actions",
-            pos=ofp_string.find(actions),
-            string=actions,
-            data=aparser.kv(),
-            is_list=True,
-        )
-        sections.append(asection)
-
-        return OFPFlow(sections, ofp_string, id)
+        return [
+            ("info", ofp_string.find(info), info, self.info_decoders, False),
+            (
+                "match",
+                ofp_string.find(match),
+                match,
+                self.match_decoders,
+                False,
+            ),
+            (
+                "actions",
+                ofp_string.find(actions),
+                actions,
+                self.act_decoders,
+                True,
+            ),
+        ]
 
     @classmethod
     def _info_decoders(cls):
@@ -247,9 +310,7 @@ class OFPFlowFactory:
         ]
         return {
             "load": decode_load_field,
-            "set_field": functools.partial(
-                decode_set_field, KVDecoders(cls._field_decoders())
-            ),
+            "set_field": set_field_decoder(KVDecoders(cls._field_decoders())),
             "move": decode_move_field,
             "mod_dl_dst": EthMask,
             "mod_dl_src": EthMask,
@@ -283,8 +344,7 @@ class OFPFlowFactory:
                         "table": decode_int,
                         "nat": decode_nat,
                         "force": decode_flag,
-                        "exec": functools.partial(
-                            decode_exec,
+                        "exec": exec_decoder(
                             KVDecoders(
                                 {
                                     **cls._encap_actions_decoders(),
@@ -351,9 +411,7 @@ class OFPFlowFactory:
                     ),
                 }
             ),
-            "clone": functools.partial(
-                decode_exec, KVDecoders(action_decoders)
-            ),
+            "clone": exec_decoder(KVDecoders(action_decoders)),
         }
 
     @classmethod
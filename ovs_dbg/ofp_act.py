@@ -9,9 +9,12 @@ from ovs_dbg.decoders import (
     decode_time,
     decode_flag,
     decode_int,
+    decode_json,
 )
 from ovs_dbg.fields import field_decoders
 
+_decode_nested_default = nested_kv_decoder()
+
 
 def decode_output(value):
     """Decodes the output value
@@ -19,7 +22,7 @@ def decode_output(value):
     Does not support field specification
     """
     if len(value.split(",")) > 1:
-        return nested_kv_decoder()(value)
+        return _decode_nested_default(value)
     try:
         return {"port": int(value)}
     except ValueError:
@@ -40,7 +43,7 @@ def decode_controller(value):
         except ValueError:
             pass
         # controller(key[=val], ...)
-        return nested_kv_decoder()(value)
+        return _decode_nested_default(value)
 
 
 def decode_bundle_load(value):
@@ -130,6 +133,26 @@ def decode_set_field(field_decoders, value):
     }
 
 
+def set_field_decoder(field_decoders):
+    """Helper function that creates a 'set_field' decoder (see
+    decode_set_field) with given KVDecoders"""
+    decoder = functools.partial(decode_set_field, field_decoders)
+    decoder.from_json = functools.partial(_set_field_from_json, field_decoders)
+    return decoder
+
+
+def _set_field_from_json(field_decoders, value):
+    """Rebuilds a value decoded by a 'set_field' decoder from its JSON
+    representation"""
+    return {
+        "value": {
+            key: field_decoders.from_json(key, val)
+            for key, val in value["value"].items()
+        },
+        "dst": value["dst"],
+    }
+
+
 def decode_move_field(value):
     """Decodes 'move:src->dst' actions"""
     parts = value.split("->")
@@ -178,9 +201,27 @@ def decode_exec(action_decoders, value):
             nested exec
         value (string): the string to be decoded
     """
-    exec_parser = KVParser(action_decoders)
-    exec_parser.parse(value)
-    return [{kv.key: kv.value} for kv in exec_parser.kv()]
+    return KVParser(action_decoders).decode(value, is_list=True)
+
+
+def exec_decoder(action_decoders):
+    """Helper function that creates an 'exec' decoder (see decode_exec) with
+    given KVDecoders
+
+    The returned decoder reuses a single KVParser.
+    """
+    decoder = functools.partial(KVParser(action_decoders).decode, is_list=True)
+    decoder.from_json = functools.partial(_exec_from_json, action_decoders)
+    return decoder
+
+
+def _exec_from_json(action_decoders, value):
+    """Rebuilds a value decoded by an 'exec' decoder from its JSON
+    representation"""
+    return [
+        {key: action_decoders.from_json(key, val) for key, val in kv.items()}
+        for kv in value
+    ]
 
 
 def decode_learn(action_decoders):
@@ -212,8 +253,24 @@ def decode_learn(action_decoders):
         else:
             return decoder(value)
 
+    def learn_field_from_json(decoder, value):
+        """Rebuilds a value decoded by decode_learn_field from its JSON
+        representation"""
+        if isinstance(value, str) and value in field_decoders.keys():
+            # It's a field
+            return value
+        else:
+            return decode_json(decoder, value)
+
+    def learn_field_decoder(decoder):
+        learn_decoder = functools.partial(decode_learn_field, decoder)
+        learn_decoder.from_json = functools.partial(
+            learn_field_from_json, decoder
+        )
+        return learn_decoder
+
     learn_field_decoders = {
-        field: functools.partial(decode_learn_field, decoder)
+        field: learn_field_decoder(decoder)
         for field, decoder in field_decoders.items()
     }
     learn_decoders = {
@@ -230,4 +287,4 @@ def decode_learn(action_decoders):
         "result_dst": decode_field,
     }
 
-    return functools.partial(decode_exec, KVDecoders(learn_decoders))
+    return exec_decoder(KVDecoders(learn_decoders))
@@ -1,15 +1,19 @@
 import click
+import graphviz
+import sys
 
 from rich.tree import Tree
 from rich.text import Text
 from rich.style import Style
 
-from ovs_dbg.ofparse.main import maincli
+from ovs_dbg.ofparse.main import maincli, validate_fields
 
 from ovs_dbg.ofparse.process import (
     FlowProcessor,
     JSONProcessor,
     ConsoleProcessor,
+    ArchiveProcessor,
+    SQLiteProcessor,
 )
 from ovs_dbg.ofparse.console import (
     ConsoleFormatter,
@@ -19,9 +23,14 @@ from ovs_dbg.ofparse.console import (
     heat_pallete,
     file_header,
 )
+from ovs_dbg.ofparse.server import CacheProcessor, FlowServer
+from ovs_dbg.ofparse.stats import StatsProcessor
+from ovs_dbg.ofparse.dp_masks import MaskProcessor
+from ovs_dbg.ofparse.dp_attribution import AttributionProcessor
 from ovs_dbg.ofparse.html import HTMLBuffer, HTMLFormatter
 from ovs_dbg.ofparse.dp_graph import DatapathGraph
-from ovs_dbg.ofparse.dp_tree import FlowTree, FlowElem
+from ovs_dbg.ofparse.dp_recirc import RecircIndex
+from ovs_dbg.ofparse.dp_tree import FlowTree, FlowElem, SubtreeRef
 from ovs_dbg.odp import ODPFlowFactory
 
 factory = ODPFlowFactory()
@@ -35,12 +44,198 @@ def datapath(opts):
 
 
 @datapath.command()
+@click.option(
+    "--fields",
+    help="Comma-separated list of fields to print. Format: [section.]key, "
+    "e.g: table,cookie,actions.output. Only the printed fields (and the ones "
+    "used in the filter) are decoded",
+    type=str,
+    default=None,
+    callback=validate_fields,
+)
+@click.option(
+    "--ndjson",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print one JSON object per line (JSON Lines) instead of a JSON "
+    "array",
+)
+@click.option(
+    "--compact",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Do not indent the JSON output",
+)
 @click.pass_obj
-def json(opts):
+def json(opts, fields, ndjson, compact):
     """Print the flows in JSON format"""
-    proc = JSONProcessor(opts, factory)
+    proc = JSONProcessor(opts, factory, fields, sys.stdout, ndjson, compact)
+    proc.process()
+
+
+@datapath.command()
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["bin", "sqlite"]),
+    default="bin",
+    show_default=True,
+    help="Export format. bin: binary flow archive that can be used as input "
+    "(-i) of other commands. sqlite: SQLite database (flows are appended if "
+    "it exists)",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+    help="Output file",
+)
+@click.pass_obj
+def export(opts, fmt, output):
+    """Export the flows into a file"""
+    if fmt == "sqlite":
+        proc = SQLiteProcessor(opts, factory, output)
+    else:
+        proc = ArchiveProcessor(opts, factory, output)
+    proc.process()
+
+
+@datapath.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of values to print for each key (the most common "
+    "ones are printed). 0 prints all of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the statistics in JSON format",
+)
+@click.pass_obj
+def stats(opts, limit, as_json):
+    """Print flow statistics (counts per key, action usage, zero-hit flows
+    and counter percentiles) computed in a single pass"""
+    proc = StatsProcessor(
+        opts,
+        factory,
+        [
+            ("Recirc IDs", "match", "recirc_id", hex),
+            ("Input ports", "match", "in_port", str),
+        ],
+        ["packets", "bytes"],
+    )
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@datapath.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of signatures and fields to print. 0 prints all "
+    "of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the analysis in JSON format",
+)
+@click.pass_obj
+def masks(opts, limit, as_json):
+    """Group the flows by the fields and masks they match on
+
+    Each distinct mask signature requires a separate subtable in the
+    datapath classifier"""
+    proc = MaskProcessor(opts, factory)
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@datapath.command()
+@click.option(
+    "-o",
+    "--openflow",
+    type=click.Path(exists=True, dir_okay=False),
+    required=True,
+    help="File that holds the OpenFlow flows of the same node (it can also "
+    "contain the output of the json command or be an archive)",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of OpenFlow flows to print. 0 prints all of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the candidates of each datapath flow in JSON format",
+)
+@click.pass_obj
+def attribute(opts, openflow, limit, as_json):
+    """Find the OpenFlow flows that could have generated each datapath flow
+
+    An OpenFlow flow is a candidate if the datapath flow matches every
+    packet field it matches on (with at least the same mask bits) and the
+    values agree. Fields that do not appear in datapath flows (e.g:
+    registers) are not taken into account.
+    """
+    proc = AttributionProcessor(opts, factory, openflow)
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@datapath.command()
+@click.option(
+    "-s",
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    required=True,
+    help="UNIX socket to listen on",
+)
+@click.pass_obj
+def serve(opts, socket_path):
+    """Keep the flows in memory and run the commands sent by clients
+
+    Commands are sent by running ofparse with the --server option, e.g:
+    ofparse --server SOCKET -f FILTER datapath logic
+    """
+    if opts.get("flows") is not None:
+        raise click.UsageError("The server cannot run another server")
+    proc = CacheProcessor(opts, factory)
     proc.process()
-    print(proc.json_string())
+    FlowServer(socket_path, proc.flows, maincli).serve_forever()
 
 
 @datapath.command()
@@ -71,21 +266,37 @@ def console(opts, heat_map):
     show_default=True,
     help="Create heat-map with packet and byte counters",
 )
+@click.option(
+    "--shared",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the subtree of each recirc_id only once. The other flows "
+    "that recirculate to it reference it instead",
+)
 @click.pass_obj
-def logic(opts, heat_map):
+def logic(opts, heat_map, shared):
     """Print the flows in a tree based on the 'recirc_id'"""
     processor = ConsoleTreeProcessor(opts, factory)
     processor.process()
-    processor.print(heat_map)
+    processor.print(heat_map, shared)
 
 
 @datapath.command()
+@click.option(
+    "--shared",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Render the subtree of each recirc_id only once. The other flows "
+    "that recirculate to it reference it instead",
+)
 @click.pass_obj
-def html(opts):
+def html(opts, shared):
     """Print the flows in an HTML list sorted by recirc_id"""
     processor = HtmlTreeProcessor(opts, factory)
     processor.process()
-    processor.print()
+    processor.print(shared)
 
 
 @datapath.command()
@@ -97,44 +308,78 @@ def html(opts):
     show_default=True,
     help="Output an html file containing the graph",
 )
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["dot", "json", "graphml"]),
+    default="dot",
+    show_default=True,
+    help="Output format. dot: graphviz source. json and graphml: nodes and "
+    "edges that can be rendered or analysed without graphviz",
+)
+@click.option(
+    "--collapse",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Represent the flows of a recirc_id that match on the same keys "
+    "and have exactly the same actions with a single node",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Maximum number of nodes per recirc_id and input port (the ones "
+    "with more packets are kept, the rest are summarized). 0 prints all of "
+    "them",
+)
 @click.pass_obj
-def graph(opts, html):
+def graph(opts, html, fmt, collapse, limit):
     """Print the flows in an graphviz (.dot) format showing the relationship
     of recirc_ids"""
-    if len(opts.get("filename")) > 1:
+    if len(opts.get("filename") or opts.get("flows") or []) > 1:
         raise click.BadParameter("Graph format only supports one input file")
+    if html and fmt != "dot":
+        raise click.BadParameter("--html cannot be used with --format")
 
-    processor = GraphProcessor(opts, factory)
+    processor = GraphProcessor(opts, factory, collapse, limit)
     processor.process()
-    processor.print(html)
+    processor.print(html, fmt)
 
 
 class GraphProcessor(FlowProcessor):
-    def __init__(self, opts, factory):
+    def __init__(self, opts, factory, collapse=False, limit=None):
         super().__init__(opts, factory)
+        self.collapse = collapse
+        self.limit = limit
 
     def start_file(self, name, filename):
-        self.recirc_flows = {}
+        self.index = RecircIndex()
 
     def process_flow(self, flow, name):
-        rid = flow.match.get("recirc_id") or 0
-        if not self.recirc_flows.get(rid):
-            self.recirc_flows[rid] = list()
-        self.recirc_flows[rid].append(flow)
+        self.index.add(flow)
 
-    def print(self, html):
-        dpg = DatapathGraph(self.recirc_flows)
+    def print(self, html, fmt="dot"):
+        dpg = DatapathGraph(self.index, self.collapse, self.limit)
         if not html:
-            print(dpg.source())
+            dpg.write(sys.stdout, fmt)
             return
 
         html_obj = ""
         html_obj += "<h1> Flow Graph </h1>"
         html_obj += "<div width=400px height=300px>"
-        svg = dpg.pipe(format="svg")
+        try:
+            svg = dpg.pipe(format="svg")
+        except graphviz.ExecutableNotFound:
+            raise click.ClickException(
+                "--html requires the graphviz executables. Use --format json "
+                "or --format graphml to export the graph without them"
+            )
         html_obj += svg.decode("utf-8")
         html_obj += "</div>"
-        html_tree = HTMLTree("graph", self.opts, self.recirc_flows)
+        html_tree = HTMLTree("graph", self.opts, self.index)
         html_tree.build()
         html_obj += html_tree.render()
 
@@ -171,14 +416,21 @@ class ConsoleTreeProcessor(FlowProcessor):
     def stop_file(self, name, filename):
         self.data[name] = self.tree
 
-    def print(self, heat_map):
+    def print(self, heat_map, shared=False):
         for name, tree in self.data.items():
             self.ofconsole.console.print("\n")
             self.ofconsole.console.print(file_header(name))
             tree.build()
             if self.opts.get("filter"):
                 tree.filter(self.opts.get("filter"))
-            tree.print(heat_map)
+            tree.print(heat_map, shared)
+
+
+def subtree_summary(elem):
+    """Returns the summary of the counters of the subtree of a FlowElem"""
+    return "[subtree: {:.0f} packets, {:.0f} bytes, {:.2f}%]".format(
+        elem.subtree_packets, elem.subtree_bytes, 100 * elem.subtree_share
+    )
 
 
 class ConsoleTree(FlowTree):
@@ -213,8 +465,19 @@ class ConsoleTree(FlowTree):
         if elem.is_root:
             elem.tree = Tree("Datapath Flows (logical)")
             return
+        if isinstance(elem, SubtreeRef):
+            parent.tree.add(
+                Text(
+                    "recirc_id({}): {}".format(
+                        hex(elem.recirc),
+                        "recirculation loop" if elem.loop else "see above",
+                    ),
+                    "italic",
+                )
+            )
+            return
 
-        buf = ConsoleBuffer(Text())
+        buf = ConsoleBuffer(Text(subtree_summary(elem) + " ", "bold"))
         highlighted = None
         if self.opts.get("highlight"):
             result = self.opts.get("highlight").evaluate(elem.flow)
@@ -223,10 +486,12 @@ class ConsoleTree(FlowTree):
         self.console.format_flow(buf, elem.flow, highlighted)
         elem.tree = parent.tree.add(buf.text)
 
-    def print(self, heat=False):
+    def print(self, heat=False, shared=False):
         """Print the Flow Tree
         Args:
             heat (bool): Optional; whether heat-map style shall be applied
+            shared (bool): Optional; whether the subtree of each recirc_id
+                shall be printed only once
         """
         if heat:
             for field in ["packets", "bytes"]:
@@ -236,7 +501,7 @@ class ConsoleTree(FlowTree):
                 self.console.style.set_value_style(
                     field, heat_pallete(min(values), max(values))
                 )
-        self.traverse(self._append_to_tree)
+        self.traverse(self._append_to_tree, expand_shared=not shared)
         with print_context(self.console.console, self.opts):
             self.console.console.print(self.root.tree)
 
@@ -258,7 +523,7 @@ class HtmlTreeProcessor(FlowProcessor):
     def stop_file(self, name, filename):
         self.data[name] = self.tree
 
-    def print(self):
+    def print(self, shared=False):
         html_obj = ""
         for name, tree in self.data.items():
             html_obj += "<div>"
@@ -266,7 +531,7 @@ class HtmlTreeProcessor(FlowProcessor):
             tree.build()
             if self.opts.get("filter"):
                 tree.filter(self.opts.get("filter"))
-            html_obj += tree.render()
+            html_obj += tree.render(shared)
             html_obj += "</div>"
         print(html_obj)
 
@@ -276,7 +541,8 @@ class HTMLTree(FlowTree):
 
     Args:
         opts(dict): Options dictionary
-        flows(dict[int, list[DPFlow]): Optional; initial flows
+        flows(dict[int, list[DPFlow]] or RecircIndex): Optional; initial
+            flows
     """
 
     html_header = """
@@ -406,73 +672,115 @@ class HTMLTree(FlowTree):
             self._opts = opts
             super(HTMLTree.HTMLTreeElem, self).__init__(flow)
 
-        def render(self, item=0):
-            """Render the HTML Element
+        def render(self, item):
+            """Render the HTML of the flow of the element, not including its
+            subtree
+
             Args:
                 item (int): the item id
 
             Returns:
-                (html_obj, items) tuple where html_obj is the html string and
-                items is the number of subitems rendered in total
+                the html string
             """
             parent_name = self._parent_name.replace(" ", "_")
-            html_obj = "<div>"
-            if self.flow:
-                html_text = """
+            html_text = """
 <input id="collapsible_{name}_{item}" class="toggle" type="checkbox" onclick="toggle_checkbox(this)" checked>
-<label for="collapsible_{name}_{item}" class="lbl-toggle lbl-toggle-flow">Flow {id}</label>
+<label for="collapsible_{name}_{item}" class="lbl-toggle lbl-toggle-flow">Flow {id} {summary}</label>
             """  # noqa: E501
-                html_obj += html_text.format(
-                    item=item, id=self.flow.id, name=parent_name
-                )
+            html_obj = html_text.format(
+                item=item,
+                id=self.flow.id,
+                name=parent_name,
+                summary=subtree_summary(self),
+            )
 
-                html_text = '<div class="flow collapsible-content" id="flow_{id}" onfocus="onFlowClick(this)" onclick="onFlowClick(this)" >'  # noqa: E501
-                html_obj += html_text.format(id=self.flow.id)
-                buf = HTMLBuffer()
-                highlighted = None
-                if self._opts.get("highlight"):
-                    result = self._opts.get("highlight").evaluate(self.flow)
-                    if result:
-                        highlighted = result.kv
-                self._formatter.format_flow(buf, self.flow, highlighted)
-                html_obj += buf.text
-                html_obj += "</div>"
-            if self.children:
-                html_obj += "<div>"
-                html_obj += "<ul  style='list-style-type:none;'>"
-                for sf in self.children:
-                    item += 1
-                    html_obj += "<li>"
-                    (html_elem, items) = sf.render(item)
-                    html_obj += html_elem
-                    item += items
-                    html_obj += "</li>"
-                html_obj += "</ul>"
-                html_obj += "</div>"
+            html_text = '<div class="flow collapsible-content" id="flow_{id}" onfocus="onFlowClick(this)" onclick="onFlowClick(this)" >'  # noqa: E501
+            html_obj += html_text.format(id=self.flow.id)
+            buf = HTMLBuffer()
+            highlighted = None
+            if self._opts.get("highlight"):
+                result = self._opts.get("highlight").evaluate(self.flow)
+                if result:
+                    highlighted = result.kv
+            self._formatter.format_flow(buf, self.flow, highlighted)
+            html_obj += buf.text
             html_obj += "</div>"
-            return html_obj, item
+            return html_obj
 
     def __init__(self, name, opts, flows=None):
         self.opts = opts
         self.name = name
-        self.root = self.HTMLTreeElem("", flow=None, opts=self.opts)
         super(HTMLTree, self).__init__(flows)
 
     def _new_elem(self, flow, _):
         """Override _new_elem to provide HTMLTreeElems"""
         return self.HTMLTreeElem(self.name, flow, self.opts)
 
-    def render(self):
+    def render(self, shared=False):
         """Render the Tree in HTML
+        Args:
+            shared (bool): Optional; whether the subtree of each recirc_id
+                shall be rendered only once
+
         Returns:
             an html string representing the element
         """
         name = self.name.replace(" ", "_")
         html_text = """<input id="collapsible_main-{name}" class="toggle" type="checkbox" onclick="toggle_checkbox(this)" checked>
 <label for="collapsible_main-{name}" class="lbl-toggle lbl-toggle-main">Flow Table</label>"""  # noqa: E501
-        html_obj = self.html_header + html_text.format(name=name)
-        html_obj += "<div id=flow_list-{name}>".format(name=name)
-        (html_elem, items) = self.root.render()
-        html_obj += html_elem
-        html_obj += "</div>"
-        return html_obj
+        parts = [self.html_header + html_text.format(name=name)]
+        parts.append("<div id=flow_list-{name}>".format(name=name))
+
+        # The elements whose html is still open, from the root to the one
+        # being rendered, along with whether their list of children has
+        # been opened
+        path = list()
+        item = 0
+
+        def close(entry):
+            elem, has_children = entry
+            if has_children:
+                parts.append("</ul></div>")
+            parts.append("</div>")
+            if not elem.is_root:
+                parts.append("</li>")
+
+        def render_elem(elem, parent):
+            nonlocal item
+            if elem.is_root:
+                parts.append("<div>")
+                path.append([elem, False])
+                return
+            while path[-1][0] is not parent:
+                close(path.pop())
+            if not path[-1][1]:
+                parts.append("<div><ul  style='list-style-type:none;'>")
+                path[-1][1] = True
+            parts.append("<li>")
+            if isinstance(elem, SubtreeRef):
+                parts.append(self._render_ref(elem))
+                parts.append("</li>")
+                return
+            item += 1
+            parts.append("<div>")
+            parts.append(elem.render(item))
+            path.append([elem, False])
+
+        self.traverse(render_elem, expand_shared=not shared)
+        while path:
+            close(path.pop())
+        parts.append("</div>")
+        return "".join(parts)
+
+    def _render_ref(self, ref):
+        """Render a SubtreeRef, linking to the first flow of the referenced
+        subtree if it has already been rendered"""
+        if ref.loop:
+            return "<p><i>recirc_id({}): recirculation loop</i></p>".format(
+                hex(ref.recirc)
+            )
+        text = "recirc_id({}): see above".format(hex(ref.recirc))
+        elems = self._groups.get(ref.recirc)
+        if elems:
+            text = '<a href="#flow_{}">{}</a>'.format(elems[0].flow.id, text)
+        return "<p><i>{}</i></p>".format(text)
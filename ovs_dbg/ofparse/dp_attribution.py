@@ -0,0 +1,163 @@
+""" Defines the datapath to openflow attribution processor
+"""
+
+import json
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.attribution import Attributor
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.ofparse.console import (
+    ConsoleBuffer,
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.ofp_classifier import ClassifierProcessor
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class OpenFlowStats:
+    """OpenFlowStats holds the datapath flows an OpenFlow flow could have
+    generated"""
+
+    def __init__(self, table, flow):
+        self.table = table
+        self.flow = flow
+        self.flows = 0
+        self.packets = 0
+        self.bytes = 0
+
+
+class AttributionProcessor(FlowProcessor):
+    """AttributionProcessor finds the OpenFlow flows that could have
+    generated each datapath flow
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build datapath flows
+        openflow (str): The file that holds the OpenFlow flows
+    """
+
+    def __init__(self, opts, factory, openflow):
+        super().__init__(opts, factory)
+        self.openflow = openflow
+        self.attributions = dict()
+
+    def init(self):
+        of_opts = dict(
+            self.opts,
+            filename=[("OpenFlow", self.openflow)],
+            flows=None,
+            filter=None,
+            top=None,
+            sample=None,
+        )
+        proc = ClassifierProcessor(of_opts, OFPFlowFactory())
+        proc.process(do_filter=False)
+        self.of_flows = len(proc.classifiers["OpenFlow"])
+        self.attributor = Attributor(proc.classifiers["OpenFlow"])
+
+    def required_keys(self):
+        keys = {"ufid", "match", "packets", "bytes"}
+        if self.opts.get("filter"):
+            keys.update(self.opts.get("filter").keys())
+        return keys
+
+    def start_file(self, name, filename):
+        self.file_attributions = list()
+
+    def stop_file(self, name, filename):
+        self.attributions[name] = self.file_attributions
+
+    def process_flow(self, flow, name):
+        self.file_attributions.append((flow, self.attributor.attribute(flow)))
+
+    def json_string(self):
+        """Returns the candidates of each datapath flow in JSON format"""
+        return json.dumps(
+            {
+                name: [
+                    {
+                        "ufid": (flow.ufid or {}).get("ufid"),
+                        "flow": flow.orig,
+                        "candidates": [
+                            candidate.dict() for candidate in candidates
+                        ],
+                    }
+                    for flow, candidates in attributions
+                ]
+                for name, attributions in self.attributions.items()
+            },
+            indent=4,
+        )
+
+    @staticmethod
+    def top(attributions, limit=None):
+        """Returns the OpenFlowStats of the OpenFlow flows sorted by the
+        number of datapath flows they could have generated"""
+        stats = dict()
+        for flow, candidates in attributions:
+            for candidate in candidates:
+                of_stats = stats.get(id(candidate.flow))
+                if of_stats is None:
+                    of_stats = stats[id(candidate.flow)] = OpenFlowStats(
+                        candidate.table, candidate.flow
+                    )
+                of_stats.flows += 1
+                of_stats.packets += flow.info.get("packets") or 0
+                of_stats.bytes += flow.info.get("bytes") or 0
+        result = sorted(
+            stats.values(), key=lambda of_stats: of_stats.flows, reverse=True
+        )
+        return result[:limit] if limit else result
+
+    def print(self, limit):
+        """Print the OpenFlow flows that could have generated the most
+        datapath flows
+
+        Args:
+            limit (int): The maximum number of OpenFlow flows to print
+        """
+        formatter = ConsoleFormatter(opts=self.opts)
+        console = formatter.console
+        with print_context(console, self.opts):
+            for name, attributions in self.attributions.items():
+                console.print("\n")
+                console.print(file_header(name))
+                tree = Tree(
+                    Text.assemble(
+                        ("Datapath flows: ", "bold"),
+                        "{} ({} without candidates) ".format(
+                            len(attributions),
+                            sum(
+                                not candidates
+                                for _, candidates in attributions
+                            ),
+                        ),
+                        ("OpenFlow flows: ", "bold"),
+                        str(self.of_flows),
+                    )
+                )
+                node = tree.add(
+                    Text(
+                        "Top OpenFlow flows by datapath flows they could "
+                        "have generated",
+                        "bold",
+                    )
+                )
+                for of_stats in self.top(attributions, limit):
+                    text = Text.assemble(
+                        (
+                            "{} datapath flows, {} packets, {} bytes: ".format(
+                                of_stats.flows,
+                                of_stats.packets,
+                                of_stats.bytes,
+                            ),
+                            "bold",
+                        )
+                    )
+                    formatter.format_flow(ConsoleBuffer(text), of_stats.flow)
+                    node.add(text)
+                console.print(tree)
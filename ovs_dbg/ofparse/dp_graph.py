@@ -1,7 +1,57 @@
 """ Defines a Datapath Graph based on graphviz
 """
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
 import graphviz
+from ovs_dbg.decoders import FlowEncoder
 from ovs_dbg.filter import OFFilter
+from ovs_dbg.ofparse.dp_recirc import RecircIndex
+
+_id_re = re.compile(
+    r"^([a-zA-Z_][a-zA-Z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$"
+)
+_keywords = {"node", "edge", "graph", "digraph", "subgraph", "strict"}
+
+
+def _quote(value):
+    """Returns a dot ID, quoted if needed"""
+    value = str(value)
+    if _id_re.match(value) and value.lower() not in _keywords:
+        return value
+    return '"{}"'.format(re.sub(r'(?<!\\)"', r'\\"', value))
+
+
+# GraphML attributes of the nodes and edges (see DatapathGraph.elements)
+_graphml_keys = [
+    ("node", "kind", "string"),
+    ("node", "label", "string"),
+    ("node", "recirc_id", "long"),
+    ("node", "in_port", "string"),
+    ("node", "port", "string"),
+    ("node", "flows", "long"),
+    ("node", "packets", "long"),
+    ("node", "bytes", "long"),
+    ("node", "match", "string"),
+    ("node", "actions", "string"),
+    ("node", "color", "string"),
+    ("edge", "kind", "string"),
+]
+
+
+def _attr_list(attrs):
+    """Returns a dot attribute list (with a leading space) or an empty
+    string"""
+    if not attrs:
+        return ""
+    return " [{}]".format(
+        " ".join(
+            "{}={}".format(key, _quote(value))
+            for key, value in attrs.items()
+            if value is not None
+        )
+    )
 
 
 class DatapathGraph:
@@ -9,9 +59,20 @@ class DatapathGraph:
     A DatapathGraph is a class that renders a set of datapath flows into
     graphviz graphs
 
+    The dot source is generated line by line (see lines) so that big graphs
+    can be streamed. The graph can also be exported to JSON and GraphML
+    (see write), which do not need graphviz to be rendered or analysed.
+
     Args:
-        flows(dict[int, list(Flow)]): Dictionary of lists of flows indexed by
-            recirc_id
+        flows(dict[int, list(Flow)] or RecircIndex): Dictionary of lists of
+            flows indexed by recirc_id. A RecircIndex is used as is (e.g: to
+            share it with an HTMLTree)
+        collapse(bool): Optional; whether flows of the same cluster that
+            match on the same keys and have exactly the same actions are
+            represented by a single node
+        limit(int): Optional; the maximum number of nodes per cluster (the
+            ones with more packets are kept, the rest are summarized in a
+            single node). None or 0 means no limit
     """
 
     node_styles = {
@@ -22,29 +83,212 @@ class DatapathGraph:
         OFFilter("ct"): {"color": "#ff0000"},
     }
 
-    def __init__(self, flows):
-        self._flows = flows
-
-        self._output_nodes = []
-        self._graph = graphviz.Digraph(
-            "DP flows", node_attr={"shape": "rectangle"}
-        )
-        self._graph.attr(compound="true")
-        self._graph.attr(rankdir="LR")
+    def __init__(self, flows, collapse=False, limit=None):
+        if isinstance(flows, RecircIndex):
+            self._index = flows
+        else:
+            self._index = RecircIndex(flows)
+        self._flows = self._index.flows
+        self._collapse = collapse
+        self._limit = limit
 
-        self._populate_graph()
+    def lines(self):
+        """
+        Yields the lines of the graphviz source representation of the graph
+        """
+        self._output_nodes = set()
+        self._indent = 0
+        yield 'digraph "DP flows" {'
+        self._indent = 1
+        yield self._line("node" + _attr_list({"shape": "rectangle"}))
+        yield self._line("compound=true")
+        yield self._line("rankdir=LR")
+        yield from self._populate_graph()
+        yield "}"
 
     def source(self):
         """
         Return the graphviz source representation of the graph
         """
-        return self._graph.source
+        return "".join(line + "\n" for line in self.lines())
+
+    def write(self, stream, fmt="dot"):
+        """
+        Write a representation of the graph to a stream
+
+        Args:
+            stream: the stream to write to
+            fmt(str): Optional; the format: "dot" (graphviz source), "json"
+                or "graphml"
+        """
+        generators = {
+            "dot": self.lines,
+            "json": self.json_lines,
+            "graphml": self.graphml_lines,
+        }
+        for line in generators[fmt]():
+            stream.write(line + "\n")
+
+    def elements(self):
+        """
+        Yields the nodes and the edges of the graph. All the nodes are
+        yielded before the edges
+
+        Nodes are ("node", name, attrs) tuples. Their "kind" attribute is one
+        of:
+            "recirc": the entry of a recirc_id (or of the flows of recirc_id 0
+                that do not match on the input port)
+            "input": the entry of the flows that match on an input port
+            "flow": one flow (or several collapsed ones, see "flows")
+            "others": the flows left out because of the limit
+            "output", "drop", "userspace": the datapath exits
+            "end": the exit of the flows without any of the above
+
+        Edges are ("edge", tail, head, attrs) tuples. Their "kind" attribute
+        is "lookup" (from an entry to the flows looked up in it), "recirc",
+        "output", "drop", "userspace" or "end".
+        """
+        edges = list()
+        entries = set()
+        exits = dict()
+
+        def cluster(entry, flows, attrs):
+            nodes, others = self._nodes(flows)
+            for node_flows in nodes:
+                name = "Flow_{}".format(node_flows[0].id)
+                yield "node", name, dict(self._flow_attrs(node_flows), **attrs)
+                edges.append((entry, name, "lookup"))
+                edges.extend(
+                    self._next_edges(name, self._next_hops(node_flows), exits)
+                )
+            if others:
+                name = "others_{}".format(entry)
+                yield "node", name, dict(
+                    kind="others",
+                    label=self._others_label(others),
+                    flows=len(others),
+                    packets=sum(f.info.get("packets") or 0 for f in others),
+                    bytes=sum(f.info.get("bytes") or 0 for f in others),
+                    **attrs,
+                )
+                edges.append((entry, name, "lookup"))
+                edges.extend(
+                    self._next_edges(name, self._next_hops(others), exits)
+                )
+
+        for recirc, flows in self._flows.items():
+            free_flows = flows
+            if recirc == 0:
+                free_flows = list()
+                flows_per_inport = dict()
+                for flow in flows:
+                    port = flow.match.get("in_port")
+                    if port:
+                        flows_per_inport.setdefault(port, list()).append(flow)
+                    else:
+                        free_flows.append(flow)
+
+                for inport, inport_flows in flows_per_inport.items():
+                    entry = "input_{}".format(inport)
+                    yield "node", entry, dict(
+                        kind="input",
+                        label="input port {}".format(inport),
+                        in_port=inport,
+                    )
+                    yield from cluster(
+                        entry,
+                        inport_flows,
+                        dict(recirc_id=recirc, in_port=inport),
+                    )
+                if not free_flows:
+                    continue
+
+            entry = "recirc_{}".format(hex(recirc))
+            entries.add(entry)
+            yield "node", entry, dict(
+                kind="recirc",
+                label="recirc {}".format(recirc),
+                recirc_id=recirc,
+            )
+            yield from cluster(entry, free_flows, dict(recirc_id=recirc))
+
+        # Exits and recirc_ids without flows
+        for name, attrs in exits.items():
+            if attrs["kind"] != "recirc" or name not in entries:
+                yield "node", name, attrs
+
+        for tail, head, kind in edges:
+            yield "edge", tail, head, dict(kind=kind)
+
+    def json_lines(self):
+        """
+        Yields the lines of the JSON representation of the graph: an object
+        with the "nodes" (objects with a "name" and the attributes of the
+        node) and the "edges" (objects with a "tail", a "head" and the
+        attributes of the edge). See elements
+        """
+        yield '{"nodes": ['
+        section = "nodes"
+        separator = ""
+        for element in self.elements():
+            if element[0] == "node":
+                _, name, attrs = element
+                item = dict(name=name, **attrs)
+            else:
+                if section == "nodes":
+                    section = "edges"
+                    separator = ""
+                    yield '], "edges": ['
+                _, tail, head, attrs = element
+                item = dict(tail=tail, head=head, **attrs)
+            yield separator + json.dumps(item, cls=FlowEncoder)
+            separator = ","
+        if section == "nodes":
+            yield '], "edges": ['
+        yield "]}"
+
+    def graphml_lines(self):
+        """
+        Yields the lines of the GraphML representation of the graph. See
+        elements
+        """
+        yield '<?xml version="1.0" encoding="UTF-8"?>'
+        yield (
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+            'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">'
+        )
+        for domain, name, attr_type in _graphml_keys:
+            yield (
+                '  <key id="{d}_{n}" for="{d}" attr.name="{n}" '
+                'attr.type="{t}"/>'.format(d=domain, n=name, t=attr_type)
+            )
+        yield '  <graph id="DP flows" edgedefault="directed">'
+        for element in self.elements():
+            if element[0] == "node":
+                _, name, attrs = element
+                yield "    <node id={}>".format(quoteattr(name))
+                domain = "node"
+            else:
+                _, tail, head, attrs = element
+                yield "    <edge source={} target={}>".format(
+                    quoteattr(tail), quoteattr(head)
+                )
+                domain = "edge"
+            for key, value in attrs.items():
+                yield '      <data key="{}_{}">{}</data>'.format(
+                    domain, key, escape(str(value))
+                )
+            yield "    </{}>".format(domain)
+        yield "  </graph>"
+        yield "</graphml>"
 
     def pipe(self, *args, **kwargs):
         """
         Output the graph based on arguments given to graphviz.pipe
         """
-        return self._graph.pipe(*args, **kwargs)
+        return graphviz.Source(self.source()).pipe(*args, **kwargs)
 
     @classmethod
     def recirc_cluster_name(cls, recirc_id):
@@ -62,151 +306,270 @@ class DatapathGraph:
     def output_node_name(cls, port):
         return "output_{}".format(port)
 
-    def _flow_node(self, flow, name):
+    def _line(self, text):
+        return "\t" * self._indent + text
+
+    def _node(self, name, **attrs):
+        return self._line(_quote(name) + _attr_list(attrs))
+
+    def _edge(self, tail, head, **attrs):
+        return self._line(
+            "{} -> {}{}".format(_quote(tail), _quote(head), _attr_list(attrs))
+        )
+
+    def _node_style(self, flow):
+        """Returns the style attributes of the node of a flow"""
+        return (
+            self.node_styles.get(
+                next(
+                    filter(lambda f: f.evaluate(flow), self.node_styles), None
+                )
+            )
+            or {}
+        )
+
+    def _flow_label(self, flows):
         """
-        Returns the dictionary of attributes of a graphviz node that represents
-        the flow with a given name
+        Returns the label of the node that represents a list of flows (a
+        single one unless they have been collapsed)
         """
-        summary = "Line: {} \n".format(flow.id)
-        summary += "\n".join(
+        flow = flows[0]
+        if len(flows) == 1:
+            summary = "Line: {} \n".format(flow.id)
+            summary += flow.section("info").string
+        else:
+            summary = "Flows: {} \n".format(len(flows))
+            summary += "packets:{}, bytes:{}".format(
+                sum(f.info.get("packets") or 0 for f in flows),
+                sum(f.info.get("bytes") or 0 for f in flows),
+            )
+        summary += "\n" + "\n".join(
             [
-                flow.section("info").string,
                 ",".join(flow.match.keys()),
                 "actions: "
                 + ",".join(list(a.keys())[0] for a in flow.actions),
             ]
         )
-        attr = (
-            self.node_styles.get(
-                next(
-                    filter(lambda f: f.evaluate(flow), self.node_styles), None
-                )
-            )
-            or {}
+        return summary
+
+    def _flow_node(self, flows, name):
+        """
+        Returns the dot line of the node that represents a list of flows (a
+        single one unless they have been collapsed) with a given name
+        """
+        return self._node(
+            name,
+            label=self._flow_label(flows),
+            URL="#flow_{}".format(flows[0].id),
+            fontsize="8",
+            nojustify="true",
+            **self._node_style(flows[0]),
         )
 
-        return {
-            "name": name,
-            "label": summary,
-            "_attributes": attr,
-            "fontsize": "8",
-            "nojustify": "true",
-            "URL": "#flow_{}".format(flow.id),
-        }
+    def _flow_attrs(self, flows):
+        """
+        Returns the element attributes of the node that represents a list of
+        flows (see elements)
+        """
+        flow = flows[0]
+        return dict(
+            kind="flow",
+            label=self._flow_label(flows),
+            flows=len(flows),
+            packets=sum(f.info.get("packets") or 0 for f in flows),
+            bytes=sum(f.info.get("bytes") or 0 for f in flows),
+            match=",".join(flow.match.keys()),
+            actions=",".join(list(a.keys())[0] for a in flow.actions),
+            **self._node_style(flow),
+        )
 
-    def _create_flow_cluster(self, cluster_name, label, flows, parent=None):
-        """Create a flow cluster
+    @staticmethod
+    def _others_label(others):
+        """Returns the label of the node that summarizes the flows left out
+        because of the limit"""
+        return "{} more flows \npackets:{}, bytes:{}".format(
+            len(others),
+            sum(f.info.get("packets") or 0 for f in others),
+            sum(f.info.get("bytes") or 0 for f in others),
+        )
+
+    def _next_hops(self, flows):
+        """
+        Returns the (kind, target) next hops of the node that represents a
+        list of flows, without duplicates. Flows without any of the edges
+        returned by flow_edges go to ("end", None)
+        """
+        hops = list()
+        for flow in flows:
+            for hop in self._index.edges(flow) or [("end", None)]:
+                if hop not in hops:
+                    hops.append(hop)
+        return hops
+
+    def _next_edges(self, name, hops, exits):
+        """
+        Returns the (tail, head, kind) edges from a node to its next hops
+        (see _next_hops) and adds the next hop nodes to the exits dictionary
+        """
+        result = list()
+        for kind, target in hops:
+            if kind == "recirc":
+                head = "recirc_{}".format(hex(target))
+                attrs = dict(
+                    kind="recirc",
+                    label="recirc {}".format(target),
+                    recirc_id=target,
+                )
+            elif kind == "output":
+                head = self.output_node_name(target)
+                attrs = dict(
+                    kind="output",
+                    label="Port {}".format(target),
+                    port=target,
+                )
+            else:
+                head = kind
+                attrs = dict(kind=kind, label=kind)
+            exits.setdefault(head, attrs)
+            result.append((name, head, kind))
+        return result
+
+    def _nodes(self, flows):
+        """Returns the lists of flows represented by each node of a cluster
+        and the flows that are left out because of the limit"""
+        if self._collapse:
+            groups = dict()
+            for flow in flows:
+                # The next hops are given by the actions
+                key = (
+                    tuple(flow.match.keys()),
+                    flow.section("actions").string,
+                )
+                groups.setdefault(key, list()).append(flow)
+            nodes = list(groups.values())
+        else:
+            nodes = [[flow] for flow in flows]
+
+        if not self._limit or len(nodes) <= self._limit:
+            return nodes, []
+        nodes.sort(
+            key=lambda node: sum(f.info.get("packets") or 0 for f in node),
+            reverse=True,
+        )
+        return nodes[: self._limit], [
+            flow for node in nodes[self._limit :] for flow in node
+        ]
+
+    def _create_flow_cluster(
+        self, cluster_name, label, flows, edges, nested=None
+    ):
+        """Yields the lines of a flow cluster
         Args:
             cluster_name(str): the name of the new cluster
             label(str): the label of the subgraph
             flows([Flow]): list of flows to add to the cluster
-            parent(Graph): Optional, another subgraph this one should be under
+            edges(list): list the (node name, next hops) tuples whose edges
+                have to be added (outside of any cluster) are appended to
+                (see _next_hops)
+            nested(callable): Optional, generator of the lines of the
+                clusters nested in this one
         """
-        parent = parent or self._graph
-        cluster = parent.subgraph(name=cluster_name, comment=label)
-
-        with cluster as sg:
-            sg.attr(rankdir="TB")
-            sg.attr(ranksep="0.02")
-            sg.attr(label=label)
-            # Create an invisible node so that we can point to subgraphs
-            invis = self.invis_node_name(cluster_name)
-            sg.node(
-                invis,
-                color="white",
-                len="0",
-                shape="point",
-                width="0",
-                height="0",
+        yield self._line("// {}".format(label))
+        yield self._line("subgraph {} {{".format(_quote(cluster_name)))
+        self._indent += 1
+        yield self._line("rankdir=TB")
+        yield self._line("ranksep=0.02")
+        yield self._line("label={}".format(_quote(label)))
+        # Create an invisible node so that we can point to subgraphs
+        invis = self.invis_node_name(cluster_name)
+        yield self._node(
+            invis,
+            color="white",
+            height="0",
+            len="0",
+            shape="point",
+            width="0",
+        )
+        nodes, others = self._nodes(flows)
+        previous = None
+        for node_flows in nodes:
+            name = "Flow_{}".format(node_flows[0].id)
+            yield self._flow_node(node_flows, name)
+            # Connect to previous so that dot rendering places them one
+            # after the other
+            if previous:
+                yield self._edge(previous, name, color="white")
+            else:
+                yield self._edge(invis, name, color="white", length="0")
+            previous = name
+
+            # determine next hop
+            edges.append((name, self._next_hops(node_flows)))
+
+        if others:
+            name = "others_{}".format(cluster_name)
+            yield self._node(
+                name,
+                label=self._others_label(others),
+                shape="note",
+                fontsize="8",
             )
-            previous = None
-            for flow in flows:
-                name = "Flow_{}".format(flow.id)
-                sg.node(**self._flow_node(flow, name))
-                # Connect to previous so that dot rendering places them one
-                # after the other
-                if previous:
-                    sg.edge(previous, name, color="white")
-                else:
-                    sg.edge(invis, name, color="white", length="0")
-                previous = name
-
-                # determine next hop
-                self._set_next_node(name, flow)
-
-        return cluster
-
-    def _set_next_node(self, name, flow):
-        """
-        Determine the next node and add edges to it
-        """
-        created = False
+            if previous:
+                yield self._edge(previous, name, color="white")
+            edges.append((name, self._next_hops(others)))
 
-        for kv in flow.actions_kv:
-            if kv.key == "check_pkt_len":
-                for subname, subvalue in kv.value.get("gt").items():
-                    created = self._set_next_node_action(
-                        name, subname, subvalue
-                    )
-                for subname, subvalue in kv.value.get("le").items():
-                    created = self._set_next_node_action(
-                        name, subname, subvalue
-                    )
-            elif kv.key == "sample":
-                for subname, subvalue in kv.value.get("actions").items():
-                    created = self._set_next_node_action(
-                        name, subname, subvalue
-                    )
-            else:
-                created = self._set_next_node_action(name, kv.key, kv.value)
+        if nested:
+            yield from nested()
+        self._indent -= 1
+        yield self._line("}")
 
-        if not created:
-            # Add to a generic "End" if no other action was detected
-            self._graph.edge(name, "end")
+    def _set_next_node(self, name, hops):
+        """
+        Yields the lines of the next nodes of a node and the edges to them
+        (see _next_hops)
+        """
+        for kind, target in hops:
+            yield from self._set_next_node_edge(name, kind, target)
 
-    def _set_next_node_action(self, name, action_name, action_obj):
+    def _set_next_node_edge(self, name, kind, target):
         """
-        Based on the action object, set the next node
+        Yields the lines of the edge to the next node of a (kind, target)
+        edge
         """
-        if action_name == "recirc":
-            cname = self.recirc_cluster_name(action_obj)
-            self._graph.edge(
+        if kind == "recirc":
+            cname = self.recirc_cluster_name(target)
+            yield self._edge(
                 name,
                 self.invis_node_name(cname),
                 lhead=cname,
-                _attributes={"weight": "20"},
+                weight="20",
             )
-            return True
-        elif action_name == "output":
-            port = action_obj.get("port")
-            if port not in self._output_nodes:
-                self._graph.node(
-                    self.output_node_name(port),
-                    shape="Msquare",
-                    label="Port {}".format(port),
+        elif kind == "end":
+            # The generic "End" of the flows without any other action
+            yield self._edge(name, "end")
+        elif kind == "output":
+            if ("output", target) not in self._output_nodes:
+                yield self._node(
+                    self.output_node_name(target),
+                    label="Port {}".format(target),
                     rank="sink",
+                    shape="Msquare",
                 )
-                self._output_nodes.append(port)
-            self._graph.edge(
-                name, self.output_node_name(port), _attributes={"weight": "1"}
-            )
-            return True
-        elif action_name in ["drop", "userspace"]:
-            if action_name not in self._output_nodes:
-                self._graph.node(action_name, shape="Msquare", rank="sink")
-                self._output_nodes.append(action_name)
-                self._graph.edge(
-                    name, action_name, _attributes={"weight": "1"}
-                )
-            return True
-        return False
+                self._output_nodes.add(("output", target))
+            yield self._edge(name, self.output_node_name(target), weight="1")
+        else:
+            if kind not in self._output_nodes:
+                yield self._node(kind, rank="sink", shape="Msquare")
+                self._output_nodes.add(kind)
+            yield self._edge(name, kind, weight="1")
 
     def _populate_graph(self):
-        """Populate the the internal graph"""
+        """Yields the lines of the flow clusters"""
 
-        self._graph.node("end", shape="Msquare")
+        yield self._node("end", shape="Msquare")
 
         for recirc, flows in self._flows.items():
+            edges = list()
             if recirc == 0:
                 # Deal with input ports
                 flows_per_inport = {}
@@ -220,44 +583,56 @@ class DatapathGraph:
                     else:
                         free_flows.append(flow)
 
+                def inport_clusters():
+                    for inport, flows in flows_per_inport.items():
+                        # Build a subgraph per input port
+                        yield from self._create_flow_cluster(
+                            self.inport_cluster_name(inport),
+                            "input port: {}".format(inport),
+                            flows,
+                            edges,
+                        )
+
                 # Build base graph with free flows
-                cluster_name = self.recirc_cluster_name(recirc)
-                label = "recirc {}".format(recirc)
-                sg = self._create_flow_cluster(cluster_name, label, free_flows)
+                yield from self._create_flow_cluster(
+                    self.recirc_cluster_name(recirc),
+                    "recirc {}".format(recirc),
+                    free_flows,
+                    edges,
+                    inport_clusters,
+                )
 
                 # Íf there are free_flows, create a dummy inport port
                 if free_flows:
-                    self._graph.edge(
+                    yield self._edge(
                         "start",
                         self.invis_node_name(self.recirc_cluster_name(0)),
                         lhead=self.recirc_cluster_name(0),
                     )
-                    self._graph.node("start", shape="Mdiamond")
-
-                for inport, flows in flows_per_inport.items():
-                    # Build a subgraph per input port
-                    cluster_name = self.inport_cluster_name(inport)
-                    label = "input port: {}".format(inport)
-
-                    with sg as parent:
-                        self._create_flow_cluster(
-                            cluster_name, label, flows, parent
-                        )
+                    yield self._node("start", shape="Mdiamond")
 
+                for inport in flows_per_inport:
                     # Make an Input node point to each subgraph
+                    cluster_name = self.inport_cluster_name(inport)
                     node_name = "input_{}".format(inport)
-                    self._graph.node(
+                    yield self._node(
                         node_name,
-                        shape="Mdiamond",
                         label="input port {}".format(inport),
+                        shape="Mdiamond",
                     )
-                    self._graph.edge(
+                    yield self._edge(
                         node_name,
                         self.invis_node_name(cluster_name),
                         lhead=cluster_name,
                     )
 
             else:
-                cluster_name = self.recirc_cluster_name(recirc)
-                label = "recirc {}".format(recirc)
-                self._create_flow_cluster(cluster_name, label, flows)
+                yield from self._create_flow_cluster(
+                    self.recirc_cluster_name(recirc),
+                    "recirc {}".format(recirc),
+                    flows,
+                    edges,
+                )
+
+            for name, hops in edges:
+                yield from self._set_next_node(name, hops)
@@ -0,0 +1,182 @@
+""" Defines the datapath flow mask analysis
+"""
+
+import collections
+import json
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.masks import mask_signature, format_signature
+from ovs_dbg.ofparse.console import (
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class SignatureStats:
+    """SignatureStats holds the statistics of the flows that share a mask
+    signature"""
+
+    def __init__(self):
+        self.flows = 0
+        self.packets = 0
+        self.bytes = 0
+
+
+class MaskStats:
+    """MaskStats holds the mask statistics of the flows of a file"""
+
+    def __init__(self):
+        self.flows = 0
+        self.signatures = collections.defaultdict(SignatureStats)
+        # Number of flows that match on each field, and that match on it
+        # with a partial mask
+        self.fields = collections.Counter()
+        self.masked = collections.Counter()
+        self.port_signatures = collections.defaultdict(set)
+
+    def top(self, attr, limit=None):
+        """Returns the (signature, SignatureStats) tuples sorted by one of
+        the SignatureStats attributes"""
+        result = sorted(
+            self.signatures.items(),
+            key=lambda item: getattr(item[1], attr),
+            reverse=True,
+        )
+        return result[:limit] if limit else result
+
+    def dict(self):
+        """Returns the statistics as a dictionary"""
+        return {
+            "flows": self.flows,
+            "signatures": [
+                {
+                    "signature": format_signature(signature),
+                    "flows": stats.flows,
+                    "packets": stats.packets,
+                    "bytes": stats.bytes,
+                }
+                for signature, stats in self.top("flows")
+            ],
+            "fields": {
+                field: {"flows": count, "masked": self.masked[field]}
+                for field, count in self.fields.most_common()
+            },
+            "in_port_signatures": {
+                str(port): len(signatures)
+                for port, signatures in self.port_signatures.items()
+            },
+        }
+
+
+class MaskProcessor(FlowProcessor):
+    """MaskProcessor groups datapath flows by the fields and masks they
+    match on (their mask signature)
+
+    Each distinct signature needs a separate subtable in the datapath
+    classifier (e.g: dpcls), which has to be probed on each lookup. Flows
+    are not stored, only the statistics of each signature.
+    """
+
+    def __init__(self, opts, factory):
+        super().__init__(opts, factory)
+        self.stats = dict()
+
+    def required_keys(self):
+        keys = {"match", "packets", "bytes"}
+        if self.opts.get("filter"):
+            keys.update(self.opts.get("filter").keys())
+        return keys
+
+    def start_file(self, name, filename):
+        self.file_stats = MaskStats()
+
+    def stop_file(self, name, filename):
+        self.stats[name] = self.file_stats
+
+    def process_flow(self, flow, name):
+        stats = self.file_stats
+        signature = mask_signature(flow.match_kv)
+        stats.flows += 1
+        sig_stats = stats.signatures[signature]
+        sig_stats.flows += 1
+        sig_stats.packets += flow.info.get("packets") or 0
+        sig_stats.bytes += flow.info.get("bytes") or 0
+        for field, mask in signature:
+            stats.fields[field] += 1
+            if mask is not None:
+                stats.masked[field] += 1
+        stats.port_signatures[flow.match.get("in_port")].add(signature)
+
+    def json_string(self):
+        """Returns the statistics of each file in JSON format"""
+        return json.dumps(
+            {name: stats.dict() for name, stats in self.stats.items()},
+            indent=4,
+        )
+
+    def print(self, limit):
+        """Print the statistics
+
+        Args:
+            limit (int): The maximum number of signatures and fields to print
+        """
+        console = ConsoleFormatter(opts=self.opts).console
+        with print_context(console, self.opts):
+            for name, stats in self.stats.items():
+                console.print("\n")
+                console.print(file_header(name))
+                tree = Tree("Datapath flow masks")
+                tree.add(
+                    Text.assemble(
+                        ("Flows: ", "bold"),
+                        str(stats.flows),
+                        (" Mask signatures (subtables): ", "bold"),
+                        str(len(stats.signatures)),
+                    )
+                )
+                ports = sorted(
+                    stats.port_signatures.items(),
+                    key=lambda item: len(item[1]),
+                    reverse=True,
+                )
+                tree.add(
+                    Text.assemble(
+                        ("Signatures per in_port: ", "bold"),
+                        ", ".join(
+                            "{}: {}".format(port, len(signatures))
+                            for port, signatures in ports[: limit or None]
+                        ),
+                        ", ..." if limit and len(ports) > limit else "",
+                    )
+                )
+                for attr in ("flows", "packets"):
+                    node = tree.add(
+                        Text("Top signatures by {}".format(attr), "bold")
+                    )
+                    for signature, sig_stats in stats.top(attr, limit):
+                        node.add(
+                            Text.assemble(
+                                (
+                                    "{} flows, {} packets: ".format(
+                                        sig_stats.flows, sig_stats.packets
+                                    ),
+                                    "bold",
+                                ),
+                                format_signature(signature),
+                            )
+                        )
+                node = tree.add(Text("Un-wildcarded fields", "bold"))
+                for field, count in stats.fields.most_common(limit or None):
+                    node.add(
+                        Text.assemble(
+                            (field, "bold"),
+                            ": {} flows ({} masked)".format(
+                                count, stats.masked[field]
+                            ),
+                        )
+                    )
+                console.print(tree)
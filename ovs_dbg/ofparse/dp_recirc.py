@@ -0,0 +1,87 @@
+""" Defines the recirculation index of datapath flows
+"""
+
+
+def flow_edges(flow):
+    """Returns the edges of a datapath flow, i.e: where the packets go after
+    the flow's actions are executed
+
+    Actions nested in clone, sample and check_pkt_len are included.
+
+    Args:
+        flow (ODPFlow): the datapath flow
+
+    Returns:
+        A list of (kind, target) tuples in action order where kind is one of
+        "recirc" (target is the recirc_id), "output" (target is the port),
+        "drop" or "userspace" (target is None)
+    """
+    edges = list()
+    _walk(((kv.key, kv.value) for kv in flow.actions_kv), edges)
+    return edges
+
+
+def _walk(actions, edges):
+    """Append the edges of a list of (name, value) actions to edges"""
+    for name, value in actions:
+        if name == "recirc":
+            edges.append(("recirc", value))
+        elif name == "output":
+            edges.append(
+                (
+                    "output",
+                    value.get("port") if isinstance(value, dict) else value,
+                )
+            )
+        elif name in ("drop", "userspace"):
+            edges.append((name, None))
+        elif not isinstance(value, dict):
+            continue
+        elif name == "clone":
+            _walk(value.items(), edges)
+        elif name == "sample":
+            _walk((value.get("actions") or {}).items(), edges)
+        elif name == "check_pkt_len":
+            for branch in ("gt", "le"):
+                _walk((value.get(branch) or {}).items(), edges)
+
+
+class RecircIndex:
+    """RecircIndex indexes datapath flows by recirc_id and holds the edges of
+    each flow, which are extracted only once
+
+    It is shared by the flow trees and graphs built from the same flows.
+
+    Args:
+        flows (dict[int, list[ODPFlow]]): Optional; initial flows indexed by
+            recirc_id
+    """
+
+    def __init__(self, flows=None):
+        self.flows = dict()
+        self._edges = dict()
+        for flow_list in (flows or {}).values():
+            for flow in flow_list:
+                self.add(flow)
+
+    def add(self, flow):
+        """Add a flow"""
+        rid = flow.match.get("recirc_id") or 0
+        self.flows.setdefault(rid, list()).append(flow)
+        self._edges[id(flow)] = flow_edges(flow)
+
+    def edges(self, flow):
+        """Returns the (kind, target) edges of a flow (see flow_edges)"""
+        edges = self._edges.get(id(flow))
+        if edges is None:
+            edges = self._edges[id(flow)] = flow_edges(flow)
+        return edges
+
+    def recircs(self, flow):
+        """Returns the recirc_ids a flow recirculates to, without
+        duplicates"""
+        result = list()
+        for kind, target in self.edges(flow):
+            if kind == "recirc" and target not in result:
+                result.append(target)
+        return result
@@ -1,3 +1,9 @@
+import collections
+import itertools
+
+from ovs_dbg.ofparse.dp_recirc import RecircIndex
+
+
 class TreeElem:
     """Element in the tree
     Args:
@@ -23,21 +29,33 @@ class FlowElem(TreeElem):
 
     def __init__(self, flow, children=None, is_root=None):
         self.flow = flow
+        # The recirc_ids whose flows are the element's children and the ones
+        # that are not expanded because they would close a recirculation
+        # loop
+        self.recircs = list()
+        self.loops = list()
+        # The packets and bytes of the flow and the flows of its subtree and
+        # their share of the total packets (see FlowTree.rollup)
+        self.subtree_packets = 0
+        self.subtree_bytes = 0
+        self.subtree_share = 0.0
         super(FlowElem, self).__init__(children, is_root)
 
-    def evaluate_any(self, filter):
-        """Evaluate the filter on the element and all its children
-        Args:
-            filter(OFFilter): the filter to evaluate
 
-        Returns:
-            True if ANY of the flows (including self and children) evaluates
-            true
-        """
-        if filter.evaluate(self.flow):
-            return True
+class SubtreeRef(TreeElem):
+    """A reference to the subtree of a recirc_id that is not expanded,
+    either because it has already been traversed or because expanding it
+    would close a recirculation loop
 
-        return any([child.evaluate_any(filter) for child in self.children])
+    Args:
+        recirc (int): the recirc_id of the referenced subtree
+        loop (bool): whether the reference closes a recirculation loop
+    """
+
+    def __init__(self, recirc, loop=False):
+        self.recirc = recirc
+        self.loop = loop
+        super(SubtreeRef, self).__init__()
 
 
 class FlowTree:
@@ -46,108 +64,298 @@ class FlowTree:
     on recirculation ids
 
     Args:
-        flows (list[ODPFlow]: Optional, initial list of flows
+        flows (dict[int, list[ODPFlow]] or RecircIndex): Optional, initial
+            flows indexed by recirc_id. A RecircIndex is used as is (e.g:
+            to share it with a DatapathGraph)
     """
 
     root = None
 
     def __init__(self, flows=None):
-        self._flows = flows or {}  # flow list indexed by recirc_id
+        if isinstance(flows, RecircIndex):
+            self.index = flows
+        else:
+            self.index = RecircIndex(flows)
+        self._flows = self.index.flows  # flow list indexed by recirc_id
+        self._groups = dict()
+        self.total_packets = 0
+        self.total_bytes = 0
         self.root = self.root or TreeElem(is_root=True)
 
     def add(self, flow):
         """Add a flow"""
-        rid = flow.match.get("recirc_id") or 0
-        if not self._flows.get(rid):
-            self._flows[rid] = list()
-        self._flows[rid].append(flow)
+        self.index.add(flow)
 
     def build(self):
-        """Build the flow tree."""
-        self._build(self.root, 0)
+        """Build the flow tree.
 
-    def traverse(self, callback):
-        """Traverses the tree calling callback on each element
-        callback: callable that accepts two TreeElem, the current one being
-            traversed and its parent
-            func callback(elem parent):
-                ...
-            Note parent can be None if it's the first element
+        The flows of each recirc_id are sorted and turned into elements only
+        once: all the flows that recirculate to the same recirc_id share
+        them, so the tree is a directed acyclic graph. Recirculations that
+        would close a loop are not expanded, they are recorded in the
+        element's loops instead.
         """
-        self._traverse(self.root, None, callback)
+        self._groups = dict()
+        self.root.children = self._group(0)
+        # Iterative depth-first search on the recirc_ids that descends into
+        # one recirc_id at a time. A recirc_id is in progress while its
+        # subtree is on the search path and done once it has been built.
+        # Each frame holds a recirc_id, the iterator of its pending elements
+        # and the element being built along with the iterator of its pending
+        # recirc_ids
+        in_progress = {0}
+        done = set()
+        stack = [[0, iter(self.root.children), None, None]]
+        while stack:
+            frame = stack[-1]
+            recirc, elems, elem, targets = frame
+            if elem is None:
+                elem = next(elems, None)
+                if elem is None:
+                    stack.pop()
+                    in_progress.discard(recirc)
+                    done.add(recirc)
+                    continue
+                targets = iter(self.index.recircs(elem.flow))
+                frame[2:] = elem, targets
 
-    def _traverse(self, elem, parent, callback):
-        callback(elem, parent)
+            descended = False
+            for next_recirc in targets:
+                if not self._flows.get(next_recirc):
+                    continue
+                if next_recirc in in_progress:
+                    elem.loops.append(next_recirc)
+                    continue
+                elem.recircs.append(next_recirc)
+                if next_recirc not in done:
+                    # Build the subtree and come back to this element
+                    in_progress.add(next_recirc)
+                    stack.append(
+                        [
+                            next_recirc,
+                            iter(self._group(next_recirc)),
+                            None,
+                            None,
+                        ]
+                    )
+                    descended = True
+                    break
+            if descended:
+                continue
 
-        for child in elem.children:
-            self._traverse(child, elem, callback)
+            if len(elem.recircs) == 1:
+                # Share the list of children
+                elem.children = self._groups[elem.recircs[0]]
+            else:
+                for next_recirc in elem.recircs:
+                    elem.children.extend(self._groups[next_recirc])
+            frame[2] = None
+        self.rollup()
 
-    def _build(self, parent, recirc):
-        """
-        Build the subtree starting at a specific recirc_id. Recursive function.
-        Args:
-            parent (TreeElem): parent of the (sub)tree
-            recirc(int): the recirc_id subtree to build
+    def rollup(self):
+        """Compute the packets and bytes of the subtree of each element and
+        its share of the total packets in a single post-order pass
+
+        The counters of a recirc_id subtree are split among the flows that
+        recirculate to it in proportion to their packets (or evenly if none
+        of them has packets), so that each flow is accounted once and the
+        shares of the first level flows add up to 100%.
         """
-        flows = self._flows.get(recirc)
-        if not flows:
-            return
-        for flow in sorted(
-            flows, key=lambda x: x.info.get("packets") or 0, reverse=True
-        ):
-            next_recirc = self._get_next_recirc(flow)
+        # recirc_id -> packets and number of the flows that recirculate to it
+        parent_packets = collections.Counter()
+        parents = collections.Counter()
+        for group in self._groups.values():
+            for elem in group:
+                for next_recirc in elem.recircs:
+                    parent_packets[next_recirc] += _packets(elem)
+                    parents[next_recirc] += 1
 
-            elem = self._new_elem(flow, parent)
-            parent.append(elem)
+        def weight(elem, recirc):
+            if parent_packets[recirc]:
+                return _packets(elem) / parent_packets[recirc]
+            return 1 / parents[recirc]
 
-            if next_recirc:
-                self._build(elem, next_recirc)
+        # recirc_id -> (packets, bytes) of its subtree
+        totals = dict()
+        stack = [(0, False)]
+        while stack:
+            recirc, expanded = stack.pop()
+            if recirc in totals:
+                continue
+            group = self._groups.get(recirc) or []
+            if not expanded:
+                stack.append((recirc, True))
+                stack.extend(
+                    (next_recirc, False)
+                    for elem in group
+                    for next_recirc in elem.recircs
+                    if next_recirc not in totals
+                )
+                continue
+            for elem in group:
+                elem.subtree_packets = _packets(elem)
+                elem.subtree_bytes = elem.flow.info.get("bytes") or 0
+                for next_recirc in elem.recircs:
+                    elem_weight = weight(elem, next_recirc)
+                    elem.subtree_packets += (
+                        elem_weight * totals[next_recirc][0]
+                    )
+                    elem.subtree_bytes += elem_weight * totals[next_recirc][1]
+            totals[recirc] = (
+                sum(elem.subtree_packets for elem in group),
+                sum(elem.subtree_bytes for elem in group),
+            )
 
-    def _get_next_recirc(self, flow):
-        """Get the next recirc_id from a list of actions or None if not found.
+        self.total_packets, self.total_bytes = totals[0]
+        for group in self._groups.values():
+            for elem in group:
+                elem.subtree_share = (
+                    elem.subtree_packets / self.total_packets
+                    if self.total_packets
+                    else 0.0
+                )
 
-        The recirc_id is obtained from actions such as recirc, but also
-        complex actions such as check_pkt_len and sample
-        """
+    def _group(self, recirc):
+        """Returns the (memoized) elements of the flows of a recirc_id sorted
+        by decreasing number of packets"""
+        elems = self._groups.get(recirc)
+        if elems is None:
+            elems = self._groups[recirc] = [
+                self._new_elem(flow, None)
+                for flow in sorted(
+                    self._flows.get(recirc) or [],
+                    key=lambda x: x.info.get("packets") or 0,
+                    reverse=True,
+                )
+            ]
+        return elems
 
-        def find_in_dict(actions_dict):
-            return next(
-                (v for k, v in actions_dict.items() if k == "recirc"),
-                None,
-            )
+    def traverse(self, callback, expand_shared=True):
+        """Traverses the tree calling callback on each element
+        callback: callable that accepts two TreeElem, the current one being
+            traversed and its parent
+            func callback(elem parent):
+                ...
+            Note parent can be None if it's the first element
+
+        Subtrees that are not expanded are passed to the callback as a
+        SubtreeRef child of the element that recirculates to them.
+
+        Args:
+            callback (callable): the callback
+            expand_shared (bool): Optional; whether the subtree of a
+                recirc_id is traversed each time a flow recirculates to it.
+                If False, it is only traversed the first time. Default: True
+        """
+        seen = {0}
+        # Items are (element, parent) tuples or (recirc_id, parent) tuples
+        # for the subtrees to expand, which are only resolved when they are
+        # reached so that the first one traversed is the one expanded
+        stack = [(self.root, None)]
+        while stack:
+            elem, parent = stack.pop()
+            if not isinstance(elem, TreeElem):
+                if not expand_shared and elem in seen:
+                    callback(SubtreeRef(elem), parent)
+                else:
+                    seen.add(elem)
+                    stack.extend(
+                        (child, parent)
+                        for child in reversed(self._groups[elem])
+                    )
+                continue
 
-        for action in flow.actions_kv:
-            if action.key == "recirc":
-                return action.value
-            if action.key == "check_pkt_len":
-                recirc = find_in_dict(action.value.get("gt"))
-                if recirc:
-                    return recirc
-                recirc = find_in_dict(action.value.get("le"))
-                if recirc:
-                    return recirc
-            if action.key == "sample":
-                return find_in_dict(action.value.get("actions"))
-
-        return None
+            callback(elem, parent)
+            if elem.is_root:
+                children = list(elem.children)
+            else:
+                children = list(getattr(elem, "recircs", []))
+                children.extend(
+                    SubtreeRef(recirc, loop=True)
+                    for recirc in getattr(elem, "loops", [])
+                )
+            stack.extend((child, elem) for child in reversed(children))
 
     def _new_elem(self, flow, parent):
         """Creates a new TreeElem
         Default implementation is to create a FlowElem. Derived classes can
-        override this method to return any derived TreeElem
+        override this method to return any derived TreeElem. Since elements
+        are shared by all the flows that recirculate to the same recirc_id,
+        parent is always None
         """
         return FlowElem(flow)
 
     def filter(self, filter):
         """Removes the first level subtrees if none of its sub-elements match
         the filter
+
+        The filter is evaluated at most once per flow and the evaluation of a
+        subtree stops as soon as one of its flows matches. The result of each
+        recirc_id subtree is memoized, so the cost is linear in the number of
+        flows even if subtrees are shared.
+
         Args:
             filter(OFFilter): filter to apply
         """
-        to_remove = list()
-        for l0 in self.root.children:
-            passes = l0.evaluate_any(filter)
-            if not passes:
-                to_remove.append(l0)
-        for elem in to_remove:
-            self.root.children.remove(elem)
+        flow_results = dict()
+        group_results = dict()
+        self.root.children = [
+            elem
+            for elem in self.root.children
+            if self._any_matches([elem], filter, flow_results, group_results)
+        ]
+
+    def _any_matches(self, elems, filter, flow_results, group_results):
+        """Returns whether any flow of a list of elements or of their
+        subtrees matches the filter
+
+        Args:
+            elems (list[FlowElem]): the elements
+            filter (OFFilter): the filter to evaluate
+            flow_results (dict): the memoized result of each flow
+            group_results (dict): the memoized result of each recirc_id
+                subtree
+        """
+
+        def flow_matches(flow):
+            result = flow_results.get(id(flow))
+            if result is None:
+                result = flow_results[id(flow)] = bool(filter.evaluate(flow))
+            return result
+
+        # Iterative depth-first search. Each item is the recirc_id being
+        # evaluated (None for elems) and the iterator of its pending elements
+        result = False
+        stack = [(None, iter(elems))]
+        while stack:
+            recirc, pending = stack[-1]
+            descended = False
+            result = False
+            for elem in pending:
+                if flow_matches(elem.flow) or any(
+                    group_results.get(next_recirc)
+                    for next_recirc in elem.recircs
+                ):
+                    result = True
+                    break
+                next_recirc = next(
+                    (r for r in elem.recircs if r not in group_results), None
+                )
+                if next_recirc is not None:
+                    # Evaluate the subtree and come back to this element
+                    stack[-1] = (recirc, itertools.chain([elem], pending))
+                    stack.append(
+                        (next_recirc, iter(self._groups.get(next_recirc, [])))
+                    )
+                    descended = True
+                    break
+            if not descended:
+                stack.pop()
+                if recirc is not None:
+                    group_results[recirc] = result
+        return result
+
+
+def _packets(elem):
+    """Returns the packets of the flow of a FlowElem"""
+    return elem.flow.info.get("packets") or 0
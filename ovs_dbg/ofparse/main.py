@@ -1,8 +1,10 @@
 import click
 import os.path
+import sys
 import configparser
 
 from ovs_dbg.filter import OFFilter
+from ovs_dbg.ofparse.server import request
 from pkg_resources import resource_filename
 
 _default_config_file = "ofparse.conf"
@@ -40,7 +42,80 @@ def validate_input(ctx, param, value):
     return result
 
 
+def validate_fields(ctx, param, value):
+    """Validate the "--fields" option"""
+    if not value:
+        return None
+
+    fields = [field.strip() for field in value.split(",")]
+    if not all(fields):
+        raise click.BadParameter(
+            "fields should have the following format: "
+            "[section.]key[,[section.]key...]"
+        )
+    return fields
+
+
+class MainGroup(click.Group):
+    """The main command group
+
+    If a server is provided (--server), the command is not run locally but
+    sent to the server instead.
+    """
+
+    # Main options forwarded to the server
+    server_options = {
+        "config": "--config",
+        "style": "--style",
+        "filter": "--filter",
+        "highlight": "--highlight",
+        "top": "--top",
+        "sort": "--sort",
+        "sample": "--sample",
+    }
+
+    def resolve_command(self, ctx, args):
+        # args holds the command and its arguments
+        server = ctx.params.get("server")
+        if server and not ctx.resilient_parsing:
+            self.forward(ctx, server, args)
+        return super().resolve_command(ctx, args)
+
+    def forward(self, ctx, server, args):
+        """Send the command to the server and exit with its status
+
+        Args:
+            ctx (click.Context): The context of the main group
+            server (str): The path of the server's UNIX socket
+            args (list[str]): The command and its arguments
+        """
+        if ctx.params.get("filename"):
+            raise click.BadParameter(
+                "the inputs are read by the server", param_hint="'-i'"
+            )
+        server_args = list()
+        for name, option in self.server_options.items():
+            if ctx.params.get(name):
+                server_args.extend([option, str(ctx.params.get(name))])
+        server_args.extend(args)
+
+        try:
+            reply = request(server, server_args)
+        except OSError as e:
+            raise click.BadParameter(
+                "Failed to connect to server {}: {}".format(server, e)
+            )
+
+        click.echo(reply["stderr"], err=True, nl=False)
+        if ctx.params.get("paged"):
+            click.echo_via_pager(reply["stdout"], color=sys.stdout.isatty())
+        else:
+            sys.stdout.write(reply["stdout"])
+        ctx.exit(reply["status"])
+
+
 @click.group(
+    cls=MainGroup,
     subcommand_metavar="TYPE",
     context_settings=dict(help_option_names=["-h", "--help"]),
 )
@@ -65,7 +140,9 @@ def validate_input(ctx, param, value):
     help="Read flows from specified filepath. If not provided, flows will be"
     " read from stdin. This option can be specified multiple times."
     " Format [alias,]FILENAME. Where alias is a name that shall be used to"
-    " refer to this FILENAME",
+    " refer to this FILENAME. Files (and stdin) can also contain the output"
+    " of the json command. Files can also be archives written by the export"
+    " command",
     multiple=True,
     type=click.Path(),
     callback=validate_input,
@@ -95,8 +172,55 @@ def validate_input(ctx, param, value):
     type=str,
     show_default=False,
 )
+@click.option(
+    "--top",
+    help="Only process the N flows (of each file) with the highest value of "
+    "the --sort key. Only the selected flows are kept in memory",
+    type=click.IntRange(min=1),
+    metavar="N",
+    default=None,
+)
+@click.option(
+    "--sort",
+    help="Key to select the --top flows by. Packet and byte counters can be "
+    "specified with either their openflow or their datapath name. 'used' "
+    "selects the most recently used flows",
+    type=click.Choice(
+        ["n_packets", "n_bytes", "duration", "packets", "bytes", "used"]
+    ),
+    default="packets",
+    show_default=True,
+)
+@click.option(
+    "--sample",
+    help="Only process a uniform random sample of N flows (of each file). "
+    "Only the selected flows are kept in memory",
+    type=click.IntRange(min=1),
+    metavar="N",
+    default=None,
+)
+@click.option(
+    "-S",
+    "--server",
+    help="Send the command to the server listening on the specified UNIX "
+    "socket (see the serve command) instead of reading the inputs",
+    type=click.Path(),
+    default=None,
+)
 @click.pass_context
-def maincli(ctx, config, style, filename, paged, filter, highlight):
+def maincli(
+    ctx,
+    config,
+    style,
+    filename,
+    paged,
+    filter,
+    highlight,
+    top,
+    sort,
+    sample,
+    server,
+):
     """
     OpenFlow Parse utility.
 
@@ -105,9 +229,20 @@ def maincli(ctx, config, style, filename, paged, filter, highlight):
     and prints them in different formats.
 
     """
+    # The server runs commands on the flows it has already loaded
+    flows = ctx.obj.get("flows") if ctx.obj else None
     ctx.obj = Options()
+    ctx.obj["flows"] = flows
     ctx.obj["filename"] = filename or None
     ctx.obj["paged"] = paged
+    if top and sample:
+        raise click.BadParameter(
+            "--top and --sample cannot be used together",
+            param_hint="'--top'",
+        )
+    ctx.obj["top"] = top
+    ctx.obj["sort"] = sort
+    ctx.obj["sample"] = sample
     if filter:
         try:
             ctx.obj["filter"] = OFFilter(filter)
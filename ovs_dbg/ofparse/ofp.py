@@ -1,14 +1,23 @@
 import click
+import sys
 import os
 
 from ovs_dbg.ofp import OFPFlowFactory
 from ovs_dbg.ofparse.ofp_logic import LogicFlowProcessor, CookieProcessor
-from ovs_dbg.ofparse.main import maincli
+from ovs_dbg.ofparse.main import maincli, validate_fields
 from ovs_dbg.ofparse.process import (
     FlowProcessor,
     JSONProcessor,
     ConsoleProcessor,
+    ArchiveProcessor,
+    SQLiteProcessor,
 )
+from ovs_dbg.ofparse.server import CacheProcessor, FlowServer
+from ovs_dbg.ofparse.stats import StatsProcessor
+from ovs_dbg.ofparse.ofp_subtables import SubtableProcessor
+from ovs_dbg.ofparse.ofp_trace import TraceProcessor
+from ovs_dbg.ofparse.ofp_shadows import ShadowProcessor
+from ovs_dbg.ofparse.ofp_conjunctions import ConjunctionProcessor
 from ovs_dbg.ofparse.html import HTMLBuffer, HTMLFormatter, HTMLStyle
 
 factory = OFPFlowFactory()
@@ -22,12 +31,280 @@ def openflow(opts):
 
 
 @openflow.command()
+@click.option(
+    "--fields",
+    help="Comma-separated list of fields to print. Format: [section.]key, "
+    "e.g: table,cookie,actions.output. Only the printed fields (and the ones "
+    "used in the filter) are decoded",
+    type=str,
+    default=None,
+    callback=validate_fields,
+)
+@click.option(
+    "--ndjson",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print one JSON object per line (JSON Lines) instead of a JSON "
+    "array",
+)
+@click.option(
+    "--compact",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Do not indent the JSON output",
+)
 @click.pass_obj
-def json(opts):
+def json(opts, fields, ndjson, compact):
     """Print the flows in JSON format"""
-    proc = JSONProcessor(opts, factory)
+    proc = JSONProcessor(opts, factory, fields, sys.stdout, ndjson, compact)
+    proc.process()
+
+
+@openflow.command()
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["bin", "sqlite"]),
+    default="bin",
+    show_default=True,
+    help="Export format. bin: binary flow archive that can be used as input "
+    "(-i) of other commands. sqlite: SQLite database (flows are appended if "
+    "it exists)",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+    help="Output file",
+)
+@click.pass_obj
+def export(opts, fmt, output):
+    """Export the flows into a file"""
+    if fmt == "sqlite":
+        proc = SQLiteProcessor(opts, factory, output)
+    else:
+        proc = ArchiveProcessor(opts, factory, output)
+    proc.process()
+
+
+@openflow.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of values to print for each key (the most common "
+    "ones are printed). 0 prints all of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the statistics in JSON format",
+)
+@click.pass_obj
+def stats(opts, limit, as_json):
+    """Print flow statistics (counts per key, action usage, zero-hit flows
+    and counter percentiles) computed in a single pass"""
+    proc = StatsProcessor(
+        opts,
+        factory,
+        [
+            ("Tables", "info", "table", str),
+            ("Priorities", "match", "priority", str),
+            ("Cookies", "info", "cookie", hex),
+        ],
+        ["n_packets", "n_bytes"],
+    )
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@openflow.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of subtables to print per table (the ones with the "
+    "most flows are printed). 0 prints all of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the subtables in JSON format",
+)
+@click.pass_obj
+def subtables(opts, limit, as_json):
+    """Print the classifier subtables (distinct sets of fields and masks) of
+    each table"""
+    proc = SubtableProcessor(opts, factory)
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@openflow.command()
+@click.argument("packet", required=False)
+@click.option(
+    "-p",
+    "--packets",
+    type=click.File("r"),
+    help="File with the packets to trace, one per line",
+)
+@click.option(
+    "-t",
+    "--table",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Table to start the trace in",
+)
+@click.option(
+    "--ct-next",
+    multiple=True,
+    help="ct_state of the packet after each ct(table=...) action, e.g: "
+    "trk|est. Can be repeated. Default: trk|new",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the traces in JSON format",
+)
+@click.pass_obj
+def trace(opts, packet, packets, table, ct_next, as_json):
+    """Trace a packet through the OpenFlow pipeline
+
+    PACKET has the same format as a flow match, e.g:
+    in_port=3,tcp,nw_dst=10.0.0.1,tp_dst=80
+    """
+    packet_list = [packet] if packet else []
+    if packets:
+        packet_list.extend(
+            line.strip()
+            for line in packets
+            if line.strip() and not line.startswith("#")
+        )
+    if not packet_list:
+        raise click.BadParameter("No packet to trace")
+
+    proc = TraceProcessor(opts, factory, packet_list, table, list(ct_next))
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print()
+
+
+@openflow.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of flows to print per table. 0 prints all of them",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the flows in JSON format",
+)
+@click.pass_obj
+def shadows(opts, limit, as_json):
+    """Print the flows that can never be hit because a higher priority flow
+    covers their match or because they are duplicates"""
+    proc = ShadowProcessor(opts, factory)
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@openflow.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help="Maximum number of groups to print per file. 0 prints all of them",
+)
+@click.option(
+    "--min-savings",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Minimum number of flows a group must save to be printed",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Print the groups in JSON format",
+)
+@click.pass_obj
+def conjunctions(opts, limit, min_savings, as_json):
+    """Print the groups of flows that could be replaced by conjunctive
+    matches
+
+    Flows of a table with the same priority and actions that form a cross
+    product of the values of two fields can be replaced by one flow per value
+    plus a single conj_id flow.
+    """
+    proc = ConjunctionProcessor(opts, factory, min_savings)
+    proc.process()
+    if as_json:
+        print(proc.json_string())
+    else:
+        proc.print(limit)
+
+
+@openflow.command()
+@click.option(
+    "-s",
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    required=True,
+    help="UNIX socket to listen on",
+)
+@click.pass_obj
+def serve(opts, socket_path):
+    """Keep the flows in memory and run the commands sent by clients
+
+    Commands are sent by running ofparse with the --server option, e.g:
+    ofparse --server SOCKET -f FILTER openflow logic
+    """
+    if opts.get("flows") is not None:
+        raise click.UsageError("The server cannot run another server")
+    proc = CacheProcessor(opts, factory)
     proc.process()
-    print(proc.json_string())
+    FlowServer(socket_path, proc.flows, maincli).serve_forever()
 
 
 @openflow.command()
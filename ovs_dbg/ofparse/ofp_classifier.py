@@ -0,0 +1,34 @@
+""" Defines the processor that indexes openflow flows in a classifier
+"""
+
+from ovs_dbg.classifier import Classifier, ClassifierError
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class ClassifierProcessor(FlowProcessor):
+    """ClassifierProcessor builds a Classifier with the flows of each file
+
+    Flows that cannot match any packet (e.g: "tcp,ipv6") are skipped.
+
+    Attributes:
+        classifiers (dict): The classifiers indexed by file alias
+        skipped (dict): The number of skipped flows indexed by file alias
+    """
+
+    def __init__(self, opts, factory):
+        super().__init__(opts, factory)
+        self.classifiers = dict()
+        self.skipped = dict()
+
+    def start_file(self, name, filename):
+        self.classifier = Classifier()
+        self.skipped[name] = 0
+
+    def stop_file(self, name, filename):
+        self.classifiers[name] = self.classifier
+
+    def process_flow(self, flow, name):
+        try:
+            self.classifier.add(flow)
+        except ClassifierError:
+            self.skipped[name] += 1
@@ -0,0 +1,133 @@
+""" Defines the openflow conjunctive match advisor processor
+"""
+
+import json
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.conjunctions import ConjunctionAdvisor
+from ovs_dbg.ofparse.console import (
+    ConsoleBuffer,
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class ConjunctionProcessor(FlowProcessor):
+    """ConjunctionProcessor finds the groups of flows of each file that
+    could be replaced by conjunctive matches
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        min_savings (int): The minimum number of flows a group must save to
+            be reported
+    """
+
+    def __init__(self, opts, factory, min_savings=1):
+        super().__init__(opts, factory)
+        self.min_savings = min_savings
+        self.advisors = dict()
+
+    def start_file(self, name, filename):
+        self.advisor = ConjunctionAdvisor(self.min_savings)
+
+    def stop_file(self, name, filename):
+        self.advisors[name] = self.advisor
+
+    def process_flow(self, flow, name):
+        self.advisor.add(flow)
+
+    def cross_products(self):
+        """Returns the CrossProducts of each file"""
+        return {
+            name: advisor.cross_products()
+            for name, advisor in self.advisors.items()
+        }
+
+    def json_string(self):
+        """Returns the cross products in JSON format"""
+        result = dict()
+        for name, crosses in self.cross_products().items():
+            result[name] = {
+                "flows": self.advisors[name].flows,
+                "savings": sum(cross.savings for cross in crosses),
+                "cross_products": [
+                    {**cross.dict(), "example": cross.example.orig}
+                    for cross in crosses
+                ],
+            }
+        return json.dumps(result, indent=4)
+
+    def print(self, limit):
+        """Print the groups of flows that could be replaced by conjunctive
+        matches
+
+        Args:
+            limit (int): The maximum number of groups to print per file
+        """
+        formatter = ConsoleFormatter(opts=self.opts)
+        console = formatter.console
+        with print_context(console, self.opts):
+            for name, crosses in self.cross_products().items():
+                console.print("\n")
+                console.print(file_header(name))
+                tree = Tree(
+                    Text.assemble(
+                        ("Flows that could be replaced: ", "bold"),
+                        "{} of {} by {} conjunctive flows (saving {})".format(
+                            sum(cross.flows for cross in crosses),
+                            self.advisors[name].flows,
+                            sum(cross.conjunctive_flows for cross in crosses),
+                            sum(cross.savings for cross in crosses),
+                        ),
+                    )
+                )
+                for cross in crosses[: limit or None]:
+                    node = tree.add(
+                        Text.assemble(
+                            (
+                                "Table {} priority {}: ".format(
+                                    cross.table, cross.priority
+                                ),
+                                "bold",
+                            ),
+                            "{} flows -> {} (saving {})".format(
+                                cross.flows,
+                                cross.conjunctive_flows,
+                                cross.savings,
+                            ),
+                        )
+                    )
+                    for field, values in zip(cross.fields, cross.dimensions):
+                        node.add(
+                            Text.assemble(
+                                (
+                                    "{} ({}): ".format(field, len(values)),
+                                    "bold",
+                                ),
+                                ", ".join(values),
+                            )
+                        )
+                    if cross.common:
+                        node.add(
+                            Text.assemble(
+                                ("Common match: ", "bold"),
+                                ",".join(
+                                    "{}={}".format(field, value)
+                                    for field, value in cross.common.items()
+                                ),
+                            )
+                        )
+                    node.add(
+                        Text.assemble(("Actions: ", "bold"), cross.actions)
+                    )
+                    buf = ConsoleBuffer(Text("Example: ", "bold"))
+                    formatter.format_flow(buf, cross.example)
+                    node.add(buf.text)
+                if limit and len(crosses) > limit:
+                    tree.add("...")
+                console.print(tree)
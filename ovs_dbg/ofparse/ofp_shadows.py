@@ -0,0 +1,91 @@
+""" Defines the openflow shadowed flow processor
+"""
+
+import collections
+import json
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.shadows import shadowed_flows
+from ovs_dbg.ofparse.console import (
+    ConsoleBuffer,
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.ofp_classifier import ClassifierProcessor
+
+
+class ShadowProcessor(ClassifierProcessor):
+    """ShadowProcessor finds the flows of each file that can never be hit
+    because a higher priority flow covers them or because they are
+    duplicates"""
+
+    def shadowed(self):
+        """Returns the ShadowedFlows of each file"""
+        return {
+            name: shadowed_flows(classifier)
+            for name, classifier in self.classifiers.items()
+        }
+
+    def json_string(self):
+        """Returns the shadowed flows in JSON format"""
+        return json.dumps(
+            {
+                name: [shadowed.dict() for shadowed in flows]
+                for name, flows in self.shadowed().items()
+            },
+            indent=4,
+        )
+
+    def print(self, limit):
+        """Print the shadowed flows of each table
+
+        Args:
+            limit (int): The maximum number of flows to print per table
+        """
+        formatter = ConsoleFormatter(opts=self.opts)
+        console = formatter.console
+        with print_context(console, self.opts):
+            for name, flows in self.shadowed().items():
+                console.print("\n")
+                console.print(file_header(name))
+                tables = collections.defaultdict(list)
+                for shadowed in flows:
+                    tables[shadowed.table].append(shadowed)
+
+                tree = Tree(
+                    Text.assemble(
+                        ("Flows that can never be hit: ", "bold"),
+                        "{} of {} ({} duplicates)".format(
+                            len(flows),
+                            len(self.classifiers[name]),
+                            sum(shadowed.duplicate for shadowed in flows),
+                        ),
+                    )
+                )
+                for table, table_flows in tables.items():
+                    node = tree.add(
+                        Text.assemble(
+                            ("Table {}: ".format(table), "bold"),
+                            "{} flows".format(len(table_flows)),
+                        )
+                    )
+                    for shadowed in table_flows[: limit or None]:
+                        buf = ConsoleBuffer(Text())
+                        formatter.format_flow(buf, shadowed.flow)
+                        flow_node = node.add(buf.text)
+                        buf = ConsoleBuffer(
+                            Text(
+                                "duplicate of: "
+                                if shadowed.duplicate
+                                else "shadowed by: ",
+                                "bold",
+                            )
+                        )
+                        formatter.format_flow(buf, shadowed.by)
+                        flow_node.add(buf.text)
+                    if limit and len(table_flows) > limit:
+                        node.add("...")
+                console.print(tree)
@@ -0,0 +1,161 @@
+""" Defines the openflow subtable analysis
+"""
+
+import collections
+import json
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.masks import mask_signature, format_signature, ofp_match_kv
+from ovs_dbg.ofparse.console import (
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class Subtable:
+    """Subtable holds the statistics of the flows of a table that share a
+    mask signature"""
+
+    def __init__(self):
+        self.flows = 0
+        self.packets = 0
+        self.priorities = set()
+
+    def dict(self, signature):
+        """Returns the statistics as a dictionary"""
+        return {
+            "signature": format_signature(signature),
+            "flows": self.flows,
+            "packets": self.packets,
+            "min_priority": min(self.priorities),
+            "max_priority": max(self.priorities),
+            "priorities": len(self.priorities),
+        }
+
+
+class TableSubtables:
+    """TableSubtables holds the subtables of an openflow table"""
+
+    def __init__(self):
+        self.flows = 0
+        self.subtables = collections.defaultdict(Subtable)
+
+    def sorted(self, limit=None):
+        """Returns the (signature, Subtable) tuples sorted by number of
+        flows"""
+        result = sorted(
+            self.subtables.items(),
+            key=lambda item: item[1].flows,
+            reverse=True,
+        )
+        return result[:limit] if limit else result
+
+    def dict(self):
+        """Returns the statistics as a dictionary"""
+        return {
+            "flows": self.flows,
+            "subtables": [
+                subtable.dict(signature)
+                for signature, subtable in self.sorted()
+            ],
+        }
+
+
+class SubtableProcessor(FlowProcessor):
+    """SubtableProcessor computes the subtables that the OpenFlow classifier
+    would create for each table
+
+    The classifier keeps a hash table (subtable) per distinct set of fields
+    and masks (mask signature) and, on each lookup, probes them in
+    decreasing order of maximum priority until no remaining subtable can
+    contain a higher priority match. Tables with many subtables that span
+    overlapping priorities are therefore expensive to look up.
+    """
+
+    def __init__(self, opts, factory):
+        super().__init__(opts, factory)
+        self.tables = dict()
+
+    def required_keys(self):
+        keys = {"match", "table", "n_packets"}
+        if self.opts.get("filter"):
+            keys.update(self.opts.get("filter").keys())
+        return keys
+
+    def start_file(self, name, filename):
+        self.file_tables = collections.defaultdict(TableSubtables)
+
+    def stop_file(self, name, filename):
+        self.tables[name] = dict(sorted(self.file_tables.items()))
+
+    def process_flow(self, flow, name):
+        table = self.file_tables[flow.info.get("table", 0)]
+        table.flows += 1
+        subtable = table.subtables[mask_signature(ofp_match_kv(flow.match_kv))]
+        subtable.flows += 1
+        subtable.packets += flow.info.get("n_packets") or 0
+        subtable.priorities.add(flow.match.get("priority", 32768))
+
+    def json_string(self):
+        """Returns the subtables of each file in JSON format"""
+        return json.dumps(
+            {
+                name: {
+                    str(table_id): table.dict()
+                    for table_id, table in tables.items()
+                }
+                for name, tables in self.tables.items()
+            },
+            indent=4,
+        )
+
+    def print(self, limit):
+        """Print the subtables of each table, starting with the tables that
+        have the most subtables
+
+        Args:
+            limit (int): The maximum number of subtables to print per table
+        """
+        console = ConsoleFormatter(opts=self.opts).console
+        with print_context(console, self.opts):
+            for name, tables in self.tables.items():
+                console.print("\n")
+                console.print(file_header(name))
+                tree = Tree("Openflow subtables")
+                for table_id, table in sorted(
+                    tables.items(),
+                    key=lambda item: len(item[1].subtables),
+                    reverse=True,
+                ):
+                    node = tree.add(
+                        Text.assemble(
+                            ("Table {}: ".format(table_id), "bold"),
+                            "{} flows, {} subtables".format(
+                                table.flows, len(table.subtables)
+                            ),
+                        )
+                    )
+                    for signature, subtable in table.sorted(limit):
+                        node.add(
+                            Text.assemble(
+                                (
+                                    "{} flows, {} packets, priorities "
+                                    "{}-{} ({}): ".format(
+                                        subtable.flows,
+                                        subtable.packets,
+                                        min(subtable.priorities),
+                                        max(subtable.priorities),
+                                        len(subtable.priorities),
+                                    ),
+                                    "bold",
+                                ),
+                                format_signature(signature) or "(catch-all)",
+                            )
+                        )
+                    if limit and len(table.subtables) > limit:
+                        node.add("...")
+                console.print(tree)
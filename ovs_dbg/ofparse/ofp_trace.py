@@ -0,0 +1,123 @@
+""" Defines the openflow trace processor
+"""
+
+import json
+
+import click
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.kv import ParseError
+from ovs_dbg.trace import Tracer, TraceError, parse_packet
+from ovs_dbg.ofparse.console import (
+    ConsoleBuffer,
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.ofp_classifier import ClassifierProcessor
+
+
+class TraceProcessor(ClassifierProcessor):
+    """TraceProcessor traces packets through the flows of each file
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        packets (list[str]): The packets to trace, in the same format as a
+            flow match
+        table (int): The first table
+        ct_next (list[str]): The ct_state after each ct(table=...) action
+    """
+
+    def __init__(self, opts, factory, packets, table, ct_next):
+        super().__init__(opts, factory)
+        self.table = table
+        self.ct_next = ct_next
+        self.packets = list()
+        for packet in packets:
+            try:
+                self.packets.append((packet, parse_packet(packet)))
+            except (ParseError, TraceError) as e:
+                raise click.BadParameter(
+                    "Invalid packet {}: {}".format(packet, e.__cause__ or e)
+                )
+
+    def traces(self):
+        """Yields the (file name, packet string, Trace) of each packet in
+        each file"""
+        for name, classifier in self.classifiers.items():
+            tracer = Tracer(classifier, self.ct_next)
+            for string, packet in self.packets:
+                yield name, string, tracer.trace(packet, self.table)
+
+    def json_string(self):
+        """Returns the traces in JSON format"""
+        result = dict()
+        for name, string, trace in self.traces():
+            result.setdefault(name, list()).append(
+                {"input": string, **trace.dict()}
+            )
+        return json.dumps(result, indent=4)
+
+    def print(self):
+        """Print the traces"""
+        formatter = ConsoleFormatter(opts=self.opts)
+        console = formatter.console
+        with print_context(console, self.opts):
+            current = None
+            for name, string, trace in self.traces():
+                if name != current:
+                    current = name
+                    console.print("\n")
+                    console.print(file_header(name))
+                    if self.skipped[name]:
+                        console.print(
+                            "{} flows that cannot match any packet were "
+                            "skipped".format(self.skipped[name])
+                        )
+                console.print(self._tree(formatter, string, trace))
+
+    @staticmethod
+    def _tree(formatter, string, trace):
+        """Returns a rich Tree representing a trace"""
+        tree = Tree(Text.assemble(("Packet: ", "bold"), string))
+        # The last node of each depth
+        nodes = [tree]
+        for step in trace.steps:
+            text = Text.assemble(
+                ("Table {}".format(step.table), "bold"),
+                " ({})".format(step.reason) if step.reason else "",
+                ": ",
+            )
+            if step.flow is None:
+                text.append("no match, drop", "red")
+            else:
+                formatter.format_flow(ConsoleBuffer(text), step.flow)
+            parent = nodes[min(step.depth, len(nodes) - 1)]
+            del nodes[step.depth + 1 :]
+            nodes.append(parent.add(text))
+
+        tree.add(
+            Text.assemble(
+                ("Output: ", "bold"),
+                ", ".join(str(port) for port in trace.outputs) or "drop",
+            )
+        )
+        changes = trace.changes()
+        if changes:
+            tree.add(
+                Text.assemble(
+                    ("Modified fields: ", "bold"),
+                    ",".join(
+                        "{}={}".format(
+                            field,
+                            hex(value) if isinstance(value, int) else value,
+                        )
+                        for field, value in changes.items()
+                    ),
+                )
+            )
+        for note in trace.notes:
+            tree.add(Text(note, "yellow"))
+        return tree
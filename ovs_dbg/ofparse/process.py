@@ -1,9 +1,14 @@
 """ Defines common flow processing functionality
 """
+import os
 import sys
 import json
+import heapq
+import itertools
+import random
 import click
 
+from ovs_dbg.archive import Archive, ArchiveError, ArchiveWriter, is_archive
 from ovs_dbg.decoders import FlowEncoder
 from ovs_dbg.ofparse.console import (
     ConsoleFormatter,
@@ -13,6 +18,88 @@ from ovs_dbg.ofparse.console import (
 )
 
 
+class TopFlows:
+    """TopFlows keeps the flows with the highest value of an info key
+
+    Args:
+        size (int): The number of flows to keep
+        key (str): The info key to sort the flows by. Packet and byte
+            counters can be named as in either openflow or datapath flows
+            (e.g: "packets" and "n_packets" are equivalent). If the key is
+            "used", the most recently used flows are kept
+    """
+
+    aliases = {
+        "packets": "n_packets",
+        "n_packets": "packets",
+        "bytes": "n_bytes",
+        "n_bytes": "bytes",
+    }
+
+    def __init__(self, size, key):
+        self.size = size
+        self.keys = (key, self.aliases.get(key, key))
+        self.reverse = key == "used"
+        self._heap = list()
+        self._count = 0
+
+    def value(self, flow):
+        """Returns the value to sort a flow by"""
+        info = flow.info
+        value = next((info[key] for key in self.keys if key in info), None)
+        if not isinstance(value, (int, float)):
+            # Flows without the key (or never used) come last
+            return float("-inf")
+        return -value if self.reverse else value
+
+    def add(self, flow):
+        """Add a flow to the selection"""
+        # On equal values, the first flows are kept
+        item = (self.value(flow), -self._count, flow)
+        self._count += 1
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def flows(self):
+        """Returns the selected flows sorted by value"""
+        return [
+            item[2]
+            for item in sorted(
+                self._heap, key=lambda item: item[:2], reverse=True
+            )
+        ]
+
+
+class SampleFlows:
+    """SampleFlows keeps a uniform random sample of the flows (reservoir
+    sampling)
+
+    Args:
+        size (int): The number of flows to keep
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._sample = list()
+        self._count = 0
+
+    def add(self, flow):
+        """Add a flow to the selection"""
+        if len(self._sample) < self.size:
+            self._sample.append((self._count, flow))
+        else:
+            idx = random.randrange(self._count + 1)
+            if idx < self.size:
+                self._sample[idx] = (self._count, flow)
+        self._count += 1
+
+    def flows(self):
+        """Returns the selected flows in their original order"""
+        return [flow for _, flow in sorted(self._sample, key=lambda i: i[0])]
+
+
 class FlowProcessor(object):
     """Base class for file-based Flow processing. It is able to create flows
     from strings found in a file (or stdin).
@@ -21,31 +108,73 @@ class FlowProcessor(object):
     this class.
 
     When process() is called, the base class will:
+        - call self.required_keys() to determine which keys to decode
         - call self.start_file() for each new file that get's processed
-        - call self.create_flow() for each flow line
+        - discard the lines that the filter defined in opts (if provided)
+            rules out without parsing them
+        - call self.create_flow() for each remaining flow line
         - apply the filter defined in opts if provided (can be optionally
             disabled)
         - call self.process_flow() for after the flow has been filtered
         - call self.stop_file() after the file has been processed entirely
 
+    If opts contains "top" (and "sort") or "sample", only the top or a
+    random sample of the flows of each file are processed (see TopFlows and
+    SampleFlows). They are selected while the file is read, so only the
+    selected flows are kept in memory, and passed to process_flow() before
+    stop_file() is called.
+
     In the case of stdin, the filename and file alias is 'stdin'
 
+    The number of files that are going to be processed is available in
+    self.file_count when init() is called.
+
+    Inputs can also contain the JSON output of the json command (either a
+    JSON list or JSON Lines). In that case, flows are built from their JSON
+    representation (see create_flow_from_json()) instead of parsing the flow
+    strings. If the JSON output contains the flows of several files, each of
+    them is processed as a separate file whose alias is the one recorded in
+    the JSON output.
+
+    Inputs can also be flow archives (see ovs_dbg.archive). Archived flows
+    are loaded without parsing nor decoding them.
+
+    If opts contains already built flows (under the "flows" key, as a
+    dictionary of lists of flows indexed by file alias), they are processed
+    instead of the inputs (see the serve command).
+
     Args:
         opts (dict): Options dictionary
         factory (object): Factory object to use to build flows
             The factory object must have a function as:
-                from_string(line, idx)
+                from_string(line, idx, keys)
+            and, to support JSON input, a function as:
+                from_json(flow_dict, idx, keys)
     """
 
+    # Whether the processor needs the original flow strings (e.g: to format
+    # the flows). If so, flows in JSON inputs must contain them
+    requires_orig = True
+
     def __init__(self, opts, factory):
         self.opts = opts
         self.factory = factory
+        self.keys = None
 
     # Methods that must be implemented by derived classes
     def init(self):
         """Called before the flow processing begins"""
         pass
 
+    def required_keys(self):
+        """Called before the flow processing begins to determine the keys that
+        need to be decoded
+
+        Returns a set of keys (or section names) or None if all keys have to
+        be decoded
+        """
+        return None
+
     def start_file(self, alias, filename):
         """Called before the processing of a file begins
         Args:
@@ -62,7 +191,17 @@ class FlowProcessor(object):
 
         Returns a Flow
         """
-        return self.factory.from_string(line, idx)
+        return self.factory.from_string(line, idx, self.keys)
+
+    def create_flow_from_json(self, flow_dict, idx):
+        """Called for each flow found in a JSON input
+        Args:
+            flow_dict(dict): The JSON representation of the flow
+            idx(int): The flow index
+
+        Returns a Flow
+        """
+        return self.factory.from_json(flow_dict, idx, self.keys)
 
     def process_flow(self, flow, name):
         """Called for built flow (after filtering)
@@ -84,75 +223,604 @@ class FlowProcessor(object):
         """Called after the processing ends"""
         pass
 
-    def process(self, do_filter=True):
-        idx = 0
-        filenames = self.opts.get("filename")
-        filt = self.opts.get("filter") if do_filter else None
-        self.init()
-        if filenames:
-            for alias, filename in filenames:
-                try:
-                    with open(filename) as f:
-                        self.start_file(alias, filename)
-                        for line in f:
-                            flow = self.create_flow(line, idx)
-                            idx += 1
-                            if not flow or (filt and not filt.evaluate(flow)):
-                                continue
-                            self.process_flow(flow, alias)
-                        self.stop_file(alias, filename)
-                except IOError as e:
+    def _selection(self):
+        """Returns the flow selection configured in opts (or None)"""
+        if self.opts.get("top"):
+            return TopFlows(self.opts.get("top"), self.opts.get("sort"))
+        if self.opts.get("sample"):
+            return SampleFlows(self.opts.get("sample"))
+        return None
+
+    def _start_file(self, alias, filename):
+        self._selected = self._selection()
+        self.start_file(alias, filename)
+
+    def _process_flow(self, flow, name):
+        if self._selected is not None:
+            self._selected.add(flow)
+        else:
+            self.process_flow(flow, name)
+
+    def _stop_file(self, alias, filename):
+        if self._selected is not None:
+            for flow in self._selected.flows():
+                self.process_flow(flow, alias)
+        self.stop_file(alias, filename)
+
+    @staticmethod
+    def _is_json(data):
+        """Returns whether an input string holds the JSON output of the json
+        command (flow strings never start with "[" or "{")"""
+        return data.lstrip()[:1] in ("[", "{")
+
+    @staticmethod
+    def _json_files(data):
+        """Iterate over the files in the JSON output of the json command
+
+        Args:
+            data(str): The JSON output (a JSON list or JSON Lines)
+
+        Yields:
+            (alias, flow_dicts) tuples where alias is the file alias
+            recorded in the JSON output (or None if it was not recorded)
+            and flow_dicts a list of the JSON representation of the flows
+        """
+        if data.lstrip().startswith("["):
+            items = json.loads(data)
+            if items and all(
+                isinstance(item.get("flows"), list) and "name" in item
+                for item in items
+            ):
+                for item in items:
+                    yield item["name"], item["flows"]
+            else:
+                yield None, items
+        else:
+            flow_dicts = (
+                json.loads(line) for line in data.split("\n") if line.strip()
+            )
+            for alias, group in itertools.groupby(
+                flow_dicts, key=lambda flow_dict: flow_dict.pop("name", None)
+            ):
+                yield alias, list(group)
+
+    @classmethod
+    def _load_json(cls, data, filename):
+        """Load the files in a JSON input
+
+        Args:
+            data(str): The JSON input
+            filename(str): The input filename
+
+        Returns a list of (alias, flow_dicts) tuples (see _json_files)
+        """
+        try:
+            return list(cls._json_files(data))
+        except (ValueError, AttributeError) as e:
+            raise click.BadParameter(
+                "Failed to load JSON flows from {}: {}".format(filename, e)
+            )
+
+    def _process_json(self, files, alias, filename, filt, idx):
+        """Process the flows in a JSON input
+
+        Args:
+            files(list): The files in the JSON input (see _load_json)
+            alias(str): The alias of the input
+            filename(str): The input filename
+            filt(OFFilter): The filter to apply
+            idx(int): The index of the first flow
+
+        Returns the index of the next flow
+        """
+        for name, flow_dicts in files:
+            name = name or alias
+            self._start_file(name, filename)
+            for flow_dict in flow_dicts:
+                orig = flow_dict.get("orig")
+                if self.requires_orig and not orig:
                     raise click.BadParameter(
-                        "Failed to read from file {} ({}): {}".format(
-                            filename, e.errno, e.strerror
+                        "Flows in {} do not contain the original flow strings "
+                        "(orig), they can only be printed in json".format(
+                            filename
                         )
                     )
-        else:
+                if filt and orig and not filt.prefilter(orig):
+                    idx += 1
+                    continue
+                flow = self.create_flow_from_json(flow_dict, idx)
+                idx += 1
+                if not flow or (filt and not filt.evaluate(flow)):
+                    continue
+                self._process_flow(flow, name)
+            self._stop_file(name, filename)
+        return idx
+
+    def _process_archive(self, alias, filename, filt, idx):
+        """Process the flows in an archive
+
+        Args:
+            alias(str): The alias of the input
+            filename(str): The input filename
+            filt(OFFilter): The filter to apply
+            idx(int): The index of the first flow
+
+        Returns the index of the next flow
+        """
+        try:
+            archive = Archive(filename)
+        except ArchiveError as e:
+            raise click.BadParameter(str(e))
+
+        with archive:
+            if len(archive) and archive.flow_class is not (
+                self.factory.flow_class
+            ):
+                raise click.BadParameter(
+                    "{} contains {} flows".format(filename, archive.flow_type)
+                )
+            self._start_file(alias, filename)
+            for i in range(len(archive)):
+                orig = archive.orig(i)
+                if self.requires_orig and not orig:
+                    raise click.BadParameter(
+                        "Flows in {} do not contain the original flow strings"
+                        ", they can only be printed in json".format(filename)
+                    )
+                if filt and orig and not filt.prefilter(orig):
+                    idx += 1
+                    continue
+                flow = archive.flow(i, idx)
+                idx += 1
+                if filt and not filt.evaluate(flow):
+                    continue
+                self._process_flow(flow, alias)
+            self._stop_file(alias, filename)
+        return idx
+
+    @staticmethod
+    def _read_error(filename, error):
+        """Returns the exception to raise when an input cannot be read"""
+        return click.BadParameter(
+            "Failed to read from file {} ({}): {}".format(
+                filename, error.errno, error.strerror
+            )
+        )
+
+    def _inputs(self):
+        """Returns the inputs to process
+
+        JSON inputs are loaded so that the number of files they hold is known
+        before the processing begins.
+
+        Returns:
+            A list of (kind, alias, filename, data) tuples where kind is one
+            of:
+                "flows": data holds the flows that have already been built
+                "archive": a flow archive
+                "json": data holds the files in the JSON input (see
+                    _load_json)
+                "file": a file of flow strings
+                "lines": data holds the flow strings read from stdin
+        """
+        if self.opts.get("flows") is not None:
+            return [("flows", None, None, self.opts.get("flows"))]
+
+        filenames = self.opts.get("filename")
+        if not filenames:
             data = sys.stdin.read()
-            self.start_file("stdin", "stdin")
-            for line in data.split("\n"):
-                line = line.strip()
-                if line:
+            if self._is_json(data):
+                return [
+                    (
+                        "json",
+                        "stdin",
+                        "stdin",
+                        self._load_json(data, "stdin"),
+                    )
+                ]
+            return [("lines", "stdin", "stdin", data)]
+
+        inputs = list()
+        for alias, filename in filenames:
+            try:
+                if is_archive(filename):
+                    inputs.append(("archive", alias, filename, None))
+                    continue
+                with open(filename) as f:
+                    if self._is_json(f.read(64)):
+                        f.seek(0)
+                        inputs.append(
+                            (
+                                "json",
+                                alias,
+                                filename,
+                                self._load_json(f.read(), filename),
+                            )
+                        )
+                    else:
+                        inputs.append(("file", alias, filename, None))
+            except IOError as e:
+                raise self._read_error(filename, e)
+        return inputs
+
+    def process(self, do_filter=True):
+        idx = 0
+        filt = self.opts.get("filter") if do_filter else None
+        self.keys = self.required_keys()
+        if self.keys is not None and self.opts.get("top"):
+            # The flows are sorted by an info key
+            self.keys = self.keys | {"info"}
+        inputs = self._inputs()
+        self.file_count = sum(
+            len(data) if kind in ("flows", "json") else 1
+            for kind, _, _, data in inputs
+        )
+        self.init()
+        for kind, alias, filename, data in inputs:
+            if kind == "flows":
+                self._process_flows(data, filt)
+            elif kind == "archive":
+                idx = self._process_archive(alias, filename, filt, idx)
+            elif kind == "json":
+                idx = self._process_json(data, alias, filename, filt, idx)
+            elif kind == "lines":
+                idx = self._process_lines(data, filt, idx)
+            else:
+                idx = self._process_file(alias, filename, filt, idx)
+        self.end()
+
+    def _process_file(self, alias, filename, filt, idx):
+        """Process the flow strings in a file
+
+        Args:
+            alias(str): The alias of the input
+            filename(str): The input filename
+            filt(OFFilter): The filter to apply
+            idx(int): The index of the first flow
+
+        Returns the index of the next flow
+        """
+        try:
+            with open(filename) as f:
+                self._start_file(alias, filename)
+                for line in f:
+                    if filt and not filt.prefilter(line):
+                        idx += 1
+                        continue
                     flow = self.create_flow(line, idx)
                     idx += 1
                     if not flow or (filt and not filt.evaluate(flow)):
                         continue
-                    self.process_flow(flow, "stdin")
-            self.stop_file("stdin", "stdin")
-        self.end()
+                    self._process_flow(flow, alias)
+                self._stop_file(alias, filename)
+        except BrokenPipeError:
+            # Not a problem with the input file
+            raise
+        except IOError as e:
+            raise self._read_error(filename, e)
+        return idx
+
+    def _process_flows(self, flows, filt):
+        """Process flows that have already been built
+
+        Args:
+            flows(dict): The lists of flows indexed by file alias
+            filt(OFFilter): The filter to apply
+        """
+        for alias, flow_list in flows.items():
+            if flow_list and not isinstance(
+                flow_list[0], self.factory.flow_class
+            ):
+                raise click.BadParameter(
+                    "The loaded flows are not {} objects".format(
+                        self.factory.flow_class.__name__
+                    )
+                )
+            self._start_file(alias, alias)
+            for flow in flow_list:
+                if filt and not filt.evaluate(flow):
+                    continue
+                self._process_flow(flow, alias)
+            self._stop_file(alias, alias)
+
+    def _process_lines(self, data, filt, idx):
+        """Process the flow strings read from stdin"""
+        self._start_file("stdin", "stdin")
+        for line in data.split("\n"):
+            line = line.strip()
+            if line:
+                if filt and not filt.prefilter(line):
+                    idx += 1
+                    continue
+                flow = self.create_flow(line, idx)
+                idx += 1
+                if not flow or (filt and not filt.evaluate(flow)):
+                    continue
+                self._process_flow(flow, "stdin")
+        self._stop_file("stdin", "stdin")
+        return idx
 
 
 class JSONProcessor(FlowProcessor):
-    """A generic JsonProcessor"""
+    """A generic JsonProcessor
 
-    def __init__(self, opts, factory):
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        fields (list[str]): Optional; list of fields to print. Each field has
+            the format [section.]key. A section name alone selects the entire
+            section. If provided, only the printed fields (and the ones used
+            by the filter) are decoded
+        file (file): Optional; file to write the flows to as they are
+            processed. If not provided, flows are stored and can be
+            retrieved with json_string()
+        ndjson (bool): Optional; write the flows as JSON Lines (one compact
+            object per line) instead of a JSON array. Only used if file is
+            provided. If there are several input files, each object contains
+            an additional "name" key with the alias of the file
+        compact (bool): Optional; do not indent the output and use the most
+            compact separators
+    """
+
+    # Indentation of each flow within the JSON array
+    indent = 4
+    requires_orig = False
+
+    def __init__(
+        self,
+        opts,
+        factory,
+        fields=None,
+        file=None,
+        ndjson=False,
+        compact=False,
+    ):
         super().__init__(opts, factory)
         self.flows = dict()
+        self.fields = fields
+        self.file = file
+        self.ndjson = ndjson
+        self.compact = compact
+        self._multi = False
+        self._first = True
+        self._first_file = True
+        self._opened = False
+        self._any_fields = set()
+        self._section_fields = dict()
+        for field in fields or []:
+            section, _, key = field.rpartition(".")
+            if section:
+                self._section_fields.setdefault(section, set()).add(key)
+            else:
+                self._any_fields.add(key)
+
+        if compact:
+            self._dumps_args = {"separators": (",", ":")}
+        elif ndjson:
+            self._dumps_args = {}
+        else:
+            self._dumps_args = {"indent": self.indent}
+
+        # The indenting json encoder is implemented in pure python, so it is
+        # faster to give it values that are already converted into JSON
+        # primitives (see Flow.to_json) than to have it call
+        # FlowEncoder.default for each decoded value. The C encoder, on the
+        # other hand, is faster converting the decoded values on demand
+        self._primitives = "indent" in self._dumps_args
+
+    def required_keys(self):
+        if not self.fields:
+            return None
+
+        keys = {field.rpartition(".")[2] for field in self.fields}
+        if self.opts.get("filter"):
+            keys.update(self.opts.get("filter").keys())
+        return keys
+
+    def _newline(self, level):
+        """Return the string that starts a new line at the given nesting
+        level"""
+        if self.compact:
+            return ""
+        return "\n" + " " * (self.indent * level)
+
+    def _write_array_item(self, text, level):
+        """Write an item of a JSON array in the same format json.dumps would
+        write it
+
+        Args:
+            text (str): The JSON text of the item
+            level (int): The nesting level of the array
+        """
+        self.file.write("," if not self._first else "")
+        self.file.write(self._newline(level))
+        if not self.compact:
+            text = text.replace("\n", self._newline(level))
+        self.file.write(text)
+        self._first = False
+
+    def init(self):
+        # A JSON input can hold the flows of several files
+        self._multi = self.file_count > 1
+
+    def _open(self):
+        """Write the opening bracket of the JSON array
+
+        It is written along with the first output, so nothing is written if
+        the input turns out to be invalid before any flow is processed.
+        """
+        if not self._opened:
+            self.file.write("[")
+            self._opened = True
 
     def start_file(self, name, filename):
         self.flows_list = list()
+        if self.file and not self.ndjson and self._multi:
+            self._open()
+            # Write the file object up to the opening of the flows list
+            header = json.dumps(
+                {"name": name, "flows": []}, **self._dumps_args
+            )
+            self._first = self._first_file
+            self._write_array_item(header[: header.rindex("[") + 1], 1)
+            self._first_file = False
+            self._first = True
 
     def stop_file(self, name, filename):
-        self.flows[name] = self.flows_list
+        if not self.file:
+            self.flows[name] = self.flows_list
+        elif not self.ndjson and self._multi:
+            self.file.write("]" if self._first else self._newline(2) + "]")
+            self.file.write(self._newline(1) + "}")
+            self._first = False
 
     def process_flow(self, flow, name):
-        self.flows_list.append(flow)
+        if not self.file:
+            self.flows_list.append(flow)
+        elif self.ndjson:
+            flow_dict = self.flow_dict(flow)
+            if self._multi:
+                flow_dict = {"name": name, **flow_dict}
+            self.file.write(self.dumps(flow_dict) + "\n")
+        else:
+            self._open()
+            self._write_array_item(
+                self.dumps(self.flow_dict(flow)), 3 if self._multi else 1
+            )
+
+    def process(self, do_filter=True):
+        try:
+            super().process(do_filter)
+        except BrokenPipeError:
+            if not self.file:
+                raise
+            # The reader of the stream (e.g: head) exited early. Redirect the
+            # remaining output to devnull so it does not fail again at exit
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, self.file.fileno())
+
+    def end(self):
+        if self.file and not self.ndjson:
+            self._open()
+            self.file.write("]" if self._first else self._newline(0) + "]")
+            self.file.write("\n")
+        if self.file:
+            self.file.flush()
+
+    def dumps(self, obj):
+        """Serialize an object returned by flow_dict() (or a list of them)
+        with the configured format"""
+        return json.dumps(obj, cls=FlowEncoder, **self._dumps_args)
+
+    def flow_dict(self, flow):
+        """Returns the flow restricted to the selected fields as a
+        dictionary"""
+        if not self.fields:
+            return flow.to_json() if self._primitives else flow.dict()
+
+        flow_dict = {"orig": flow.orig} if "orig" in self._any_fields else {}
+        for section in flow.sections:
+            if section.name in self._any_fields:
+                flow_dict[section.name] = getattr(flow, section.name)
+                continue
+
+            keys = self._any_fields | self._section_fields.get(
+                section.name, set()
+            )
+            data = [kv for kv in section.data if kv.key in keys]
+            if not data:
+                continue
+            if section.is_list:
+                flow_dict[section.name] = [{kv.key: kv.value} for kv in data]
+            else:
+                flow_dict[section.name] = {kv.key: kv.value for kv in data}
+
+        return flow_dict
 
     def json_string(self):
         if len(self.flows.keys()) > 1:
-            return json.dumps(
+            return self.dumps(
                 [
-                    {"name": name, "flows": [flow.dict() for flow in flows]}
+                    {
+                        "name": name,
+                        "flows": [self.flow_dict(flow) for flow in flows],
+                    }
                     for name, flows in self.flows.items()
-                ],
-                indent=4,
-                cls=FlowEncoder,
+                ]
             )
-        return json.dumps(
-            [flow.dict() for flow in self.flows_list],
-            indent=4,
-            cls=FlowEncoder,
-        )
+        return self.dumps([self.flow_dict(flow) for flow in self.flows_list])
+
+
+class ArchiveProcessor(FlowProcessor):
+    """ArchiveProcessor writes the flows into a binary archive
+
+    Flows of all the input files are written into a single archive.
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        output (str): The archive filename
+    """
+
+    requires_orig = False
+
+    def __init__(self, opts, factory, output):
+        super().__init__(opts, factory)
+        self.output = output
+        self.file = None
+        self.writer = None
+
+    def init(self):
+        self.file = open(self.output, "wb")
+        self.writer = ArchiveWriter(self.file)
+
+    def process_flow(self, flow, name):
+        self.writer.add(flow)
+
+    def end(self):
+        self.writer.close()
+        self.file.close()
+
+
+class SQLiteProcessor(FlowProcessor):
+    """SQLiteProcessor writes the flows into a SQLite database
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        output (str): The database filename. If it exists, the flows are
+            appended to it
+    """
+
+    requires_orig = False
+
+    def __init__(self, opts, factory, output):
+        super().__init__(opts, factory)
+        self.output = output
+        self.writer = None
+
+    def init(self):
+        # sqlite3 is imported here because python builds can lack it (e.g:
+        # minimal containers) and it is only needed by this processor
+        import sqlite3
+
+        from ovs_dbg.sqlite import SQLiteWriter
+
+        try:
+            self.writer = SQLiteWriter(self.output)
+        except sqlite3.Error as e:
+            raise click.BadParameter(
+                "Failed to open database {}: {}".format(self.output, e)
+            )
+
+    def start_file(self, name, filename):
+        self.writer.start_file(name, filename, self.factory.flow_class)
+
+    def process_flow(self, flow, name):
+        self.writer.add(flow)
+
+    def end(self):
+        self.writer.close()
 
 
 class ConsoleProcessor(FlowProcessor):
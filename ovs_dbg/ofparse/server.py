@@ -0,0 +1,223 @@
+""" Defines a server that keeps flows in memory and runs ofparse commands on
+them on behalf of clients connected through a UNIX socket
+
+Each connection carries a single request: the client sends a JSON object and
+shuts down its side of the connection. The server runs the command and
+replies with another JSON object before closing the connection.
+
+Request:
+    args (list[str]): the ofparse command line (without inputs)
+    cwd (str): the working directory of the client
+    terminal (bool): whether the client prints into a terminal
+    width (int): the width of the client's terminal
+
+Reply:
+    status (int): the exit status of the command
+    stdout (str): the output of the command
+    stderr (str): the error output of the command
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import signal
+import socket
+import stat
+import sys
+import traceback
+
+import click
+
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class CacheProcessor(FlowProcessor):
+    """CacheProcessor stores the flows of each file
+
+    Attributes:
+        flows (dict): The lists of flows indexed by file alias
+    """
+
+    def __init__(self, opts, factory):
+        super().__init__(opts, factory)
+        self.flows = dict()
+
+    def start_file(self, name, filename):
+        self.flows_list = list()
+
+    def stop_file(self, name, filename):
+        self.flows[name] = self.flows_list
+
+    def process_flow(self, flow, name):
+        self.flows_list.append(flow)
+
+
+@contextlib.contextmanager
+def _environ(**env):
+    """Temporarily set (or unset if None) environment variables"""
+    saved = {name: os.environ.get(name) for name in env}
+    try:
+        for name, value in env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _recv(conn):
+    """Read from a connection until the peer shuts it down"""
+    chunks = list()
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return json.loads(b"".join(chunks))
+        chunks.append(chunk)
+
+
+class FlowServer:
+    """FlowServer runs ofparse commands on flows it keeps in memory
+
+    Requests are served one at a time.
+
+    Args:
+        path (str): The path of the UNIX socket to listen on
+        flows (dict): The lists of flows indexed by file alias
+        command (click.Command): The ofparse command to run
+    """
+
+    def __init__(self, path, flows, command):
+        self.path = path
+        self.flows = flows
+        self.command = command
+
+    def serve_forever(self):
+        """Listen and serve requests until interrupted"""
+        if os.path.exists(self.path):
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise click.BadParameter(
+                    "{} exists and is not a socket".format(self.path)
+                )
+            try:
+                request(self.path, None)
+            except ConnectionRefusedError:
+                # Stale socket
+                os.unlink(self.path)
+            else:
+                raise click.BadParameter(
+                    "{} is already in use".format(self.path)
+                )
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umask)
+
+        # Remove the socket on termination
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            sock.listen()
+            while True:
+                conn, _ = sock.accept()
+                with conn:
+                    try:
+                        reply = self.handle(_recv(conn))
+                        conn.sendall(json.dumps(reply).encode())
+                    except (OSError, ValueError):
+                        # The client went away or sent garbage
+                        continue
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            os.unlink(self.path)
+
+    def handle(self, req):
+        """Run the command of a request
+
+        Args:
+            req (dict): The request
+
+        Returns:
+            The reply
+        """
+        if req.get("args") is None:
+            # Liveness check
+            return {"status": 0, "stdout": "", "stderr": ""}
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        cwd = os.getcwd()
+        status = 0
+        try:
+            os.chdir(req.get("cwd") or cwd)
+            with contextlib.redirect_stdout(
+                stdout
+            ), contextlib.redirect_stderr(stderr), _environ(
+                COLUMNS=str(req.get("width") or 80),
+                FORCE_COLOR="1" if req.get("terminal") else None,
+            ):
+                try:
+                    self.command.main(
+                        args=req["args"],
+                        prog_name="ovs-ofparse",
+                        standalone_mode=False,
+                        obj={"flows": self.flows},
+                    )
+                except click.ClickException as e:
+                    e.show()
+                    status = e.exit_code
+                except click.exceptions.Exit as e:
+                    status = e.exit_code
+                except click.Abort:
+                    status = 1
+                except SystemExit as e:
+                    status = e.code if isinstance(e.code, int) else 1
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+        finally:
+            os.chdir(cwd)
+
+        return {
+            "status": status,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+
+def request(path, args):
+    """Send a request to a FlowServer
+
+    Args:
+        path (str): The path of the server's UNIX socket
+        args (list[str]): The ofparse command line. If None, the server just
+            checks the connection
+
+    Returns:
+        The server reply
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(
+            json.dumps(
+                {
+                    "args": args,
+                    "cwd": os.getcwd(),
+                    "terminal": sys.stdout.isatty(),
+                    "width": shutil.get_terminal_size().columns,
+                }
+            ).encode()
+        )
+        sock.shutdown(socket.SHUT_WR)
+        return _recv(sock)
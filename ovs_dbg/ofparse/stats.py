@@ -0,0 +1,188 @@
+""" Defines the flow statistics processor
+"""
+
+import array
+import collections
+import json
+import math
+
+from rich.text import Text
+from rich.tree import Tree
+
+from ovs_dbg.ofparse.console import (
+    ConsoleFormatter,
+    file_header,
+    print_context,
+)
+from ovs_dbg.ofparse.process import FlowProcessor
+
+
+class FileStats:
+    """FileStats holds the statistics of the flows of a file
+
+    Args:
+        groups (list[tuple]): The keys to count flows by (see StatsProcessor)
+        counters (list[str]): The info keys of the packet and byte counters
+    """
+
+    def __init__(self, groups, counters):
+        self.flows = 0
+        self.zero_hit = 0
+        self.keys = {label: key for label, _, key, _ in groups}
+        self.formats = {label: fmt for label, _, _, fmt in groups}
+        self.groups = {label: collections.Counter() for label in self.formats}
+        self.actions = collections.Counter()
+        # Values are only stored to compute the percentiles
+        self.counters = {key: array.array("Q") for key in counters}
+
+    @staticmethod
+    def percentiles(values, percents=(50, 90, 99, 100)):
+        """Returns the nearest-rank percentiles of a list of values"""
+        if not values:
+            return {}
+        values = sorted(values)
+        return {
+            "p{}".format(percent): values[
+                max(math.ceil(percent / 100 * len(values)) - 1, 0)
+            ]
+            for percent in percents
+        }
+
+    def dict(self):
+        """Returns the statistics as a dictionary"""
+        return {
+            "flows": self.flows,
+            "zero_hit": self.zero_hit,
+            **{
+                self.keys[label]: {
+                    self.formats[label](value): count
+                    for value, count in counter.most_common()
+                }
+                for label, counter in self.groups.items()
+            },
+            "actions": dict(self.actions.most_common()),
+            "counters": {
+                key: self.percentiles(values)
+                for key, values in self.counters.items()
+            },
+        }
+
+
+class StatsProcessor(FlowProcessor):
+    """StatsProcessor computes statistics of the flows in a single pass
+
+    The flows are not stored, only the counts and the values of the packet
+    and byte counters (to compute their percentiles).
+
+    Args:
+        opts (dict): Options dictionary
+        factory (object): Factory object to use to build flows
+        groups (list[tuple]): The keys to count flows by. Each item is a
+            (label, section, key, fmt) tuple where fmt is the function that
+            formats the values of the key
+        counters (list[str]): The info keys of the packet and byte counters.
+            The first one is used to determine zero-hit flows
+    """
+
+    def __init__(self, opts, factory, groups, counters):
+        super().__init__(opts, factory)
+        self.groups = groups
+        self.counters = counters
+        self.stats = dict()
+
+    def required_keys(self):
+        # Only the keys of the actions are needed, not their values
+        keys = {key for _, _, key, _ in self.groups} | set(self.counters)
+        if self.opts.get("filter"):
+            keys.update(self.opts.get("filter").keys())
+        return keys
+
+    def start_file(self, name, filename):
+        self.file_stats = FileStats(self.groups, self.counters)
+
+    def stop_file(self, name, filename):
+        self.stats[name] = self.file_stats
+
+    def process_flow(self, flow, name):
+        stats = self.file_stats
+        stats.flows += 1
+        for label, section, key, _ in self.groups:
+            value = getattr(flow, section).get(key)
+            if value is not None:
+                stats.groups[label][value] += 1
+
+        stats.actions.update(kv.key for kv in flow.actions_kv)
+
+        info = flow.info
+        for key, values in stats.counters.items():
+            value = info.get(key)
+            if isinstance(value, int):
+                values.append(value)
+        if not info.get(self.counters[0]):
+            stats.zero_hit += 1
+
+    def json_string(self):
+        """Returns the statistics of each file in JSON format"""
+        return json.dumps(
+            {name: stats.dict() for name, stats in self.stats.items()},
+            indent=4,
+        )
+
+    @staticmethod
+    def _counts(counter, limit, fmt):
+        """Format the most common values of a counter"""
+        text = ", ".join(
+            "{}: {}".format(fmt(value), count)
+            for value, count in counter.most_common(limit or None)
+        )
+        if limit and len(counter) > limit:
+            text += ", ..."
+        return text
+
+    def print(self, limit):
+        """Print the statistics
+
+        Args:
+            limit (int): The maximum number of values to print for each key
+                (only the most common ones are printed)
+        """
+        console = ConsoleFormatter(opts=self.opts).console
+        with print_context(console, self.opts):
+            for name, stats in self.stats.items():
+                console.print("\n")
+                console.print(file_header(name))
+                tree = Tree("Flow statistics")
+                tree.add(
+                    Text.assemble(
+                        ("Flows: ", "bold"),
+                        "{} (zero-hit: {})".format(
+                            stats.flows, stats.zero_hit
+                        ),
+                    )
+                )
+                for key, values in stats.counters.items():
+                    tree.add(
+                        Text.assemble(
+                            ("{}: ".format(key), "bold"),
+                            ", ".join(
+                                "{}={}".format(percent, value)
+                                for percent, value in stats.percentiles(
+                                    values
+                                ).items()
+                            ),
+                        )
+                    )
+                for label, counter in stats.groups.items():
+                    tree.add(
+                        Text.assemble(
+                            ("{} ({}): ".format(label, len(counter)), "bold"),
+                            self._counts(counter, limit, stats.formats[label]),
+                        )
+                    )
+                tree.add(
+                    Text.assemble(
+                        ("Actions ({}): ".format(len(stats.actions)), "bold"),
+                        self._counts(stats.actions, limit, str),
+                    )
+                )
+                console.print(tree)
@@ -0,0 +1,120 @@
+""" Defines the detection of OpenFlow flows that can never be hit
+
+A flow is shadowed if a higher priority flow of the same table matches every
+packet it matches (i.e: the other flow's match covers its match) and it is a
+duplicate if another flow of the same table has the same priority and the
+same match.
+
+The detection reuses the subtables of the Classifier: a flow B is covered by
+the flows of a subtable A if every field A matches on is also matched by B
+with a mask that includes A's mask. In that case the only flows of A that
+can cover B are the ones whose values equal B's values masked with A's masks,
+so they are found with a single hash lookup. The cost is therefore
+proportional to the number of flows times the number of compatible
+subtables instead of to the square of the number of flows.
+
+Flows that are only covered by the union of several flows are not detected.
+"""
+
+from ovs_dbg.classifier import Classifier, project, projection
+
+
+class ShadowedFlow:
+    """ShadowedFlow is a flow that can never be hit
+
+    Attributes:
+        table (int): the table of the flow
+        flow (OFPFlow): the flow that can never be hit
+        by (OFPFlow): the flow that covers it
+        duplicate (bool): whether both flows have the same match and
+            priority
+    """
+
+    def __init__(self, table, flow, by, duplicate):
+        self.table = table
+        self.flow = flow
+        self.by = by
+        self.duplicate = duplicate
+
+    def dict(self):
+        """Returns the shadowed flow as a dictionary"""
+        return {
+            "table": self.table,
+            "flow": self.flow.orig,
+            "by": self.by.orig,
+            "duplicate": self.duplicate,
+        }
+
+
+def _is_soft(flow):
+    """Returns whether a flow has conjunction actions (conjunctive flows only
+    match in combination with others, so they do not shadow flows)"""
+    return any(kv.key == "conjunction" for kv in flow.actions_kv)
+
+
+def shadowed_flows(classifier):
+    """Finds the flows of a classifier that can never be hit
+
+    Args:
+        classifier (Classifier): the classifier holding the flows (their
+            actions must be decoded to identify conjunctive flows)
+
+    Returns:
+        A list of ShadowedFlow sorted by table
+    """
+    result = list()
+    for table_id in sorted(classifier.tables):
+        subtables = classifier.tables[table_id].sorted_subtables()
+        for inner in subtables:
+            candidates = list()
+            for outer in subtables:
+                proj = projection(outer.signature, inner.signature)
+                if proj is not None:
+                    candidates.append((outer, proj))
+
+            for key, rules in inner.rules.items():
+                for priority, flow in rules:
+                    found = _find_cover(key, priority, flow, rules, candidates)
+                    if found is not None:
+                        by, duplicate = found
+                        result.append(
+                            ShadowedFlow(table_id, flow, by, duplicate)
+                        )
+    return result
+
+
+def _find_cover(key, priority, flow, rules, candidates):
+    """Returns the (flow, duplicate) that covers a flow or None"""
+    # Duplicates: same subtable, key and priority, added earlier
+    for other_priority, other in rules:
+        if other is flow:
+            break
+        if other_priority == priority:
+            return other, True
+
+    best = None
+    for outer, proj in candidates:
+        if outer.max_priority <= priority:
+            continue
+        if best is not None and best[0] >= outer.max_priority:
+            continue
+        for other_priority, other in outer.rules.get(project(key, proj)) or []:
+            if other_priority <= priority:
+                break
+            if not _is_soft(other):
+                if best is None or other_priority > best[0]:
+                    best = (other_priority, other)
+                break
+    return (best[1], False) if best is not None else None
+
+
+def find_shadowed(flows):
+    """Finds the flows that can never be hit
+
+    Args:
+        flows (iterable[OFPFlow]): the flows
+
+    Returns:
+        A list of ShadowedFlow sorted by table
+    """
+    return shadowed_flows(Classifier(flows))
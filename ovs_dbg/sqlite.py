@@ -0,0 +1,223 @@
+""" Defines a SQLite export of parsed flows
+
+Flows are stored in the following tables:
+
+    files:  one row for each exported input file
+            (id, name, filename, flow_type)
+    flows:  one row for each flow with the most commonly queried values
+            (id, file_id, idx, orig, table_id, priority, cookie, recirc_id,
+            ufid, n_packets, n_bytes). Values that do not apply to the flow
+            type (or are not present in the flow) are NULL. Integers that do
+            not fit in a SQLite INTEGER (e.g: cookies above 2^63-1) are
+            stored as hexadecimal TEXT (e.g: '0xffffffffffffffff')
+    kvs:    one row for each top-level key-value of each flow section
+            (flow_id, section, pos, key, value, int_value). value holds the
+            JSON representation of the value (so SQLite's JSON functions can
+            be used to query it) and int_value its integer value if it has
+            one (e.g: ints or the value of masked integers)
+
+Exporting into an existing database appends the new files and flows so
+several snapshots can be queried (and joined) together.
+"""
+
+import json
+import sqlite3
+
+from ovs_dbg.decoders import IntMask, encode_json
+from ovs_dbg.odp import ODPFlow
+from ovs_dbg.ofp import OFPFlow
+
+_flow_types = {OFPFlow: "openflow", ODPFlow: "datapath"}
+
+# Flow columns and the keys they are extracted from
+_flow_columns = {
+    "table_id": ("table",),
+    "priority": ("priority",),
+    "cookie": ("cookie",),
+    "recirc_id": ("recirc_id",),
+    "ufid": ("ufid",),
+    "n_packets": ("n_packets", "packets"),
+    "n_bytes": ("n_bytes", "bytes"),
+}
+_column_keys = {
+    key: column for column, keys in _flow_columns.items() for key in keys
+}
+
+_schema = [
+    """CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        filename TEXT,
+        flow_type TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS flows (
+        id INTEGER PRIMARY KEY,
+        file_id INTEGER REFERENCES files(id),
+        idx INTEGER,
+        orig TEXT,
+        table_id INTEGER,
+        priority INTEGER,
+        cookie INTEGER,
+        recirc_id INTEGER,
+        ufid TEXT,
+        n_packets INTEGER,
+        n_bytes INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS kvs (
+        flow_id INTEGER REFERENCES flows(id),
+        section TEXT,
+        pos INTEGER,
+        key TEXT,
+        value TEXT,
+        int_value INTEGER
+    )""",
+]
+
+# Indexes are created after the flows are loaded, which is faster than
+# updating them on each insertion
+_indexes = [
+    "CREATE INDEX IF NOT EXISTS flows_file ON flows(file_id)",
+    "CREATE INDEX IF NOT EXISTS flows_table ON flows(table_id)",
+    "CREATE INDEX IF NOT EXISTS flows_priority ON flows(priority)",
+    "CREATE INDEX IF NOT EXISTS flows_cookie ON flows(cookie)",
+    "CREATE INDEX IF NOT EXISTS flows_recirc_id ON flows(recirc_id)",
+    "CREATE INDEX IF NOT EXISTS flows_ufid ON flows(ufid)",
+    "CREATE INDEX IF NOT EXISTS kvs_flow ON kvs(flow_id)",
+    "CREATE INDEX IF NOT EXISTS kvs_key ON kvs(key, int_value)",
+]
+
+# Range of SQLite INTEGERs
+_int_min = -(1 << 63)
+_int_max = (1 << 63) - 1
+
+
+def _int_value(value):
+    """Returns the integer value of a decoded value (or None if it does not
+    have one or it does not fit in a SQLite INTEGER)"""
+    if isinstance(value, IntMask):
+        value = value.value
+    elif value.__class__ is not int:
+        return None
+    return value if _int_min <= value <= _int_max else None
+
+
+def _column_value(value, int_value):
+    """Returns the value of an integer flow column (see _int_value): its
+    integer value or, if it does not fit in a SQLite INTEGER, its
+    hexadecimal string"""
+    if int_value is None:
+        if isinstance(value, IntMask):
+            value = value.value
+        if value.__class__ is int:
+            return hex(value)
+    return int_value
+
+
+class SQLiteWriter:
+    """SQLiteWriter writes flows into a SQLite database
+
+    Flows are inserted in batches, each of them in its own transaction.
+
+    Args:
+        filename (str): the database filename. If it exists, flows are
+            appended to it
+        batch_size (int): Optional; number of flows inserted in each
+            transaction
+    """
+
+    def __init__(self, filename, batch_size=10000):
+        self._conn = sqlite3.connect(filename)
+        self._conn.execute("PRAGMA synchronous = OFF")
+        for statement in _schema:
+            self._conn.execute(statement)
+        self._batch_size = batch_size
+        self._flows = list()
+        self._kvs = list()
+        self._file_id = None
+        (self._flow_id,) = self._conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM flows"
+        ).fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start_file(self, name, filename, flow_class):
+        """Start a new input file. Flows added afterwards belong to it
+
+        Args:
+            name (str): the file alias
+            filename (str): the file name
+            flow_class (type): the class of the flows (OFPFlow or ODPFlow)
+        """
+        self._file_id = self._conn.execute(
+            "INSERT INTO files (name, filename, flow_type) VALUES (?, ?, ?)",
+            (name, filename, _flow_types.get(flow_class)),
+        ).lastrowid
+
+    def add(self, flow):
+        """Add a flow
+
+        Args:
+            flow (Flow): the flow to add
+        """
+        if self._file_id is None:
+            self.start_file(None, None, flow.__class__)
+
+        self._flow_id += 1
+        columns = dict.fromkeys(_flow_columns)
+        for section in flow.sections:
+            for pos, kv in enumerate(section.data):
+                int_value = _int_value(kv.value)
+                self._kvs.append(
+                    (
+                        self._flow_id,
+                        section.name,
+                        pos,
+                        kv.key,
+                        json.dumps(encode_json(kv.value)),
+                        int_value,
+                    )
+                )
+                column = _column_keys.get(kv.key)
+                if column and columns[column] is None:
+                    columns[column] = (
+                        _column_value(kv.value, int_value)
+                        if column != "ufid"
+                        else str(kv.value)
+                    )
+
+        self._flows.append(
+            (self._flow_id, self._file_id, flow.id, flow.orig)
+            + tuple(columns.values())
+        )
+        if len(self._flows) >= self._batch_size:
+            self._flush()
+
+    def close(self):
+        """Insert the pending flows, create the indexes and close the
+        database"""
+        self._flush()
+        for statement in _indexes:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._conn.close()
+
+    def _flush(self):
+        """Insert the pending flows in a single transaction"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO flows (id, file_id, idx, orig, {}) "
+                "VALUES (?, ?, ?, ?, {})".format(
+                    ", ".join(_flow_columns),
+                    ", ".join("?" * len(_flow_columns)),
+                ),
+                self._flows,
+            )
+            self._conn.executemany(
+                "INSERT INTO kvs VALUES (?, ?, ?, ?, ?, ?)", self._kvs
+            )
+        self._flows = list()
+        self._kvs = list()
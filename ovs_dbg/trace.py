@@ -0,0 +1,531 @@
+""" Defines an offline OpenFlow pipeline tracer
+
+The Tracer walks the OpenFlow pipeline (similar to ovs-vswitchd's
+ofproto/trace) over a Classifier built from parsed flows: it looks up the
+packet in a table, executes the actions of the matching flow, follows
+resubmit, goto_table, clone and ct(table=...) actions and records the
+flows that were matched and the ports the packet was output to.
+
+Only the packet fields are modeled: connection tracking state is provided by
+the user (see Tracer's ct_next) and actions that depend on the datapath
+(e.g: group, bundle, learn, multipath) are reported but not executed.
+"""
+
+import copy
+import itertools
+
+from ovs_dbg.classifier import Classifier, ClassifierError, match_value
+from ovs_dbg.fields import field_decoders
+from ovs_dbg.kv import KVParser
+from ovs_dbg.masks import ofp_aliases, ofp_match_kv, ofp_shorthands
+from ovs_dbg.ofp import OFPFlowFactory
+
+# Same limits as ovs-vswitchd
+MAX_DEPTH = 64
+MAX_RESUBMITS = 4096
+
+# NXM and OXM field names (without prefix) that differ from the canonical
+# field name
+_nxm_fields = {
+    "ip_tos": "nw_tos",
+    "ip_ttl": "nw_ttl",
+    "ipv4_src": "ip_src",
+    "ipv4_dst": "ip_dst",
+    "tun_ipv4_src": "tun_src",
+    "tun_ipv4_dst": "tun_dst",
+    "ip_frag": "ip_frag",
+    "icmpv4_type": "icmp_type",
+    "icmpv4_code": "icmp_code",
+    "nd_sll": "nd_sll",
+    "nd_tll": "nd_tll",
+}
+
+_nxm_prefixes = ("nxm_of_", "nxm_nx_", "oxm_of_")
+
+
+class TraceError(RuntimeError):
+    """Error raised when a packet cannot be traced"""
+
+
+def field_name(name):
+    """Returns the canonical name of a field given its name in an action
+    (e.g: NXM_NX_REG10 or OXM_OF_IPV4_SRC)"""
+    name = name.lower()
+    for prefix in _nxm_prefixes:
+        if name.startswith(prefix):
+            name = name[len(prefix) :]
+            name = _nxm_fields.get(name, name)
+            break
+    return ofp_aliases.get(name, name)
+
+
+def parse_packet(string):
+    """Parses a packet in the same format as a flow match (e.g:
+    "in_port=3,tcp,nw_dst=10.0.0.1,tp_dst=80")
+
+    Args:
+        string (str): the packet string
+
+    Returns:
+        A dict of the packet field values that can be passed to
+        Tracer.trace
+
+    Raises:
+        ParseError if the packet cannot be parsed
+        TraceError if the packet contains unknown fields
+    """
+    parser = KVParser(OFPFlowFactory().match_decoders)
+    parser.parse(string)
+    for kv in parser.kv():
+        if kv.key not in field_decoders and kv.key not in ofp_shorthands:
+            raise TraceError("Unknown field {}".format(kv.key))
+    return Classifier.packet(
+        {kv.key: kv.value for kv in ofp_match_kv(parser.kv())}
+    )
+
+
+def _wide_register(field):
+    """Returns the registers that make up an xreg or xxreg field (most
+    significant first) or None if the field is not one of them"""
+    for prefix, width in (("xxreg", 4), ("xreg", 2)):
+        if field.startswith(prefix) and field[len(prefix) :].isdigit():
+            index = int(field[len(prefix) :]) * width
+            return ["reg{}".format(index + i) for i in range(width)]
+    return None
+
+
+class TraceStep:
+    """TraceStep is a table lookup performed during a trace
+
+    Attributes:
+        table (int): the table
+        flow (OFPFlow): the flow that matched or None if none did (in which
+            case the packet is dropped)
+        depth (int): the nesting level (e.g: resubmits increase it)
+        reason (str): the action that caused the lookup (None for the
+            initial lookup)
+    """
+
+    def __init__(self, table, flow, depth, reason):
+        self.table = table
+        self.flow = flow
+        self.depth = depth
+        self.reason = reason
+
+    def dict(self):
+        """Returns the step as a dictionary"""
+        return {
+            "table": self.table,
+            "depth": self.depth,
+            "reason": self.reason,
+            "flow": self.flow.orig if self.flow else None,
+        }
+
+
+class Trace:
+    """Trace is the result of tracing a packet
+
+    Attributes:
+        packet (dict): the initial packet fields
+        final (dict): the packet fields at the end of the trace
+        steps (list[TraceStep]): the table lookups in order
+        outputs (list): the ports the packet was output to
+        notes (list[str]): actions that were not executed and other remarks
+    """
+
+    def __init__(self, packet):
+        self.packet = packet
+        self.final = None
+        self.steps = list()
+        self.outputs = list()
+        self.notes = list()
+
+    @property
+    def dropped(self):
+        """Whether the packet was not output to any port"""
+        return not self.outputs
+
+    def changes(self):
+        """Returns the fields that were modified by the pipeline"""
+        return {
+            field: value
+            for field, value in (self.final or {}).items()
+            if self.packet.get(field, 0) != value
+        }
+
+    def dict(self):
+        """Returns the trace as a dictionary"""
+        return {
+            "packet": self.packet,
+            "steps": [step.dict() for step in self.steps],
+            "outputs": self.outputs,
+            "changes": self.changes(),
+            "notes": self.notes,
+        }
+
+
+class Tracer:
+    """Tracer walks the OpenFlow pipeline for a packet
+
+    Args:
+        classifier (Classifier): the classifier holding the flows
+        ct_next (list[str]): Optional; the ct_state of the packet after each
+            ct(table=...) action, in order (e.g: ["trk|new", "trk|est"]).
+            Default: "trk|new"
+    """
+
+    def __init__(self, classifier, ct_next=None):
+        self.classifier = classifier
+        self.ct_next = ct_next or list()
+        # xreg and xxreg fields are derived from the registers before each
+        # lookup so only compute the ones the flows match on
+        self._wide_fields = {
+            field
+            for table in classifier.tables.values()
+            for signature in table.subtables
+            for field, _ in signature
+            if _wide_register(field)
+        }
+
+    def trace(self, packet, table=0):
+        """Trace a packet
+
+        Args:
+            packet (dict): the packet fields (see parse_packet)
+            table (int): Optional; the first table. Default: 0
+
+        Returns:
+            A Trace
+        """
+        result = Trace(dict(packet))
+        packet = dict(packet)
+        # Wide registers are stored as the registers they are made of
+        for field in list(packet):
+            if _wide_register(field):
+                _set(packet, field, packet.pop(field))
+
+        state = _TraceState(self, result)
+        state.run(packet, table, 0, None)
+        result.final = packet
+        while state.continuations:
+            packet, table = state.continuations.pop(0)
+            state.run(packet, table, 0, "ct")
+            result.final = packet
+        return result
+
+    def lookup(self, packet, table, notes=None):
+        """Returns the flow that matches the packet in a table taking
+        conjunctive matches into account or None
+
+        Args:
+            packet (dict): the packet fields
+            table (int): the table
+            notes (list): Optional; list to append remarks about the lookup
+                to
+        """
+        if self._wide_fields:
+            packet = dict(packet)
+            for field in self._wide_fields:
+                packet[field] = _get(packet, field)
+        flow = self.classifier.lookup(packet, table, converted=True)
+        if flow is None or not _conjunctions(flow):
+            return flow
+
+        # Conjunctive match: a conjunction id is matched when flows that
+        # match the packet at the same priority cover its n dimensions. The
+        # packet is then looked up again with that conj_id, ignoring the
+        # flows with conjunction actions
+        for _, matches in itertools.groupby(
+            self.classifier.matches(packet, table, converted=True),
+            key=lambda match: match[0],
+        ):
+            found = None
+            dimensions = dict()
+            for _, match in matches:
+                conjunctions = _conjunctions(match)
+                if not conjunctions:
+                    found = found or match
+                    continue
+                for conj in conjunctions:
+                    dims = dimensions.setdefault(conj["id"], set())
+                    dims.add(conj["k"])
+                    if len(dims) == conj["n"]:
+                        conj_flow = self._hard_lookup(
+                            {**packet, "conj_id": conj["id"]}, table
+                        )
+                        if conj_flow is not None:
+                            return conj_flow
+            if found is not None:
+                return found
+        if notes is not None:
+            notes.append(
+                "Flows with conjunction actions matched in table {} but no "
+                "conjunctive match was completed".format(table)
+            )
+        return None
+
+    def _hard_lookup(self, packet, table):
+        """Returns the highest priority flow without conjunction actions that
+        matches the packet or None"""
+        for _, flow in self.classifier.matches(packet, table, converted=True):
+            if not _conjunctions(flow):
+                return flow
+        return None
+
+
+def _conjunctions(flow):
+    """Returns the conjunction actions of a flow"""
+    return [kv.value for kv in flow.actions_kv if kv.key == "conjunction"]
+
+
+def _get(packet, field, start=None, end=None):
+    """Returns the value of a (range of a) field"""
+    registers = _wide_register(field)
+    if registers:
+        value = 0
+        for reg in registers:
+            value = (value << 32) | packet.get(reg, 0)
+    else:
+        value = packet.get(field, 0)
+    if start is None:
+        return value
+    if not isinstance(value, int):
+        raise TraceError("Cannot read bits of {}={}".format(field, value))
+    return (value >> start) & ((1 << (end - start + 1)) - 1)
+
+
+def _set(packet, field, value, start=None, end=None, mask=None):
+    """Set the value of a (range of a) field"""
+    if start is not None:
+        mask = ((1 << (end - start + 1)) - 1) << start
+        value = value << start
+    if mask is not None:
+        old = _get(packet, field)
+        if not isinstance(old, int):
+            old = 0
+        value = (old & ~mask) | (value & mask)
+
+    registers = _wide_register(field)
+    if registers:
+        for reg in reversed(registers):
+            packet[reg] = value & 0xFFFFFFFF
+            value >>= 32
+    else:
+        packet[field] = value
+
+
+def _action_kvs(actions):
+    """Yields the (key, value) tuples of a list of actions (either KeyValues
+    or the dictionaries of nested actions such as clone)"""
+    for action in actions:
+        if isinstance(action, dict):
+            yield from action.items()
+        else:
+            yield action.key, action.value
+
+
+class _TraceState:
+    """_TraceState holds the state of an ongoing trace"""
+
+    def __init__(self, tracer, trace):
+        self.tracer = tracer
+        self.trace = trace
+        self.resubmits = 0
+        self.exit = False
+        self.stack = list()
+        self.ct_next = list(tracer.ct_next)
+        self.continuations = list()
+
+    def run(self, packet, table, depth, reason):
+        """Look up the packet in a table and execute the matching flow's
+        actions"""
+        if self.exit:
+            return
+        if depth > MAX_DEPTH or self.resubmits >= MAX_RESUBMITS:
+            self.trace.notes.append(
+                "Maximum resubmit depth or count exceeded in table {}".format(
+                    table
+                )
+            )
+            self.exit = True
+            return
+        self.resubmits += 1
+
+        flow = self.tracer.lookup(packet, table, self.trace.notes)
+        self.trace.steps.append(TraceStep(table, flow, depth, reason))
+        if flow is not None:
+            self.execute(flow.actions_kv, packet, table, depth)
+
+    def execute(self, actions, packet, table, depth):
+        """Execute a list of actions"""
+        goto = None
+        for key, value in _action_kvs(actions):
+            if self.exit:
+                return
+            handler = getattr(self, "_do_" + key, None)
+            if handler is None:
+                self.trace.notes.append(
+                    "Action {} not executed in table {}".format(key, table)
+                )
+                continue
+            try:
+                result = handler(value, packet, table, depth)
+            except (ClassifierError, TraceError, KeyError, TypeError) as e:
+                self.trace.notes.append(
+                    "Failed to execute action {} in table {}: {}".format(
+                        key, table, e
+                    )
+                )
+                continue
+            if key == "goto_table":
+                goto = result
+        if goto is not None:
+            self.run(packet, goto, depth, "goto_table")
+
+    def _port(self, port, packet):
+        """Resolve an output port"""
+        if port == "in_port":
+            return packet.get("in_port", 0)
+        if isinstance(port, str) and port.endswith("]"):
+            field = _field_spec(port)
+            return _get(packet, **field)
+        return port
+
+    def _do_output(self, value, packet, table, depth):
+        self.trace.outputs.append(self._port(value.get("port"), packet))
+
+    def _do_controller(self, value, packet, table, depth):
+        self.trace.outputs.append("controller")
+
+    def _do_drop(self, value, packet, table, depth):
+        pass
+
+    def _do_conjunction(self, value, packet, table, depth):
+        pass
+
+    def _do_note(self, value, packet, table, depth):
+        pass
+
+    def _do_exit(self, value, packet, table, depth):
+        self.exit = True
+
+    def _do_resubmit(self, value, packet, table, depth):
+        port = value.get("port")
+        new_table = value.get("table", table)
+        if port in ("", None, "in_port"):
+            self.run(packet, new_table, depth + 1, "resubmit")
+            return
+        saved = packet.get("in_port")
+        packet["in_port"] = self._port(port, packet)
+        self.run(packet, new_table, depth + 1, "resubmit")
+        if saved is None:
+            packet.pop("in_port", None)
+        else:
+            packet["in_port"] = saved
+
+    def _do_goto_table(self, value, packet, table, depth):
+        return int(value)
+
+    def _do_clone(self, value, packet, table, depth):
+        self.execute(value, copy.copy(packet), table, depth + 1)
+
+    def _do_load(self, value, packet, table, depth):
+        if "value" not in value:
+            raise TraceError("load from a field is not supported")
+        dst = _field_spec(value["dst"])
+        _set(packet, value=value["value"], **dst)
+
+    def _do_set_field(self, value, packet, table, depth):
+        ((field, val),) = value["value"].items()
+        field = field_name(field)
+        val, mask = match_value(field, val)
+        _set(packet, field, val, mask=mask)
+
+    def _do_move(self, value, packet, table, depth):
+        src = _field_spec(value["src"])
+        _set(packet, value=_get(packet, **src), **_field_spec(value["dst"]))
+
+    def _do_write_metadata(self, value, packet, table, depth):
+        val, mask = match_value("metadata", str(value))
+        _set(packet, "metadata", val, mask=mask)
+
+    def _do_set_tunnel(self, value, packet, table, depth):
+        packet["tun_id"] = value
+
+    _do_set_tunnel64 = _do_set_tunnel
+
+    def _do_dec_ttl(self, value, packet, table, depth):
+        ttl = packet.get("nw_ttl")
+        if isinstance(ttl, int):
+            if ttl <= 1:
+                self.trace.notes.append(
+                    "TTL expired in table {}".format(table)
+                )
+                self.exit = True
+                return
+            packet["nw_ttl"] = ttl - 1
+
+    def _do_push(self, value, packet, table, depth):
+        self.stack.append(_get(packet, **_field_spec(value)))
+
+    def _do_pop(self, value, packet, table, depth):
+        if not self.stack:
+            raise TraceError("pop from an empty stack")
+        _set(packet, value=self.stack.pop(), **_field_spec(value))
+
+    def _do_ct_clear(self, value, packet, table, depth):
+        for field in ("ct_state", "ct_zone", "ct_mark", "ct_label"):
+            packet.pop(field, None)
+
+    def _do_ct(self, value, packet, table, depth):
+        if value.get("table") is None:
+            return
+        cont = dict(packet)
+        ct_state = self.ct_next.pop(0) if self.ct_next else "trk|new"
+        cont["ct_state"] = Classifier.packet({"ct_state": ct_state})[
+            "ct_state"
+        ]
+        zone = value.get("zone")
+        if isinstance(zone, dict):
+            zone = _get(packet, **_field_spec(zone))
+        if zone is not None:
+            cont["ct_zone"] = zone
+        # Actions executed by ct (e.g: setting ct_mark) are visible after
+        # recirculation
+        self.execute(value.get("exec") or [], cont, table, depth + 1)
+        self.continuations.append((cont, value["table"]))
+
+    def _do_mod_dl_src(self, value, packet, table, depth):
+        packet["eth_src"] = int(value.eth)
+
+    def _do_mod_dl_dst(self, value, packet, table, depth):
+        packet["eth_dst"] = int(value.eth)
+
+    def _do_mod_nw_src(self, value, packet, table, depth):
+        packet["ip_src"] = int(value.ip)
+
+    def _do_mod_nw_dst(self, value, packet, table, depth):
+        packet["ip_dst"] = int(value.ip)
+
+    def _do_mod_tcp_src(self, value, packet, table, depth):
+        packet["tp_src"] = value
+
+    def _do_mod_tcp_dst(self, value, packet, table, depth):
+        packet["tp_dst"] = value
+
+
+def _field_spec(value):
+    """Returns the field, start and end of a field specification (either
+    decoded or a string such as NXM_NX_REG0[0..15])"""
+    if isinstance(value, str):
+        name, _, bits = value.rstrip("]").partition("[")
+        start, _, end = bits.partition("..")
+        value = {"field": name}
+        if start:
+            value["start"] = int(start)
+            value["end"] = int(end or start)
+    return {
+        "field": field_name(value["field"]),
+        "start": value.get("start"),
+        "end": value.get("end"),
+    }
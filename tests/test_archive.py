@@ -0,0 +1,66 @@
+import pytest
+
+from ovs_dbg.archive import Archive, ArchiveError, ArchiveWriter, is_archive
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.odp import ODPFlowFactory
+
+
+@pytest.mark.parametrize(
+    "factory,flow_strings",
+    [
+        (
+            OFPFlowFactory(),
+            [
+                "cookie=0x1, duration=1.5s, table=2, n_packets=3, n_bytes=4, priority=100,ip,reg14=0x3,metadata=0x5/0xff,nw_src=10.0.0.0/24,dl_dst=00:11:22:33:44:55 actions=load:0x1->NXM_NX_REG15[],ct(commit,zone=NXM_NX_REG13[0..15],nat(src=10.1.1.1:1000-2000)),resubmit(,10)",  # noqa: E501
+                "cookie=0x2, duration=0.1s, table=0, n_packets=0, n_bytes=0, idle_age=3, priority=0 actions=drop",  # noqa: E501
+            ],
+        ),
+        (
+            ODPFlowFactory(),
+            [
+                "ufid:1b9ed4b8-da1f-4c96-a1cf-0b2e4bbc3d38, recirc_id(0),in_port(2),eth(src=00:11:22:33:44:55,dst=01:00:00:00:00:00/01:00:00:00:00:00),eth_type(0x0800),ipv4(src=10.0.0.1,dst=10.0.0.0/255.255.255.0,proto=6,frag=no),tunnel(tun_id=0x5,dst=172.18.0.3,geneve({class=0x102,type=0x80,len=4,0x10002/0x7fffffff})), packets:3, bytes:180, used:0.5s, actions:ct(commit,zone=2,nat(dst=10.0.0.2:8080)),set(ipv4(ttl=63)),recirc(0x3)",  # noqa: E501
+                "recirc_id(0x3),in_port(2),eth_type(0x86dd),ipv6(src=fe80::1/ffff::), packets:0, bytes:0, used:never, actions:drop",  # noqa: E501
+            ],
+        ),
+    ],
+)
+def test_archive(tmp_path, factory, flow_strings):
+    flows = [
+        factory.from_string(string, idx)
+        for idx, string in enumerate(flow_strings)
+    ]
+    filename = tmp_path / "flows.bin"
+    with open(filename, "wb") as f:
+        with ArchiveWriter(f) as writer:
+            for flow in flows:
+                writer.add(flow)
+
+    assert is_archive(filename)
+    with Archive(filename) as archive:
+        assert archive.flow_class is factory.flow_class
+        assert len(archive) == len(flows)
+        assert archive.orig(1) == flows[1].orig
+        assert archive[-1].orig == flows[-1].orig
+        with pytest.raises(IndexError):
+            archive[len(flows)]
+
+        for flow, loaded in zip(flows, archive):
+            assert loaded.orig == flow.orig
+            assert loaded.id == flow.id
+            for section in flow.sections:
+                loaded_section = loaded.section(section.name)
+                assert loaded_section.pos == section.pos
+                assert loaded_section.string == section.string
+                assert len(loaded_section.data) == len(section.data)
+                for kv, loaded_kv in zip(section.data, loaded_section.data):
+                    assert kv.key == loaded_kv.key
+                    assert repr(kv.value) == repr(loaded_kv.value)
+                    assert vars(kv.meta) == vars(loaded_kv.meta)
+
+
+def test_archive_invalid(tmp_path):
+    filename = tmp_path / "flows.txt"
+    filename.write_text("priority=0 actions=drop\n")
+    assert not is_archive(filename)
+    with pytest.raises(ArchiveError):
+        Archive(filename)
@@ -0,0 +1,80 @@
+import pytest
+
+from ovs_dbg.attribution import Attributor, odp_match_key
+from ovs_dbg.classifier import Classifier
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofp import OFPFlowFactory
+
+of_flows = [
+    "table=0, priority=100,in_port=1 actions=resubmit(,1)",
+    "table=1, priority=200,tcp,nw_dst=10.96.0.0/16,tp_dst=80 actions=ct(table=2,zone=1)",  # noqa: E501
+    "table=1, priority=150,ip,reg0=0x1 actions=drop",
+    "table=1, priority=100,ip actions=resubmit(,2)",
+    "table=1, priority=300,udp actions=drop",
+    "table=2, priority=100,ct_state=+trk+new,tcp actions=output:2",
+    "table=2, priority=100,tcp,tp_src=22 actions=output:3",
+    "table=2, priority=90,tcp,nw_frag=not_later actions=conjunction(1,1/2)",
+    "table=2, priority=80,tcp actions=output:4",
+]
+
+
+@pytest.mark.parametrize(
+    "dp_flow,expected",
+    [
+        (
+            "ufid:1, recirc_id(0),in_port(1),ct_state(0x21/0x3f),eth(),eth_type(0x0800),ipv4(src=10.244.0.1,dst=10.96.0.0/255.255.0.0,proto=6,frag=no),tcp(src=1/0,dst=80), packets:0, bytes:0, used:never, actions:1",  # noqa: E501
+            [(0, 0, False), (1, 1, True), (2, 5, True)],
+        ),
+        (
+            # Wildcarded ct_state, tp_dst and nw_dst: the flows of table 1
+            # that match on them are not candidates
+            "ufid:2, recirc_id(0),in_port(1),eth(),eth_type(0x0800),ipv4(src=10.244.0.1,proto=6,frag=first),tcp(src=22), packets:0, bytes:0, used:never, actions:1",  # noqa: E501
+            [
+                (0, 0, False),
+                (1, 2, False),
+                (1, 3, True),
+                (2, 6, True),
+            ],
+        ),
+        (
+            "ufid:3, recirc_id(0),in_port(1),eth(),eth_type(0x0800),ipv4(proto=6,frag=no),tcp(src=23), packets:0, bytes:0, used:never, actions:1",  # noqa: E501
+            [
+                (0, 0, False),
+                (1, 2, False),
+                (1, 3, True),
+                (2, 7, False),
+                (2, 8, True),
+            ],
+        ),
+    ],
+)
+def test_attribute(dp_flow, expected):
+    factory = OFPFlowFactory()
+    attributor = Attributor(
+        Classifier(
+            factory.from_string(flow, id) for id, flow in enumerate(of_flows)
+        )
+    )
+    candidates = attributor.attribute(ODPFlowFactory().from_string(dp_flow))
+    assert [
+        (candidate.table, candidate.flow.id, candidate.certain)
+        for candidate in candidates
+    ] == expected
+
+
+def test_odp_match_key():
+    flow = ODPFlowFactory().from_string(
+        "recirc_id(0),skb_mark(0/0),ct_state(+trk-new),eth_type(0x86dd),ipv6(src=fe80::/ffff::,proto=17,frag=later),udp(src=0/0xff00,dst=53), packets:0, bytes:0, used:never, actions:drop"  # noqa: E501
+    )
+    assert odp_match_key(flow) == (
+        (
+            ("ct_state", 0x21),
+            ("eth_type", None),
+            ("ip_frag", 3),
+            ("ip_proto", None),
+            ("ipv6_src", 0xFFFF << 112),
+            ("tp_dst", None),
+            ("tp_src", 0xFF00),
+        ),
+        (0x20, 0x86DD, 3, 17, 0xFE80 << 112, 53, 0),
+    )
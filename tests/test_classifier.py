@@ -0,0 +1,128 @@
+import pytest
+
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.classifier import (
+    Classifier,
+    ClassifierError,
+    match_value,
+    packet_value,
+)
+from ovs_dbg.decoders import Mask32
+
+
+@pytest.fixture
+def classifier():
+    factory = OFPFlowFactory()
+    return Classifier(
+        factory.from_string(flow, id)
+        for id, flow in enumerate(
+            [
+                "table=0, priority=0 actions=drop",
+                "table=0, priority=100,ip,nw_dst=10.0.0.0/8 actions=resubmit(,1)",  # noqa: E501
+                "table=0, priority=200,tcp,nw_dst=10.0.0.1,tp_dst=80 actions=resubmit(,2)",  # noqa: E501
+                "table=0, priority=200,tcp,nw_dst=10.0.0.1,tp_dst=80 actions=drop",  # noqa: E501
+                "table=0, priority=150,ip,reg14=0x3/0xf actions=drop",
+                "table=1, priority=10,ct_state=+trk+est-new actions=output:1",
+                "table=1, priority=5,ct_state=+trk actions=output:2",
+                "table=1, priority=20,ip,ip_frag=later actions=drop",
+                "table=1, priority=1,in_port=LOCAL actions=output:3",
+            ]
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "packet,table,expected",
+    [
+        (
+            {
+                "eth_type": 0x0800,
+                "ip_proto": 6,
+                "ip_dst": "10.0.0.1",
+                "tp_dst": 80,
+            },
+            0,
+            2,
+        ),
+        (
+            {
+                "dl_type": "0x800",
+                "nw_proto": 6,
+                "nw_dst": "10.0.0.1",
+                "tcp_dst": 81,
+            },
+            0,
+            1,
+        ),
+        ({"eth_type": 0x0800, "ip_dst": "10.0.0.1", "reg14": 0x13}, 0, 4),
+        ({"eth_type": 0x0800, "ip_dst": "11.0.0.1"}, 0, 0),
+        ({"eth_type": 0x86DD}, 0, 0),
+        ({"ct_state": "trk|est"}, 1, 5),
+        ({"ct_state": "+trk+new"}, 1, 6),
+        ({"ct_state": 0x22, "eth_type": 0x0800, "ip_frag": "later"}, 1, 7),
+        ({"eth_type": 0x0800, "ip_frag": "first"}, 1, None),
+        ({"in_port": "LOCAL"}, 1, 8),
+        ({"in_port": 1}, 1, None),
+        ({}, 2, None),
+    ],
+)
+def test_lookup(classifier, packet, table, expected):
+    flow = classifier.lookup(packet, table)
+    assert (flow.id if flow else None) == expected
+
+
+def test_classifier(classifier):
+    assert len(classifier) == 9
+    assert {
+        table: flow.id
+        for table, flow in classifier.lookup_all(
+            {"eth_type": 0x0800, "ct_state": "trk"}
+        ).items()
+    } == {0: 0, 1: 6}
+    # One subtable per mask signature
+    assert len(classifier.tables[0].subtables) == 4
+
+
+def test_match_value():
+    assert match_value("reg0", Mask32("0x13/0xf")) == (0x3, 0xF)
+    assert match_value("ct_state", "-new+trk") == (0x20, 0x21)
+    assert match_value("ct_state", "0x21/0x3f") == (0x21, 0x3F)
+    assert match_value("in_port", "br-int") == ("br-int", None)
+    with pytest.raises(ClassifierError):
+        Classifier([OFPFlowFactory().from_string("tcp,ipv6 actions=drop")])
+
+
+def test_priority_ties():
+    factory = OFPFlowFactory()
+    flows = [
+        factory.from_string(flow, id)
+        for id, flow in enumerate(
+            [
+                "table=0, priority=10,reg0=0x1 actions=output:1",
+                "table=0, priority=10,ip actions=output:2",
+                "table=0, priority=10,reg0=0x1 actions=output:3",
+                "table=0, priority=5,reg0=0x2 actions=output:4",
+            ]
+        )
+    ]
+    packet = {"eth_type": 0x0800, "reg0": 1}
+    # Flows with the same priority are considered in the order they were
+    # added, even if they belong to different subtables
+    for order in ([0, 1, 2], [1, 0, 2], [2, 1, 0], [3, 1, 0, 2]):
+        classifier = Classifier(flows[i] for i in order)
+        expected = [i for i in order if i != 3]
+        assert classifier.lookup(packet).id == expected[0]
+        assert [
+            flow.id for _, flow in classifier.tables[0].matches(packet)
+        ] == expected
+
+
+def test_packet_value():
+    assert packet_value("ip_src", "10.0.0.1") == 0x0A000001
+    assert packet_value("ipv6_dst", "::1") == 1
+    assert packet_value("eth_src", "00:11:22:33:44:55") == 0x001122334455
+    assert packet_value("tp_dst", "0x50") == 80
+    # Only address fields are parsed as addresses
+    assert packet_value("tp_dst", "01") == 1
+    assert packet_value("in_port", "br-int") == "br-int"
+    assert packet_value("reg0", "0.0.0.1") == "0.0.0.1"
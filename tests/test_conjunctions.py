@@ -0,0 +1,84 @@
+import pytest
+
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.conjunctions import ConjunctionAdvisor
+
+
+def cross_flows(table, ports, sources, actions="output:1", priority=100):
+    return [
+        "table={}, priority={},tcp,nw_src={},tp_dst={} actions={}".format(
+            table, priority, source, port, actions
+        )
+        for source in sources
+        for port in ports
+    ]
+
+
+@pytest.mark.parametrize(
+    "flows,expected",
+    [
+        (
+            cross_flows(0, [80, 443, 22], ["10.0.0.1", "10.0.0.2"])
+            + cross_flows(0, [80, 443], ["10.0.0.3"]),
+            [],
+        ),
+        (
+            cross_flows(
+                0, [8080, 80, 443], ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+            )
+            # Different actions or priority: not in the group
+            + cross_flows(0, [22], ["10.0.0.1"], "output:2")
+            + cross_flows(0, [22], ["10.0.0.2"], priority=50)
+            # Already conjunctive
+            + cross_flows(0, [22, 23, 24], ["10.0.0.1"], "conjunction(1,1/2)")
+            # Duplicates are only counted once
+            + cross_flows(0, [80], ["10.0.0.1"]),
+            [
+                (
+                    0,
+                    100,
+                    ("ip_src", "tp_dst"),
+                    (
+                        ["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+                        ["80", "443", "8080"],
+                    ),
+                    {"eth_type": "0x800", "ip_proto": "0x6"},
+                    2,
+                )
+            ],
+        ),
+        # Incomplete cross products are not reported
+        (
+            cross_flows(1, [80, 443, 22, 23], ["10.0.0.1", "10.0.0.2"])
+            + cross_flows(1, [80, 443, 22], ["10.0.0.3"]),
+            [],
+        ),
+    ],
+)
+def test_cross_products(flows, expected):
+    factory = OFPFlowFactory()
+    advisor = ConjunctionAdvisor()
+    for flow in flows:
+        advisor.add(factory.from_string(flow))
+    assert advisor.flows == len(flows)
+    assert [
+        (
+            cross.table,
+            cross.priority,
+            cross.fields,
+            cross.dimensions,
+            cross.common,
+            cross.savings,
+        )
+        for cross in advisor.cross_products()
+    ] == expected
+
+
+def test_min_savings():
+    factory = OFPFlowFactory()
+    flows = cross_flows(0, [80, 443, 22], ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+    for min_savings, count in [(1, 1), (2, 1), (3, 0)]:
+        advisor = ConjunctionAdvisor(min_savings)
+        for flow in flows:
+            advisor.add(factory.from_string(flow))
+        assert len(advisor.cross_products()) == count
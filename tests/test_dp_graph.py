@@ -0,0 +1,184 @@
+import io
+import json
+from xml.dom import minidom
+
+import pytest
+
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofparse.dp_graph import DatapathGraph
+
+flow_strings = [
+    "recirc_id(0),in_port(1),eth_type(0x0800), packets:5, bytes:500, used:never, actions:ct(zone=1),recirc(0x1)",  # noqa: E501
+    "recirc_id(0),in_port(1),eth_type(0x0800), packets:3, bytes:300, used:never, actions:ct(zone=2,nat),recirc(0x1)",  # noqa: E501
+    "recirc_id(0),in_port(1),eth_type(0x0800), packets:2, bytes:200, used:never, actions:ct(zone=1),recirc(0x1)",  # noqa: E501
+    "recirc_id(0),in_port(1),eth_type(0x86dd), packets:1, bytes:100, used:never, actions:drop",  # noqa: E501
+    "recirc_id(0),in_port(1),eth_type(0x86dd), packets:0, bytes:0, used:never, actions:drop",  # noqa: E501
+    "recirc_id(0),in_port(1),eth(),eth_type(0x86dd), packets:4, bytes:400, used:never, actions:drop",  # noqa: E501
+    "recirc_id(0x1),in_port(1),eth_type(0x0800), packets:7, bytes:700, used:never, actions:2",  # noqa: E501
+]
+
+
+def build_graph(collapse=False, limit=None):
+    factory = ODPFlowFactory()
+    flows = dict()
+    for idx, string in enumerate(flow_strings):
+        flow = factory.from_string(string, idx)
+        flows.setdefault(flow.match.get("recirc_id"), list()).append(flow)
+    return DatapathGraph(flows, collapse, limit)
+
+
+def flow_nodes(graph):
+    """Returns the name, flows and packets of the flow nodes of a graph"""
+    return [
+        (name, attrs["flows"], attrs["packets"])
+        for kind, name, attrs in (
+            element for element in graph.elements() if element[0] == "node"
+        )
+        if attrs["kind"] in ("flow", "others")
+    ]
+
+
+def test_collapse():
+    graph = build_graph(collapse=True)
+    # Flows are only collapsed if their actions are the same
+    assert flow_nodes(graph) == [
+        ("Flow_0", 2, 7),
+        ("Flow_1", 1, 3),
+        ("Flow_3", 2, 1),
+        ("Flow_5", 1, 4),
+        ("Flow_6", 1, 7),
+    ]
+    labels = {
+        name: attrs["label"]
+        for _, name, attrs in (
+            element for element in graph.elements() if element[0] == "node"
+        )
+    }
+    assert labels["Flow_0"].startswith("Flows: 2 \npackets:7, bytes:700")
+    assert labels["Flow_1"].startswith("Line: 1 \n")
+    source = graph.source()
+    for name in ["Flow_0", "Flow_1", "Flow_3", "Flow_5", "Flow_6"]:
+        assert "\t{} [label=".format(name) in source
+    assert "Flow_2 [" not in source
+
+
+@pytest.mark.parametrize(
+    "collapse,expected",
+    [
+        (
+            False,
+            [
+                ("Flow_0", 1, 5),
+                ("Flow_5", 1, 4),
+                ("others_input_1", 4, 6),
+                ("Flow_6", 1, 7),
+            ],
+        ),
+        (
+            True,
+            [
+                ("Flow_0", 2, 7),
+                ("Flow_5", 1, 4),
+                ("others_input_1", 3, 4),
+                ("Flow_6", 1, 7),
+            ],
+        ),
+    ],
+)
+def test_limit(collapse, expected):
+    graph = build_graph(collapse, limit=2)
+    assert flow_nodes(graph) == expected
+    # The flows left out go to the union of their next hops
+    others = [
+        (element[2], element[3]["kind"])
+        for element in graph.elements()
+        if element[0] == "edge" and element[1] == "others_input_1"
+    ]
+    assert sorted(others) == [("drop", "drop"), ("recirc_0x1", "recirc")]
+    source = graph.source()
+    assert "others_cluster_inport_1 [label=" in source
+    assert [
+        line.strip()
+        for line in source.splitlines()
+        if line.strip().startswith("others_cluster_inport_1 ->")
+    ] == [
+        "others_cluster_inport_1 -> invis_cluster_recirc_0x1 "
+        "[lhead=cluster_recirc_0x1 weight=20]",
+        "others_cluster_inport_1 -> drop [weight=1]",
+    ]
+
+
+@pytest.mark.parametrize(
+    "collapse,limit", [(False, None), (True, None), (False, 2), (True, 2)]
+)
+def test_json(collapse, limit):
+    graph = build_graph(collapse, limit)
+    buf = io.StringIO()
+    graph.write(buf, "json")
+    data = json.loads(buf.getvalue())
+
+    elements = list(graph.elements())
+    nodes = [element for element in elements if element[0] == "node"]
+    edges = [element for element in elements if element[0] == "edge"]
+    assert [(node["name"], node["kind"]) for node in data["nodes"]] == [
+        (name, attrs["kind"]) for _, name, attrs in nodes
+    ]
+    assert [
+        (edge["tail"], edge["head"], edge["kind"]) for edge in data["edges"]
+    ] == [(tail, head, attrs["kind"]) for _, tail, head, attrs in edges]
+    # Every edge connects existing nodes
+    names = {node["name"] for node in data["nodes"]}
+    assert len(names) == len(data["nodes"])
+    assert all(
+        edge["tail"] in names and edge["head"] in names
+        for edge in data["edges"]
+    )
+    assert {node["kind"] for node in data["nodes"]} >= {
+        "input",
+        "recirc",
+        "flow",
+        "output",
+        "drop",
+    }
+
+
+@pytest.mark.parametrize(
+    "collapse,limit", [(False, None), (True, None), (False, 2), (True, 2)]
+)
+def test_graphml(collapse, limit):
+    graph = build_graph(collapse, limit)
+    buf = io.StringIO()
+    graph.write(buf, "graphml")
+    doc = minidom.parseString(buf.getvalue())
+
+    keys = {key.getAttribute("id") for key in doc.getElementsByTagName("key")}
+    nodes = doc.getElementsByTagName("node")
+    edges = doc.getElementsByTagName("edge")
+    elements = list(graph.elements())
+    assert [node.getAttribute("id") for node in nodes] == [
+        element[1] for element in elements if element[0] == "node"
+    ]
+    assert len(edges) == len(
+        [element for element in elements if element[0] == "edge"]
+    )
+    for data in doc.getElementsByTagName("data"):
+        assert data.getAttribute("key") in keys
+    # Data values are the attributes of the elements
+    label = next(
+        data.firstChild.data
+        for data in nodes[1].getElementsByTagName("data")
+        if data.getAttribute("key") == "node_label"
+    )
+    assert label.startswith("Flows: 2" if collapse else "Line: 0")
+
+
+@pytest.mark.parametrize("fmt", ["json", "graphml"])
+def test_empty(fmt):
+    buf = io.StringIO()
+    DatapathGraph({}).write(buf, fmt)
+    if fmt == "json":
+        assert json.loads(buf.getvalue()) == {"nodes": [], "edges": []}
+    else:
+        doc = minidom.parseString(buf.getvalue())
+        assert doc.getElementsByTagName("graph")
+        assert not doc.getElementsByTagName("node")
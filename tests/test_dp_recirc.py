@@ -0,0 +1,62 @@
+import pytest
+
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofparse.dp_recirc import RecircIndex, flow_edges
+
+
+def dp_flow(actions, recirc=0, idx=0):
+    return ODPFlowFactory().from_string(
+        "recirc_id({}),in_port(1),eth_type(0x0800), packets:1, bytes:60, "
+        "used:never, actions:{}".format(hex(recirc), actions),
+        idx,
+    )
+
+
+@pytest.mark.parametrize(
+    "actions,expected",
+    [
+        ("drop", [("drop", None)]),
+        ("3,output:4", [("output", 3), ("output", 4)]),
+        (
+            "userspace(pid=3,userdata(01)),recirc(0x1)",
+            [("userspace", None), ("recirc", 1)],
+        ),
+        ("ct(zone=1,nat),push_vlan(vid=10,pcp=0),set(ipv4(ttl=63))", []),
+        (
+            "clone(ct(zone=1),recirc(0x2)),"
+            "sample(sample=50.0%,actions(userspace(pid=1),recirc(0x3))),"
+            "check_pkt_len(size=200,gt(4),le(clone(drop))),2,recirc(0x2)",
+            [
+                ("recirc", 2),
+                ("userspace", None),
+                ("recirc", 3),
+                ("output", 4),
+                ("drop", None),
+                ("output", 2),
+                ("recirc", 2),
+            ],
+        ),
+        (
+            "check_pkt_len(size=200,gt(clone(clone(recirc(0x4)),3)),"
+            "le(recirc(0x5)))",
+            [("recirc", 4), ("output", 3), ("recirc", 5)],
+        ),
+    ],
+)
+def test_flow_edges(actions, expected):
+    assert flow_edges(dp_flow(actions)) == expected
+
+
+def test_recirc_index():
+    flows = [
+        dp_flow("clone(recirc(0x2)),recirc(0x1),recirc(0x2)", 0, 0),
+        dp_flow("recirc(0x2)", 1, 1),
+        dp_flow("2", 2, 2),
+    ]
+    index = RecircIndex({0: flows[:2]})
+    index.add(flows[2])
+    assert index.flows == {0: [flows[0]], 1: [flows[1]], 2: [flows[2]]}
+    assert index.recircs(flows[0]) == [2, 1]
+    assert index.recircs(flows[1]) == [2]
+    assert index.recircs(flows[2]) == []
+    assert index.edges(flows[2]) == [("output", 2)]
@@ -0,0 +1,243 @@
+import re
+
+import pytest
+
+from ovs_dbg.filter import OFFilter
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofparse.dp import HTMLTree
+from ovs_dbg.ofparse.dp_tree import FlowElem, FlowTree, SubtreeRef
+
+
+def build_tree(flows, tree=None):
+    """Build a FlowTree from (recirc_id, packets, actions) tuples"""
+    factory = ODPFlowFactory()
+    tree = tree or FlowTree()
+    for idx, (recirc, packets, actions) in enumerate(flows):
+        tree.add(
+            factory.from_string(
+                "recirc_id({}),in_port(1),eth_type(0x0800), packets:{}, "
+                "bytes:{}, used:never, actions:{}".format(
+                    hex(recirc), packets, packets * 100, actions
+                ),
+                idx,
+            )
+        )
+    tree.build()
+    return tree
+
+
+def elems(tree, recirc):
+    """Returns the elements of the flows of a recirc_id"""
+    return tree._groups[recirc]
+
+
+def traversal(tree, expand_shared=True):
+    """Returns the traversed elements as (item, parent flow id) tuples where
+    item is a flow id or a ("ref"|"loop", recirc_id) tuple"""
+    result = list()
+
+    def callback(elem, parent):
+        parent_id = parent.flow.id if isinstance(parent, FlowElem) else None
+        if isinstance(elem, SubtreeRef):
+            item = ("loop" if elem.loop else "ref", elem.recirc)
+        elif isinstance(elem, FlowElem):
+            item = elem.flow.id
+        else:
+            return
+        result.append((item, parent_id))
+
+    tree.traverse(callback, expand_shared)
+    return result
+
+
+def test_sibling_recircs():
+    # The flow of recirc_id 0x2 recirculates to 0x3, which is a sibling of
+    # 0x2 and not a loop
+    tree = build_tree(
+        [
+            (0, 10, "check_pkt_len(size=200,gt(recirc(0x3)),le(recirc(0x2)))"),
+            (2, 4, "recirc(0x3)"),
+            (3, 6, "output:2"),
+        ]
+    )
+    root = elems(tree, 0)[0]
+    assert root.recircs == [3, 2]
+    assert root.loops == []
+    assert elems(tree, 2)[0].recircs == [3]
+    assert elems(tree, 2)[0].loops == []
+    assert traversal(tree) == [(0, None), (2, 0), (1, 0), (2, 1)]
+    assert traversal(tree, expand_shared=False) == [
+        (0, None),
+        (2, 0),
+        (1, 0),
+        (("ref", 3), 1),
+    ]
+    # The packets of 0x3 are split between its parents by packets
+    assert elems(tree, 2)[0].subtree_packets == pytest.approx(4 + 6 * 4 / 14)
+    assert root.subtree_packets == pytest.approx(20)
+
+
+def test_loop():
+    tree = build_tree(
+        [
+            (0, 10, "recirc(0x1)"),
+            (1, 10, "recirc(0x2)"),
+            (2, 5, "recirc(0x1)"),
+            (2, 5, "clone(recirc(0x3)),output:1"),
+            (3, 5, "recirc(0x2)"),
+        ]
+    )
+    assert [elem.loops for elem in elems(tree, 2)] == [[1], []]
+    assert [elem.recircs for elem in elems(tree, 2)] == [[], [3]]
+    assert elems(tree, 3)[0].loops == [2]
+    assert traversal(tree) == [
+        (0, None),
+        (1, 0),
+        (2, 1),
+        (("loop", 1), 2),
+        (3, 1),
+        (4, 3),
+        (("loop", 2), 4),
+    ]
+
+
+def test_shared_subtree():
+    tree = build_tree(
+        [
+            (0, 1, "recirc(0x1)"),
+            (0, 3, "recirc(0x1)"),
+            (1, 2, "recirc(0x2)"),
+            (2, 8, "output:1"),
+        ]
+    )
+    # The elements of a recirc_id are shared by its parents
+    first, second = elems(tree, 0)
+    assert first.flow.id == 1
+    assert first.children is second.children
+    assert traversal(tree) == [
+        (1, None),
+        (2, 1),
+        (3, 2),
+        (0, None),
+        (2, 0),
+        (3, 2),
+    ]
+    assert traversal(tree, expand_shared=False) == [
+        (1, None),
+        (2, 1),
+        (3, 2),
+        (0, None),
+        (("ref", 1), 0),
+    ]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_html_shared(shared):
+    tree = build_tree(
+        [
+            (0, 1, "recirc(0x1)"),
+            (0, 3, "recirc(0x1)"),
+            (1, 2, "recirc(0x2)"),
+            (2, 8, "recirc(0x1)"),
+        ],
+        HTMLTree("test", {}),
+    )
+    html = tree.render(shared)
+    flows = re.findall(r'id="flow_(\d+)"', html)
+    items = re.findall(r'input id="(collapsible_test_\d+)"', html)
+    assert len(items) == len(set(items)) == len(flows)
+    assert html.count("recirculation loop") == (1 if shared else 2)
+    if shared:
+        # The shared subtree is rendered once and linked to
+        assert flows == ["1", "2", "3", "0"]
+        assert '<a href="#flow_2">recirc_id(0x1): see above</a>' in html
+    else:
+        assert flows == ["1", "2", "3", "0", "2", "3"]
+        assert "see above" not in html
+    for tag in ["div", "ul", "li"]:
+        assert html.count("<" + tag) == html.count("</" + tag + ">")
+
+
+def test_rollup():
+    tree = build_tree(
+        [
+            (0, 30, "recirc(0x1)"),
+            (0, 10, "recirc(0x1)"),
+            (0, 0, "recirc(0x2)"),
+            (0, 0, "recirc(0x2)"),
+            (0, 5, "drop"),
+            (1, 20, "recirc(0x2)"),
+            (2, 8, "output:1"),
+        ]
+    )
+    assert tree.total_packets == 30 + 10 + 5 + 20 + 8
+    assert tree.total_bytes == tree.total_packets * 100
+    first_level = elems(tree, 0)
+    assert sum(elem.subtree_packets for elem in first_level) == pytest.approx(
+        tree.total_packets
+    )
+    assert sum(elem.subtree_share for elem in first_level) == pytest.approx(1)
+    # 0x2 is shared by the flow of 0x1 (20 packets) and two flows without
+    # packets of recirc_id 0, so it all goes to 0x1, which is split 3:1
+    assert [elem.subtree_packets for elem in first_level] == pytest.approx(
+        [30 + 28 * 0.75, 10 + 28 * 0.25, 5, 0, 0]
+    )
+    assert [elem.subtree_bytes for elem in first_level] == pytest.approx(
+        [(30 + 28 * 0.75) * 100, (10 + 28 * 0.25) * 100, 500, 0, 0]
+    )
+
+
+def test_rollup_no_packets():
+    # Without packets in the parents, the subtree is split evenly
+    tree = build_tree(
+        [
+            (0, 0, "recirc(0x1)"),
+            (0, 0, "recirc(0x1)"),
+            (1, 4, "output:1"),
+        ]
+    )
+    assert [elem.subtree_packets for elem in elems(tree, 0)] == [2, 2]
+    assert [elem.subtree_share for elem in elems(tree, 0)] == [0.5, 0.5]
+    assert elems(tree, 1)[0].subtree_share == 1
+
+
+filter_flows = [
+    (0, 5, "recirc(0x1)"),
+    (0, 4, "ct(zone=1),recirc(0x1)"),
+    (0, 3, "recirc(0x2)"),
+    (0, 2, "output:1"),
+    (1, 6, "recirc(0x2)"),
+    (1, 1, "recirc(0x3)"),
+    (2, 7, "drop"),
+    (3, 2, "recirc(0x1)"),
+]
+
+
+@pytest.mark.parametrize(
+    "expr,expected",
+    [
+        # Flow 0 and 1 reach 0x2 through 0x1 and flow 2 directly
+        ("drop", [0, 1, 2]),
+        # 0x3 is only reached through 0x1 and loops back to it
+        ("recirc=0x3", [0, 1]),
+        ("recirc_id=0x3", [0, 1]),
+        ("ct.zone=1", [1]),
+        ("output", [3]),
+        ("packets>6", [0, 1, 2]),
+        ("packets>7", []),
+    ],
+)
+def test_filter(expr, expected):
+    filt = OFFilter(expr)
+    evaluated = list()
+
+    class CountingFilter:
+        def evaluate(self, flow):
+            evaluated.append(flow.id)
+            return filt.evaluate(flow)
+
+    tree = build_tree(filter_flows)
+    tree.filter(CountingFilter())
+    assert [elem.flow.id for elem in tree.root.children] == expected
+    # Each flow is evaluated at most once even if its subtree is shared
+    assert len(evaluated) == len(set(evaluated))
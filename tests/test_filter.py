@@ -223,3 +223,49 @@ def test_filter(expr, flow, expected, match):
         assert not result
 
     assert [kv.key for kv in result.kv] == match
+
+
+@pytest.mark.parametrize(
+    "expr,keys",
+    [
+        ("nw_src=192.168.1.1 && tcp_dst=80", {"nw_src", "tcp_dst"}),
+        (
+            "n_bytes>0 || !(drop && output.port=3)",
+            {"n_bytes", "drop", "output"},
+        ),
+        ("encap.ipv4.src~=10.76.23.240", {"encap"}),
+    ],
+)
+def test_filter_keys(expr, keys):
+    assert OFFilter(expr).keys() == keys
+
+
+@pytest.mark.parametrize(
+    "expr,line,expected",
+    [
+        (
+            "tcp && nw_dst~=10.1.0.0/16",
+            "udp,nw_dst=10.1.0.1 actions=drop",
+            False,
+        ),
+        (
+            "tcp && nw_dst~=10.1.0.0/16",
+            "tcp,nw_src=10.1.0.1 actions=drop",
+            False,
+        ),
+        (
+            "tcp && nw_dst~=10.1.0.0/16",
+            "tcp,nw_dst=10.2.0.1 actions=drop",
+            True,
+        ),
+        ("tcp || udp", "udp,nw_dst=10.1.0.1 actions=drop", True),
+        ("tcp || udp", "icmp,nw_dst=10.1.0.1 actions=drop", False),
+        ("(tcp && tp_dst=80) || udp", "tcp,tp_src=80 actions=drop", False),
+        ("!tcp", "udp actions=drop", True),
+        ("tcp || !udp", "icmp actions=drop", True),
+        ("output.port=2", "in_port(1) actions:2", True),
+        ("drop && ct.zone=4", "in_port(1) actions:ct(zone=4),drop", True),
+    ],
+)
+def test_filter_prefilter(expr, line, expected):
+    assert OFFilter(expr).prefilter(line) == expected
@@ -71,3 +71,17 @@ def test_kv_parser(input_data, expected):
         assert input_string[kpos : kpos + len(kstr)] == kstr
         if vpos != -1:
             assert input_string[vpos : vpos + len(vstr)] == vstr
+
+
+def test_kv_parser_decode():
+    tparser = KVParser()
+    tparser.parse("foo=1,bar")
+
+    assert tparser.decode("a=1,b(c=2),a=3,flag") == {
+        "a": 3,
+        "b": "c=2",
+        "flag": True,
+    }
+    assert tparser.decode("a=1,a=3", is_list=True) == [{"a": 1}, {"a": 3}]
+    # decode() does not modify the parsed key-values
+    assert tparser.keys() == ["foo", "bar"]
@@ -65,3 +65,19 @@ def test_kv_parser(input_data, expected):
         assert input_string[kpos : kpos + len(kstr)] == kstr
         if vpos != -1:
             assert input_string[vpos : vpos + len(vstr)] == vstr
+
+
+def test_list_parser_reuse():
+    tparser = ListParser(
+        ListDecoders([("id", int), ("k", int), ("n", int)]), [",", "/"]
+    )
+
+    tparser.parse("1,2/3")
+    tparser.parse("4,5/6")
+    assert [(kv.key, kv.value) for kv in tparser.kv()] == [
+        ("id", 4),
+        ("k", 5),
+        ("n", 6),
+    ]
+    assert tparser.decode("7,8/9") == {"id": 7, "k": 8, "n": 9}
+    assert len(tparser.kv()) == 3
@@ -0,0 +1,109 @@
+import pytest
+
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.decoders import EthMask, IPMask, Mask8, Mask32
+from ovs_dbg.masks import (
+    value_mask,
+    match_masks,
+    mask_signature,
+    format_signature,
+    ofp_match_kv,
+)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (Mask32("0x123"), None),
+        (Mask32("0x123/0xffffffff"), None),
+        (Mask32("0x123/0xfff"), 0xFFF),
+        (Mask8("0/0"), 0),
+        (IPMask("192.168.1.1"), None),
+        (IPMask("192.168.1.0/24"), 0xFFFFFF00),
+        (IPMask("fe80::/64"), ((1 << 64) - 1) << 64),
+        (EthMask("00:11:22:33:44:55"), None),
+        (EthMask("01:00:00:00:00:00/01:00:00:00:00:00"), 1 << 40),
+        ("0x21/0x3f", 0x3F),
+        ("est|trk", None),
+        (123, None),
+        ([1, 2], None),
+    ],
+)
+def test_value_mask(value, expected):
+    assert value_mask(value) == expected
+
+
+def test_odp_signature():
+    factory = ODPFlowFactory()
+    flows = [
+        factory.from_string(
+            "recirc_id(0),in_port({}),ct_state(0x21/0x3f),eth(src={},dst=00:00:00:00:00:02),eth_type(0x0800),ipv4(src={},dst=10.0.0.2/255.255.0.0,proto=6,tos=0/0,frag=no),skb_mark(0/0), packets:1, bytes:60, used:never, actions:drop".format(  # noqa: E501
+                port, mac, ip
+            )
+        )
+        for port, mac, ip in [
+            (1, "00:00:00:00:00:01", "10.0.0.1"),
+            (2, "00:00:00:00:00:03", "10.0.0.3"),
+        ]
+    ]
+    assert match_masks(flows[0].match_kv)[:4] == [
+        ("recirc_id", None),
+        ("in_port", None),
+        ("ct_state", 0x3F),
+        ("eth.src", None),
+    ]
+    signature = mask_signature(flows[0].match_kv)
+    assert signature == mask_signature(flows[1].match_kv)
+    assert format_signature(signature) == (
+        "ct_state/0x3f,eth.dst,eth.src,eth_type,in_port,"
+        "ipv4.dst/0xffff0000,ipv4.frag,ipv4.proto,ipv4.src,recirc_id"
+    )
+
+
+def test_odp_empty_keys():
+    flow = ODPFlowFactory().from_string(
+        "recirc_id(0),in_port(1),eth(),eth_type(0x0800),ipv4(frag=no),"
+        "tunnel(), packets:1, bytes:60, used:never, actions:drop"
+    )
+    # eth() and tunnel() are fully wildcarded
+    assert match_masks(flow.match_kv) == [
+        ("recirc_id", None),
+        ("in_port", None),
+        ("eth_type", None),
+        ("ipv4.frag", None),
+    ]
+
+
+def test_ofp_signature():
+    factory = OFPFlowFactory()
+    flow = factory.from_string(
+        "ip,reg14=0x3/0xff,nw_src=10.0.0.0/8 actions=drop"
+    )
+    assert mask_signature(ofp_match_kv(flow.match_kv)) == (
+        ("eth_type", None),
+        ("ip_src", 0xFF000000),
+        ("reg14", 0xFF),
+    )
+
+
+def test_ofp_match_kv():
+    factory = OFPFlowFactory()
+    flows = [
+        factory.from_string(
+            "priority=10,tcp,nw_src=10.0.0.1,tcp_dst=80 actions=drop"
+        ),
+        factory.from_string(
+            "priority=20,ip,ip_proto=6,ip_src=10.0.0.2,tp_dst=443 "
+            "actions=drop"
+        ),
+    ]
+    assert [(kv.key, kv.value) for kv in ofp_match_kv(flows[0].match_kv)] == [
+        ("eth_type", 0x0800),
+        ("ip_proto", 6),
+        ("ip_src", flows[0].match["nw_src"]),
+        ("tp_dst", flows[0].match["tcp_dst"]),
+    ]
+    assert mask_signature(ofp_match_kv(flows[0].match_kv)) == mask_signature(
+        ofp_match_kv(flows[1].match_kv)
+    )
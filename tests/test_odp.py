@@ -1,3 +1,5 @@
+import json
+
 import netaddr
 import pytest
 
@@ -525,3 +527,19 @@ def test_odp_actions(input_string, expected):
 
         # assert astring meta is correct
         assert input_string[apos : apos + len(astring)] == astring
+
+
+def test_odp_from_json():
+    odp_string = "ufid:1b9ed4b8-da1f-4c96-a1cf-0b2e4bbc3d38, recirc_id(0),in_port(2),eth(src=00:11:22:33:44:55,dst=01:00:00:00:00:00/01:00:00:00:00:00),eth_type(0x0800),ipv4(src=10.0.0.1,dst=10.0.0.0/255.255.255.0,proto=6,frag=no),tunnel(tun_id=0x5,dst=172.18.0.3,geneve({class=0x102,type=0x80,len=4,0x10002/0x7fffffff})), packets:3, bytes:180, used:0.5s, actions:ct(commit,zone=2,nat(dst=10.0.0.2:8080)),set(ipv4(ttl=63)),recirc(0x3)"  # noqa: E501
+    factory = ODPFlowFactory()
+    odp = factory.from_string(odp_string)
+    loaded = factory.from_json(json.loads(json.dumps(odp.to_json())))
+
+    assert loaded.orig == odp.orig
+    for section in odp.sections:
+        loaded_section = loaded.section(section.name)
+        assert loaded_section.pos == section.pos
+        for kv, loaded_kv in zip(section.data, loaded_section.data):
+            assert kv.key == loaded_kv.key
+            assert repr(kv.value) == repr(loaded_kv.value)
+            assert vars(kv.meta) == vars(loaded_kv.meta)
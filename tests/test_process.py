@@ -0,0 +1,191 @@
+import io
+import json
+import random
+from types import SimpleNamespace
+
+import click
+import pytest
+
+from ovs_dbg.archive import ArchiveWriter
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.ofparse.process import JSONProcessor, SampleFlows, TopFlows
+
+flow_strings = [
+    "cookie=0x1, duration=1.5s, table=0, n_packets=3, n_bytes=180, priority=100,ip,nw_src=10.0.0.0/24 actions=ct(commit,zone=2),resubmit(,10)",  # noqa: E501
+    "cookie=0x2, duration=0.1s, table=0, n_packets=0, n_bytes=0, priority=0 actions=drop",  # noqa: E501
+    "cookie=0x3, duration=2.0s, table=10, n_packets=7, n_bytes=420, priority=10,tcp,tp_dst=80 actions=output:2",  # noqa: E501
+]
+
+
+def write_files(tmp_path, count):
+    """Write count flow files and return the filename option"""
+    filenames = list()
+    for i in range(count):
+        path = tmp_path / "flows{}.txt".format(i)
+        path.write_text("\n".join(flow_strings[i:]) + "\n")
+        filenames.append(("flows{}".format(i), str(path)))
+    return filenames
+
+
+@pytest.mark.parametrize("count", [1, 2])
+@pytest.mark.parametrize("compact", [False, True])
+def test_json_stream(tmp_path, count, compact):
+    opts = {"filename": write_files(tmp_path, count)}
+    output = io.StringIO()
+    JSONProcessor(
+        opts, OFPFlowFactory(), file=output, compact=compact
+    ).process()
+
+    # The streamed array is the one json.dumps writes
+    stored = JSONProcessor(opts, OFPFlowFactory(), compact=compact)
+    stored.process()
+    assert output.getvalue() == stored.json_string() + "\n"
+
+    data = json.loads(output.getvalue())
+    if count == 1:
+        assert [flow["orig"].strip() for flow in data] == flow_strings
+    else:
+        assert [item["name"] for item in data] == ["flows0", "flows1"]
+        assert [
+            [flow["orig"].strip() for flow in item["flows"]] for item in data
+        ] == [
+            flow_strings,
+            flow_strings[1:],
+        ]
+
+
+@pytest.mark.parametrize("count", [1, 2])
+def test_ndjson(tmp_path, count):
+    opts = {"filename": write_files(tmp_path, count)}
+    output = io.StringIO()
+    JSONProcessor(opts, OFPFlowFactory(), file=output, ndjson=True).process()
+
+    lines = output.getvalue().splitlines()
+    assert all("\n" not in line for line in lines)
+    items = [json.loads(line) for line in lines]
+    if count == 1:
+        assert [item["orig"].strip() for item in items] == flow_strings
+        assert all("name" not in item for item in items)
+    else:
+        assert [(item["name"], item["orig"].strip()) for item in items] == [
+            ("flows0", flow) for flow in flow_strings
+        ] + [("flows1", flow) for flow in flow_strings[1:]]
+
+
+def test_json_stream_empty(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    output = io.StringIO()
+    JSONProcessor(
+        {"filename": [("empty", str(path))]}, OFPFlowFactory(), file=output
+    ).process()
+    assert json.loads(output.getvalue()) == []
+
+
+def test_json_stream_error(tmp_path):
+    path = tmp_path / "flows.bin"
+    with open(path, "wb") as f:
+        with ArchiveWriter(f) as writer:
+            writer.add(
+                ODPFlowFactory().from_string(
+                    "recirc_id(0),in_port(2),eth_type(0x0800), packets:1, "
+                    "bytes:60, used:never, actions:drop",
+                    0,
+                )
+            )
+
+    # Nothing is written if the input is invalid
+    output = io.StringIO()
+    with pytest.raises(click.BadParameter):
+        JSONProcessor(
+            {"filename": [("flows", str(path))]},
+            OFPFlowFactory(),
+            file=output,
+        ).process()
+    assert output.getvalue() == ""
+
+
+@pytest.mark.parametrize("ndjson", [False, True])
+def test_json_round_trip(tmp_path, ndjson):
+    output = io.StringIO()
+    JSONProcessor(
+        {"filename": write_files(tmp_path, 2)},
+        OFPFlowFactory(),
+        file=output,
+        ndjson=ndjson,
+    ).process()
+    path = tmp_path / "export.json"
+    path.write_text(output.getvalue())
+
+    # The files of a single JSON input are kept apart
+    reloaded = io.StringIO()
+    JSONProcessor(
+        {"filename": [("export", str(path))]},
+        OFPFlowFactory(),
+        file=reloaded,
+        ndjson=ndjson,
+    ).process()
+    assert reloaded.getvalue() == output.getvalue()
+
+
+@pytest.mark.parametrize("size", [1, 5, 50, 200])
+def test_top_flows(size):
+    rand = random.Random(size)
+    # Few distinct values so there are many ties
+    flows = [
+        SimpleNamespace(id=i, info={"n_packets": rand.randrange(10)})
+        for i in range(100)
+    ]
+    # Packet counters can be named as in datapath flows
+    top = TopFlows(size, "packets")
+    for flow in flows:
+        top.add(flow)
+    # On equal values, the first flows are kept
+    assert (
+        top.flows()
+        == sorted(flows, key=lambda flow: (-flow.info["n_packets"], flow.id))[
+            :size
+        ]
+    )
+
+
+def test_top_flows_used():
+    flows = [
+        SimpleNamespace(id=0, info={"used": 3.5}),
+        SimpleNamespace(id=1, info={"used": "never"}),
+        SimpleNamespace(id=2, info={}),
+        SimpleNamespace(id=3, info={"used": 0.5}),
+        SimpleNamespace(id=4, info={"used": 0.5}),
+    ]
+    top = TopFlows(4, "used")
+    for flow in flows:
+        top.add(flow)
+    # The most recently used first, the ones never used last
+    assert [flow.id for flow in top.flows()] == [3, 4, 0, 1]
+
+
+@pytest.mark.parametrize("count,size", [(0, 3), (2, 3), (3, 3), (100, 7)])
+def test_sample_flows(count, size):
+    sample = SampleFlows(size)
+    for i in range(count):
+        sample.add(i)
+        assert len(sample.flows()) == min(i + 1, size)
+    flows = sample.flows()
+    # Flows are returned in their original order
+    assert flows == sorted(set(flows))
+    assert len(flows) == min(count, size)
+    assert set(flows) <= set(range(count))
+
+
+def test_sample_flows_uniform():
+    random.seed(0)
+    hits = [0] * 10
+    for _ in range(3000):
+        sample = SampleFlows(3)
+        for i in range(10):
+            sample.add(i)
+        for i in sample.flows():
+            hits[i] += 1
+    # Each flow is selected with probability 3/10
+    assert all(750 < count < 1050 for count in hits)
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from ovs_dbg.ofparse.main import maincli
+from ovs_dbg.ofparse.server import request
+
+flow_strings = [
+    "cookie=0x1, duration=1.5s, table=0, n_packets=3, n_bytes=180, priority=100,ip,nw_src=10.0.0.0/24 actions=resubmit(,10)",  # noqa: E501
+    "cookie=0x2, duration=0.1s, table=0, n_packets=0, n_bytes=0, priority=0 actions=drop",  # noqa: E501
+]
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Run a server on the flows and return the path of its socket"""
+    filename = tmp_path / "flows.txt"
+    filename.write_text("\n".join(flow_strings) + "\n")
+    path = str(tmp_path / "ofparse.sock")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from ovs_dbg.ofparse import main; main.main()",
+            "-i",
+            "flows,{}".format(filename),
+            "openflow",
+            "serve",
+            "--socket",
+            path,
+        ],
+        env=dict(os.environ, PYTHONPATH=root),
+    )
+    try:
+        for _ in range(200):
+            if os.path.exists(path):
+                break
+            assert proc.poll() is None
+            time.sleep(0.05)
+        yield path, str(filename)
+    finally:
+        proc.terminate()
+        proc.wait()
+    assert not os.path.exists(path)
+
+
+def test_server(server):
+    path, filename = server
+    # Liveness check
+    assert request(path, None) == {"status": 0, "stdout": "", "stderr": ""}
+
+    runner = CliRunner()
+    local = runner.invoke(
+        maincli, ["-i", filename, "-f", "drop", "openflow", "json"]
+    )
+    assert local.exit_code == 0
+    remote = runner.invoke(
+        maincli, ["--server", path, "-f", "drop", "openflow", "json"]
+    )
+    assert remote.exit_code == 0
+    assert remote.output == local.output.replace(filename, "flows")
+
+
+def test_server_error(server):
+    path, filename = server
+    runner = CliRunner(mix_stderr=False)
+
+    # Usage errors are reported by the server
+    result = runner.invoke(maincli, ["--server", path, "openflow", "foo"])
+    assert result.exit_code == 2
+    assert "No such command" in result.stderr
+
+    # Inputs are read by the server
+    result = runner.invoke(
+        maincli, ["--server", path, "-i", filename, "openflow", "json"]
+    )
+    assert result.exit_code == 2
+    assert result.stdout == ""
@@ -0,0 +1,38 @@
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.shadows import find_shadowed
+
+
+def test_shadowed():
+    factory = OFPFlowFactory()
+    flows = [
+        factory.from_string(flow, id)
+        for id, flow in enumerate(
+            [
+                "table=0, priority=100,ip,nw_dst=10.0.0.0/8 actions=drop",
+                "table=0, priority=50,tcp,nw_dst=10.1.0.0/16,tp_dst=80 actions=output:1",  # noqa: E501
+                "table=0, priority=50,tcp,nw_dst=12.1.0.0/16,tp_dst=80 actions=output:1",  # noqa: E501
+                "table=0, priority=50,tcp,nw_dst=12.1.0.0/16,tp_dst=80 actions=output:2",  # noqa: E501
+                "table=0, priority=150,ip,nw_dst=10.0.0.0/7 actions=drop",
+                "table=0, priority=200,tcp,nw_dst=12.1.0.0/16 actions=conjunction(1,1/2)",  # noqa: E501
+                "table=1, priority=10,reg0=0x5/0xff actions=drop",
+                "table=1, priority=5,reg0=0x105 actions=drop",
+                "table=1, priority=5,reg0=0x106 actions=drop",
+                "table=1, priority=5,reg0=0x5/0xf actions=drop",
+                "table=1, priority=1,in_port=LOCAL,reg0=0x5 actions=drop",
+                "table=1, priority=2,in_port=LOCAL actions=drop",
+                "table=2, priority=1,reg0=0x105 actions=drop",
+            ]
+        )
+    ]
+    assert [
+        (shadowed.table, shadowed.flow.id, shadowed.by.id, shadowed.duplicate)
+        for shadowed in find_shadowed(flows)
+    ] == [
+        # 10.0.0.0/8 is shadowed by 10.0.0.0/7 and so is 10.1.0.0/16, but
+        # the highest priority cover is reported
+        (0, 0, 4, False),
+        (0, 1, 4, False),
+        (0, 3, 2, True),
+        (1, 7, 6, False),
+        (1, 10, 6, False),
+    ]
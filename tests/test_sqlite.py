@@ -0,0 +1,83 @@
+import json
+import sqlite3
+
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.odp import ODPFlowFactory
+from ovs_dbg.sqlite import SQLiteWriter
+
+
+def test_sqlite(tmp_path):
+    ofp_string = "cookie=0x1f, duration=1.5s, table=2, n_packets=3, n_bytes=4, priority=100,ip,reg14=0x3,metadata=0x5/0xff actions=resubmit(,10)"  # noqa: E501
+    odp_string = "ufid:1b9ed4b8-da1f-4c96-a1cf-0b2e4bbc3d38, recirc_id(0x2),in_port(2),eth_type(0x0800), packets:3, bytes:180, used:0.5s, actions:recirc(0x3)"  # noqa: E501
+    filename = tmp_path / "flows.db"
+
+    with SQLiteWriter(filename, batch_size=1) as writer:
+        flow = OFPFlowFactory().from_string(ofp_string, 7)
+        writer.start_file("ofp", "ofp.txt", flow.__class__)
+        writer.add(flow)
+        flow = ODPFlowFactory().from_string(odp_string, 0)
+        writer.start_file("odp", "odp.txt", flow.__class__)
+        writer.add(flow)
+
+    # Flows are appended to existing databases
+    with SQLiteWriter(filename) as writer:
+        writer.add(OFPFlowFactory().from_string(ofp_string))
+        # Cookies that do not fit in an INTEGER are stored in hex
+        writer.add(
+            OFPFlowFactory().from_string(
+                ofp_string.replace("0x1f", "0xffffffffffffffff")
+            )
+        )
+
+    conn = sqlite3.connect(filename)
+    assert conn.execute(
+        "SELECT name, flow_type FROM files ORDER BY id"
+    ).fetchall() == [
+        ("ofp", "openflow"),
+        ("odp", "datapath"),
+        (None, "openflow"),
+    ]
+    assert conn.execute(
+        "SELECT id, file_id, idx, orig, table_id, priority, cookie, "
+        "recirc_id, ufid, n_packets, n_bytes FROM flows ORDER BY id"
+    ).fetchall() == [
+        (1, 1, 7, ofp_string, 2, 100, 0x1F, None, None, 3, 4),
+        (
+            2,
+            2,
+            0,
+            odp_string,
+            None,
+            None,
+            None,
+            2,
+            "1b9ed4b8-da1f-4c96-a1cf-0b2e4bbc3d38",
+            3,
+            180,
+        ),
+        (3, 3, None, ofp_string, 2, 100, 0x1F, None, None, 3, 4),
+        (
+            4,
+            3,
+            None,
+            ofp_string.replace("0x1f", "0xffffffffffffffff"),
+            2,
+            100,
+            "0xffffffffffffffff",
+            None,
+            None,
+            3,
+            4,
+        ),
+    ]
+
+    value, int_value = conn.execute(
+        "SELECT value, int_value FROM kvs WHERE flow_id = 1 AND "
+        "section = 'match' AND key = 'metadata'"
+    ).fetchone()
+    assert json.loads(value) == {"value": 5, "mask": 0xFF}
+    assert int_value == 5
+    assert conn.execute(
+        "SELECT section, pos, value FROM kvs WHERE flow_id = 1 AND "
+        "key = 'resubmit'"
+    ).fetchone() == ("actions", 0, '{"port": "", "table": 10}')
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.ofparse.stats import FileStats, StatsProcessor
+
+
+@pytest.mark.parametrize(
+    "values,percents,expected",
+    [
+        ([], (50, 100), {}),
+        ([7], (0, 50, 99, 100), {"p0": 7, "p50": 7, "p99": 7, "p100": 7}),
+        (
+            list(range(10, 0, -1)),
+            (50, 90, 99, 100),
+            {"p50": 5, "p90": 9, "p99": 10, "p100": 10},
+        ),
+        (
+            [3, 1, 2, 2],
+            (25, 50, 75, 100),
+            {"p25": 1, "p50": 2, "p75": 2, "p100": 3},
+        ),
+    ],
+)
+def test_percentiles(values, percents, expected):
+    assert FileStats.percentiles(values, percents) == expected
+
+
+def test_stats():
+    factory = OFPFlowFactory()
+    flows = [
+        factory.from_string(flow, idx)
+        for idx, flow in enumerate(
+            [
+                "cookie=0x1, table=0, n_packets=10, n_bytes=600, priority=100,ip actions=ct(zone=1),resubmit(,1)",  # noqa: E501
+                "cookie=0x1, table=0, n_packets=0, n_bytes=0, priority=10 actions=drop",  # noqa: E501
+                "cookie=0x2, table=1, n_packets=5, n_bytes=300, priority=100,tcp actions=output:1,output:2",  # noqa: E501
+            ]
+        )
+    ]
+    proc = StatsProcessor(
+        {"flows": {"flows": flows}},
+        factory,
+        [
+            ("Tables", "info", "table", str),
+            ("Priorities", "match", "priority", str),
+            ("Cookies", "info", "cookie", hex),
+        ],
+        ["n_packets", "n_bytes"],
+    )
+    proc.process()
+    assert json.loads(proc.json_string()) == {
+        "flows": {
+            "flows": 3,
+            "zero_hit": 1,
+            "table": {"0": 2, "1": 1},
+            "priority": {"100": 2, "10": 1},
+            "cookie": {"0x1": 2, "0x2": 1},
+            "actions": {"output": 2, "ct": 1, "resubmit": 1, "drop": 1},
+            "counters": {
+                "n_packets": {"p50": 5, "p90": 10, "p99": 10, "p100": 10},
+                "n_bytes": {"p50": 300, "p90": 600, "p99": 600, "p100": 600},
+            },
+        }
+    }
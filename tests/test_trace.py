@@ -0,0 +1,113 @@
+import pytest
+
+from ovs_dbg.ofp import OFPFlowFactory
+from ovs_dbg.classifier import Classifier
+from ovs_dbg.trace import Tracer, TraceError, field_name, parse_packet
+
+
+@pytest.fixture
+def tracer():
+    factory = OFPFlowFactory()
+    flows = [
+        "table=0, priority=100,in_port=3,ip actions=load:0x5->NXM_NX_REG14[0..15],move:NXM_OF_IP_DST[]->NXM_NX_XXREG0[64..95],resubmit(,1)",  # noqa: E501
+        "table=0, priority=50,in_port=4 actions=resubmit(3,0),in_port",
+        "table=0, priority=0 actions=drop",
+        "table=1, priority=10,ip,reg14=0x5 actions=ct(table=2,zone=NXM_NX_REG14[0..15],exec(load:0x1->NXM_NX_CT_MARK[0]))",  # noqa: E501
+        "table=2, priority=10,ct_state=+trk+new,ct_mark=0x1 actions=conjunction(7,1/2)",  # noqa: E501
+        "table=2, priority=10,ip,nw_dst=10.0.0.1 actions=conjunction(7,2/2)",  # noqa: E501
+        "table=2, priority=10,conj_id=7 actions=set_field:00:00:00:00:00:09->eth_dst,goto_table:3",  # noqa: E501
+        "table=2, priority=1 actions=drop",
+        "table=3, priority=5,xreg0=0xa000001,dl_dst=00:00:00:00:00:09 actions=output:NXM_NX_REG14[],clone(mod_nw_dst:10.0.0.9,output:7)",  # noqa: E501
+    ]
+    return Tracer(
+        Classifier(
+            factory.from_string(flow, id) for id, flow in enumerate(flows)
+        )
+    )
+
+
+def test_trace(tracer):
+    trace = tracer.trace(
+        parse_packet("in_port=3,ip,nw_src=10.0.0.2,nw_dst=10.0.0.1")
+    )
+    assert [
+        (step.table, step.flow.id, step.depth, step.reason)
+        for step in trace.steps
+    ] == [
+        (0, 0, 0, None),
+        (1, 3, 1, "resubmit"),
+        (2, 6, 0, "ct"),
+        (3, 8, 0, "goto_table"),
+    ]
+    assert trace.outputs == [5, 7]
+    assert not trace.dropped
+    assert trace.changes() == {
+        "reg14": 5,
+        "reg1": 0x0A000001,
+        "ct_state": 0x21,
+        "ct_zone": 5,
+        "ct_mark": 1,
+        "eth_dst": 9,
+    }
+    assert trace.notes == []
+
+
+def test_trace_resubmit_port(tracer):
+    trace = tracer.trace(parse_packet("in_port=4,ip,nw_dst=10.0.0.1"))
+    assert [step.flow.id for step in trace.steps] == [1, 0, 3, 6, 8]
+    # in_port is restored after the resubmit
+    assert trace.outputs == [4, 5, 7]
+
+
+def test_trace_ct_next(tracer):
+    trace = Tracer(tracer.classifier, ct_next=["trk|est"]).trace(
+        parse_packet("in_port=3,ip,nw_dst=10.0.0.1")
+    )
+    assert [step.flow.id for step in trace.steps] == [0, 3, 7]
+    assert trace.dropped
+    assert trace.notes == []
+
+    trace = tracer.trace(parse_packet("in_port=3,ip,nw_dst=10.0.0.2"))
+    assert [step.flow.id for step in trace.steps] == [0, 3, 7]
+
+
+def test_trace_no_match(tracer):
+    trace = tracer.trace(parse_packet("in_port=3,ip"), table=5)
+    assert len(trace.steps) == 1
+    assert trace.steps[0].flow is None
+    assert trace.dropped
+
+
+def test_trace_loop():
+    factory = OFPFlowFactory()
+    trace = Tracer(
+        Classifier([factory.from_string("table=0 actions=resubmit(,0)")])
+    ).trace({})
+    assert len(trace.steps) == 65
+    assert trace.notes
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("NXM_NX_REG10", "reg10"),
+        ("NXM_OF_ETH_SRC", "eth_src"),
+        ("OXM_OF_IPV4_DST", "ip_dst"),
+        ("NXM_OF_TCP_DST", "tp_dst"),
+        ("NXM_NX_CT_MARK", "ct_mark"),
+        ("nw_src", "ip_src"),
+    ],
+)
+def test_field_name(name, expected):
+    assert field_name(name) == expected
+
+
+def test_parse_packet():
+    assert parse_packet("in_port=3,tcp,dl_src=00:00:00:00:00:01") == {
+        "in_port": 3,
+        "eth_type": 0x0800,
+        "ip_proto": 6,
+        "eth_src": 1,
+    }
+    with pytest.raises(TraceError):
+        parse_packet("in_port=3,foo=1")